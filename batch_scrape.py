@@ -10,6 +10,11 @@ import time
 import os
 import argparse
 import json
+import sys
+
+# Names are resolved against the move and species constants through gl/name_resolver
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "gl"))
+from name_resolver import header_names
 
 # This is our complete list of Pokémon to scrape.
 # The names are all lowercase because that's how PokemonDB uses them in URLs.
@@ -280,33 +285,9 @@ def format_pokemon_name(name):
     Returns:
         The Pokemon name in SPECIES_NAME format
     """
-    # Handle special cases with unusual formatting
-    special_cases = {
-        "nidoran-f": "NIDORAN_F",
-        "nidoran-m": "NIDORAN_M",
-        "mr-mime": "MR_MIME",
-        "mime-jr": "MIME_JR",
-        "tapu-koko": "TAPU_KOKO",
-        "tapu-lele": "TAPU_LELE",
-        "tapu-bulu": "TAPU_BULU",
-        "tapu-fini": "TAPU_FINI",
-        "type-null": "TYPE_NULL",
-        "jangmo-o": "JANGMO_O",
-        "hakamo-o": "HAKAMO_O",
-        "kommo-o": "KOMMO_O",
-        "wo-chien": "WO_CHIEN",
-        "chien-pao": "CHIEN_PAO",
-        "ting-lu": "TING_LU",
-        "chi-yu": "CHI_YU",
-    }
-    
-    if name.lower() in special_cases:
-        return "SPECIES_" + special_cases[name.lower()]
-    
-    # For regular names, convert to uppercase and replace hyphens with underscores
-    formatted_name = name.upper().replace('-', '_')
-    
-    return "SPECIES_" + formatted_name
+    # The species constants resolve hyphenated names ("mr-mime" -> SPECIES_MR_MIME)
+    formatted_name = "SPECIES_" + name.upper().replace('-', '_')
+    return header_names().pokemon.name(formatted_name) or formatted_name
 
 def main():
     # Parse command line arguments (this lets us customize how the script runs)
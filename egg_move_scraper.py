@@ -12,6 +12,10 @@ import os
 import sys
 from download_pokemon_html import download_pokemon_html
 
+# Names are resolved against the move and species constants through gl/name_resolver
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "gl"))
+from name_resolver import header_names
+
 # Global dictionary to store our results
 # This will be structured like: {"SPECIES_POKEMON": ["MOVE_X", "MOVE_Y", ...]}
 egg_moves_data = {}
@@ -97,6 +101,7 @@ def extract_egg_moves(soup, pokemon_name):
             
             # Remove any special characters that might cause issues
             formatted_move = ''.join(c for c in formatted_move if c.isalnum() or c == '_')
+            formatted_move = header_names().moves.name(formatted_move) or formatted_move
             
             # Add the move to our list
             egg_moves.append(formatted_move)
@@ -114,33 +119,9 @@ def format_pokemon_name(name):
     Returns:
         The Pokemon name in SPECIES_NAME format
     """
-    # Handle special cases
-    special_cases = {
-        "nidoran-f": "NIDORAN_F",
-        "nidoran-m": "NIDORAN_M",
-        "mr-mime": "MR_MIME",
-        "mime-jr": "MIME_JR",
-        "tapu-koko": "TAPU_KOKO",
-        "tapu-lele": "TAPU_LELE",
-        "tapu-bulu": "TAPU_BULU",
-        "tapu-fini": "TAPU_FINI",
-        "type-null": "TYPE_NULL",
-        "jangmo-o": "JANGMO_O",
-        "hakamo-o": "HAKAMO_O",
-        "kommo-o": "KOMMO_O",
-        "wo-chien": "WO_CHIEN",
-        "chien-pao": "CHIEN_PAO",
-        "ting-lu": "TING_LU",
-        "chi-yu": "CHI_YU",
-    }
-    
-    if name.lower() in special_cases:
-        return "SPECIES_" + special_cases[name.lower()]
-    
-    # For names with hyphens (like "great-tusk"), convert to underscores
-    formatted_name = name.upper().replace('-', '_')
-    
-    return "SPECIES_" + formatted_name
+    # The species constants resolve hyphenated names ("mr-mime" -> SPECIES_MR_MIME)
+    formatted_name = "SPECIES_" + name.upper().replace('-', '_')
+    return header_names().pokemon.name(formatted_name) or formatted_name
 
 def save_to_existing_json(pokemon_name, egg_moves, output_file):
     """
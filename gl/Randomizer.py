@@ -4,6 +4,16 @@ import os
 
 import random
 
+import copy
+
+import contextlib
+
+import hashlib
+
+import io
+
+import concurrent.futures
+
 import ndspy.rom
 
 from steps import *
@@ -16,6 +26,16 @@ from print_eviolite_users_step import PrintEvioliteUsersStep
 
 from script_extractor import *
 
+from profiler import PipelineProfiler
+
+from bps import create_edit_patch, create_rom_patch
+
+from rom_writer import IncrementalWriteError, plan_rom, write_rom
+
+from step_cache import StepCache
+
+from decision_journal import DecisionJournal, DecisionReplay
+
 
 
 # Set UTF-8 encoding for console output on Windows
@@ -64,112 +84,60 @@ def parse_verbosity_overrides(verbosity_args):
 
         
 
-if __name__ == "__main__":
-
-    import argparse
-
-    
-
-    parser = argparse.ArgumentParser(description="Test RandomizeGymsStep")
-
-    parser.add_argument("--bst-factor", type=float, default=0.15, help="BST factor for filtering (default: 0.15)")
-
-    parser.add_argument("--quiet", "-q", action="store_true", help="Don't output details")
-
-    parser.add_argument("--seed", "-s", type=str, help="Random seed")
-
-    parser.add_argument("--verbosity", "-v", action="append", type=str, 
-
-                       help="Verbosity: level (global) or path=level (path-specific)")
-
-    
-
-    # Options to control filtering of special Pokémon categories
-
-    parser.add_argument("--allow-restricted", action="store_true", help="Allow restricted legendary Pokémon")
-
-    parser.add_argument("--allow-mythical", action="store_true", help="Allow mythical Pokémon")
-
-    parser.add_argument("--allow-ultra-beasts", action="store_true", help="Allow Ultra Beast Pokémon")
-
-    parser.add_argument("--allow-paradox", action="store_true", help="Allow Paradox Pokémon")
-
-    parser.add_argument("--allow-sublegendary", action="store_true", help="Allow SubLegendary Pokémon")
-
-    parser.add_argument("--no-independent-encounters", action="store_false", dest="independent_encounters", default=True,
-                       help="Disable making encounter replacements independent by area (default: enabled)")
-
-    parser.add_argument("--expand-bosses-only", action="store_true", help="Only expand teams for boss trainers (gym leaders, Elite Four, etc.)")
-
-    parser.add_argument("--wild-level-mult", type=float, default=1.5, help="Multiplier for wild Pokémon levels (default: 1.0)")
-
-    parser.add_argument("--gift-level-mult", type=float, default=None, help="Multiplier for gift Pokémon levels (default: same as wild-level-mult)")
-
-    parser.add_argument("--trainer-level-mult", type=float, default=1.15, help="Multiplier for trainer Pokémon levels with special boss/ace logic (default: 1.0)")
-
-    parser.add_argument("--gauntlet-mode", action="store_true", help="Scale trainer levels based on their associated boss's ace level (uses TrainerToBoss.csv)")
-
-    parser.add_argument("--no-randomize-starters", action="store_false", 
-
-                       dest="randomize_starters", default=True,
-
-                       help="Disable randomization of starter Pokémon (default: enabled)")
-
-    parser.add_argument("--no-consistent-rival-starters", action="store_false", 
-
-                       dest="consistent_rival_starters", default=True,
-
-                       help="Disable updating rival teams to use starters consistent with the player's randomized choice (default: enabled)")
-
-    parser.add_argument("--no-randomize-ordinary-trainers", action="store_false", 
-
-                       dest="randomize_ordinary_trainers", default=True,
-
-                       help="Disable randomization of ordinary trainers (default: enabled)")
+BASE_ROM_PATH = "raw.nds"
 
-    parser.add_argument("--no-enemy-battle-items", action="store_true", help="Remove all battle items from enemy trainers")
+OUTPUT_ROM_NAME = "Goldilockes"
 
-    args = parser.parse_args()
+# Extractors that only parse ROM data (no randomness). Batch mode loads these
+# once and hands every seed a copy-on-write fork instead of reparsing the ROM.
+PRELOADED_EXTRACTORS = [
+    Mons, Moves, Levelups, EggMoves, EvolutionData,
+    TrainerData, TrainerTeam, Trainers, Encounters,
+    ScriptNarc, ScriptCommandIndex, EventFiles,
+]
 
 
 
-    # Handle random seed - generate one if not specified, and always display it
-
-    if args.seed is not None:
-
-        seed = int(args.seed)
-
-    else:
+def parse_reroll_paths(reroll_args):
+    """Parse --reroll arguments (PATH or PATH=N) into (path_list, salt) tuples."""
+    rerolls = []
+    for arg in reroll_args:
+        path_str, _, salt = arg.partition("=")
+        rerolls.append(([p.lower() for p in path_str.split("/") if p], int(salt) if salt else 1))
+    return rerolls
 
-        seed = random.randint(0, 2**32 - 1)
 
-    random.seed(seed)
 
-    print(f"Random seed: {seed}")
+def load_base_context(verbosity_overrides, parse_cache=None, profiler=None):
+    """Load the base ROM and parse the static extractors."""
+    global _base_rom_files
+    with open(BASE_ROM_PATH, "rb") as f:
+        rom = ndspy.rom.NintendoDSRom(f.read())
+    _base_rom_files = list(rom.files)
 
-    
+    ctx = RandomizationContext(rom, verbosity_overrides=verbosity_overrides, parse_cache=parse_cache)
+    ctx.profiler = profiler
 
-    # Parse verbosity overrides
+    for extractor_class in PRELOADED_EXTRACTORS:
+        ctx.get(extractor_class)
 
-    vbase = 0 if args.quiet else 2
+    return ctx
 
-    verbosity_overrides = [([], vbase)] + parse_verbosity_overrides(args.verbosity or [])
 
-    
 
-    # Load ROM
+def base_rom_digest():
+    with open(BASE_ROM_PATH, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
 
-    with open("raw.nds", "rb") as f:
 
-        rom = ndspy.rom.NintendoDSRom(f.read())
 
+def run_randomizer(ctx, args, step_cache=None):
+    """Build filters and the step pipeline from args, run it on ctx and write the extractors back.
     
+    With a step_cache, steps unaffected by changed options are replayed from an earlier run.
+    """
 
-    # Create context and load data
-
-    ctx = RandomizationContext(rom, verbosity_overrides=verbosity_overrides)
-
-
+    ctx.reroll_map = PathHierMap(parse_reroll_paths(args.reroll or []))
 
     # Create filters from options
 
@@ -216,7 +184,7 @@ if __name__ == "__main__":
 
     # Do everything
 
-    ctx.run_pipeline([
+    graph = ctx.run_pipeline([
 
         # DEBUG: Force all trainers to have Pumpkaboo LARGE
 
@@ -319,27 +287,378 @@ if __name__ == "__main__":
 
         #DebugAlolanMarowakStaticStep(),
 
-    ])
+    ], workers=args.parallel_steps, check_access=args.check_step_access, step_cache=step_cache)
+
+    if args.critical_path:
+        for problem in graph.validate():
+            print(f"[WARNING] {problem}")
+        print(graph.format_critical_path())
 
     
 
-    ctx.write_all()
+    ctx.write_all(log_function=print if (ctx.verbosity_map.get([]) or 0) >= 1 else None)
 
-    
 
-    # Save modified ROM
 
-    modified_rom_path = "Goldilockes.nds"
+def write_profile(profiler, prefix):
+    profiler.stop()
+    print(profiler.report())
+    profiler.write_json(f"{prefix}.json")
+    profiler.write_chrome_trace(f"{prefix}.trace.json")
+    print(f"Profile written to {prefix}.json and {prefix}.trace.json")
 
-    with open(modified_rom_path, "wb") as f:
 
-        s = rom.save()
 
-        print(f"Writing {len(s)} bytes to {repr(modified_rom_path)} ...")
+# rom.files as loaded from BASE_ROM_PATH, so save_rom can skip untouched files by identity
+_base_rom_files = None
+
 
+def save_rom(rom, path):
+    try:
+        stats = write_rom(rom, BASE_ROM_PATH, path, _base_rom_files)
+        print(f"Patched {stats['in_place']} files in place and relocated {stats['relocated']} "
+              f"({stats['bytes_written']} bytes) into {repr(path)}")
+        return
+    except IncrementalWriteError as e:
+        print(f"Rebuilding ROM ({e})")
+    with open(path, "wb") as f:
+        s = rom.save()
+        print(f"Writing {len(s)} bytes to {repr(path)} ...")
         f.write(s)
 
 
 
+_base_rom_bytes = None
+
+
+def save_patch(rom, path):
+    """Write rom as a BPS patch against BASE_ROM_PATH (apply with gl/bps.py or any BPS patcher).
+    
+    The target is laid out as save_rom's incremental writer would, from the
+    files that changed; rom.save() and a whole-image diff are only the
+    fallback when the writer can't express the changes.
+    """
+    global _base_rom_bytes
+    if _base_rom_bytes is None:
+        with open(BASE_ROM_PATH, "rb") as f:
+            _base_rom_bytes = f.read()
+    try:
+        edits, stats = plan_rom(rom, io.BytesIO(_base_rom_bytes), _base_rom_files)
+        patch = create_edit_patch(_base_rom_bytes, edits)
+        print(f"Patch covers {stats['in_place']} files changed in place and {stats['relocated']} relocated")
+    except IncrementalWriteError as e:
+        print(f"Diffing rebuilt ROM ({e})")
+        patch = create_rom_patch(_base_rom_bytes, rom.save())
+    print(f"Writing {len(patch)} byte patch to {repr(path)} ...")
+    with open(path, "wb") as f:
+        f.write(patch)
+
+
+
+def save_output(rom, path_stem, as_patch):
+    """Save rom as <path_stem>.nds, or <path_stem>.bps if as_patch; returns the path written."""
+    if as_patch:
+        path = f"{path_stem}.bps"
+        save_patch(rom, path)
+    else:
+        path = f"{path_stem}.nds"
+        save_rom(rom, path)
+    return path
+
+
+
+def parse_seed_list(args):
+    """Return the seeds requested by --seeds/--seed-range, or None for a single-seed run."""
+    if args.seed_range:
+        start, _, stop = args.seed_range.partition(":")
+        return list(range(int(start), int(stop)))
+    if args.seeds:
+        first = int(args.seed) if args.seed is not None else random.randint(0, 2**32 - 1)
+        return [first + i for i in range(args.seeds)]
+    return None
+
+
+
+# Parsed base context for batch workers. Set in the parent before the pool
+# starts, so forked workers inherit it; spawned workers load their own.
+_base_context = None
+
+
+def _init_batch_worker(verbosity_overrides, use_cache):
+    global _base_context
+    if _base_context is None:
+        _base_context = load_base_context(verbosity_overrides, ParseCache() if use_cache else None)
+
+
+def randomize_seed(args, seed, output_dir):
+    """Randomize one seed on a fork of the base context; its output goes to <name>_<seed>.log."""
+    rom_stem = os.path.join(output_dir, f"{OUTPUT_ROM_NAME}_{seed}")
+    log_path = os.path.join(output_dir, f"{OUTPUT_ROM_NAME}_{seed}.log")
+
+    with open(log_path, "w", encoding="utf-8") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        random.seed(seed)
+        print(f"Random seed: {seed}")
+        ctx = _base_context.fork()
+        ctx.seed = seed
+        ctx.profiler = PipelineProfiler() if args.profile else None
+        ctx.journal = DecisionJournal(f"{rom_stem}.journal", seed) if args.journal else None
+        run_randomizer(ctx, args)
+        if ctx.journal is not None:
+            ctx.journal.close()
+        rom_path = save_output(ctx.rom, rom_stem, args.patch)
+        if ctx.profiler is not None:
+            write_profile(ctx.profiler, os.path.join(output_dir, f"{args.profile}_{seed}"))
+        print("Done")
+
+    return seed, rom_path
+
+
+def run_batch(args, seeds, verbosity_overrides, parse_cache):
+    global _base_context
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    print(f"Parsing {BASE_ROM_PATH} once for {len(seeds)} seeds ...")
+    _base_context = load_base_context(verbosity_overrides, parse_cache)
+
+    failed = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_batch_worker,
+                                                initargs=(verbosity_overrides, parse_cache is not None)) as pool:
+        futures = {pool.submit(randomize_seed, args, seed, args.output_dir): seed for seed in seeds}
+        for future in concurrent.futures.as_completed(futures):
+            seed = futures[future]
+            try:
+                _, rom_path = future.result()
+                print(f"Seed {seed}: wrote {rom_path}")
+            except Exception as e:
+                failed.append(seed)
+                print(f"Seed {seed}: FAILED ({e!r})")
+
+    return failed
+
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    
+
+    parser = argparse.ArgumentParser(description="Test RandomizeGymsStep")
+
+    parser.add_argument("--bst-factor", type=float, default=0.15, help="BST factor for filtering (default: 0.15)")
+
+    parser.add_argument("--quiet", "-q", action="store_true", help="Don't output details")
+
+    parser.add_argument("--seed", "-s", type=str, help="Random seed")
+
+    parser.add_argument("--verbosity", "-v", action="append", type=str, 
+
+                       help="Verbosity: level (global) or path=level (path-specific)")
+
+    
+
+    # Options to control filtering of special Pokémon categories
+
+    parser.add_argument("--allow-restricted", action="store_true", help="Allow restricted legendary Pokémon")
+
+    parser.add_argument("--allow-mythical", action="store_true", help="Allow mythical Pokémon")
+
+    parser.add_argument("--allow-ultra-beasts", action="store_true", help="Allow Ultra Beast Pokémon")
+
+    parser.add_argument("--allow-paradox", action="store_true", help="Allow Paradox Pokémon")
+
+    parser.add_argument("--allow-sublegendary", action="store_true", help="Allow SubLegendary Pokémon")
+
+    parser.add_argument("--no-independent-encounters", action="store_false", dest="independent_encounters", default=True,
+                       help="Disable making encounter replacements independent by area (default: enabled)")
+
+    parser.add_argument("--expand-bosses-only", action="store_true", help="Only expand teams for boss trainers (gym leaders, Elite Four, etc.)")
+
+    parser.add_argument("--wild-level-mult", type=float, default=1.5, help="Multiplier for wild Pokémon levels (default: 1.0)")
+
+    parser.add_argument("--gift-level-mult", type=float, default=None, help="Multiplier for gift Pokémon levels (default: same as wild-level-mult)")
+
+    parser.add_argument("--trainer-level-mult", type=float, default=1.15, help="Multiplier for trainer Pokémon levels with special boss/ace logic (default: 1.0)")
+
+    parser.add_argument("--gauntlet-mode", action="store_true", help="Scale trainer levels based on their associated boss's ace level (uses TrainerToBoss.csv)")
+
+    parser.add_argument("--no-randomize-starters", action="store_false", 
+
+                       dest="randomize_starters", default=True,
+
+                       help="Disable randomization of starter Pokémon (default: enabled)")
+
+    parser.add_argument("--no-consistent-rival-starters", action="store_false", 
+
+                       dest="consistent_rival_starters", default=True,
+
+                       help="Disable updating rival teams to use starters consistent with the player's randomized choice (default: enabled)")
+
+    parser.add_argument("--no-randomize-ordinary-trainers", action="store_false", 
+
+                       dest="randomize_ordinary_trainers", default=True,
+
+                       help="Disable randomization of ordinary trainers (default: enabled)")
+
+    parser.add_argument("--no-enemy-battle-items", action="store_true", help="Remove all battle items from enemy trainers")
+
+    parser.add_argument("--no-cache", action="store_true", help="Parse the ROM from scratch without reading or writing the parse cache")
+
+    parser.add_argument("--clear-cache", action="store_true", help=f"Delete the parse cache ({ParseCache.DEFAULT_DIR}), step cache ({StepCache.DEFAULT_DIR}) and custom set bundle ({CustomSetBundle.DEFAULT_PATH}) before running")
+
+    parser.add_argument("--profile", nargs="?", const="profile", metavar="PREFIX",
+
+                       help="Profile each step (wall/CPU time, memory, decide calls, filter time) and write PREFIX.json and PREFIX.trace.json (default: profile)")
+
+    parser.add_argument("--seeds", type=int, help="Batch mode: generate N seeds, starting at --seed (or a random seed) and counting up")
+
+    parser.add_argument("--seed-range", type=str, metavar="A:B", help="Batch mode: generate seeds A through B-1")
+
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Batch mode: number of worker processes (default: CPU count)")
+
+    parser.add_argument("--output-dir", type=str, default=".", help=f"Batch mode: directory for {OUTPUT_ROM_NAME}_<seed>.nds/.log (default: current directory)")
+
+    parser.add_argument("--parallel-steps", type=int, default=1, metavar="N",
+                       help="Run up to N independent pipeline steps at once in forked worker processes. Results match a sequential run "
+                            "only if every step declares what it reads and writes; a step that changes an extractor it declares only "
+                            "in READS stops the run (--check-step-access finds both kinds of mistake)")
+
+    parser.add_argument("--critical-path", action="store_true", help="Print the chain of dependent steps that bounds the pipeline's run time")
+
+    parser.add_argument("--check-step-access", action="store_true", help="Report extractors a step uses without declaring them in READS/WRITES, or changes while declaring them only in READS (runs steps in order)")
+
+    parser.add_argument("--reroll", action="append", type=str, metavar="PATH[=N]",
+                       help="Re-roll the decisions under a decision path (e.g. /encounters/area_12) with the same seed; N picks a different re-roll")
+
+    parser.add_argument("--step-cache", action="store_true",
+                       help=f"Memoize each step's changes under {StepCache.DEFAULT_DIR}; re-running the same seed with a few options changed only re-runs the affected steps (single-seed runs)")
+
+    parser.add_argument("--journal", action="store_true",
+                       help=f"Record every decision in {OUTPUT_ROM_NAME}.journal (read it with render_journal.py); decision lines are then not printed unless -v asks for them")
+
+    parser.add_argument("--replay", type=str, metavar="JOURNAL",
+                       help="Regenerate the ROM a --journal run produced: decisions come from JOURNAL without filtering, and any divergence is an error")
+
+    parser.add_argument("--patch", action="store_true", help=f"Write a BPS patch against {BASE_ROM_PATH} (.bps) instead of a full ROM image")
+
+    args = parser.parse_args()
+
+
+
+    # Parse verbosity overrides
+
+    # With a journal, decisions are rendered afterwards by render_journal.py instead of printed
+    vbase = 0 if args.quiet else (1 if args.journal else 2)
+
+    verbosity_overrides = [([], vbase)] + parse_verbosity_overrides(args.verbosity or [])
+
+    
+
+    # Parsed extractor data is cached per base ROM under build/gl_parse_cache
+
+    parse_cache = None if args.no_cache else ParseCache()
+
+    if args.clear_cache:
+
+        ParseCache().clear()
+
+        StepCache(None).clear()
+
+        CustomSetBundle().clear()
+
+
+
+    # Batch mode: parse once, fan the seeds out over worker processes
+
+    seeds = parse_seed_list(args)
+
+    if args.replay and (seeds is not None or args.step_cache):
+
+        parser.error("--replay regenerates a single ROM; it can't be combined with --seeds, --seed-range or --step-cache")
+
+    if seeds is not None:
+
+        failed = run_batch(args, seeds, verbosity_overrides, parse_cache)
+
+        print(f"Done: {len(seeds) - len(failed)}/{len(seeds)} seeds written to {repr(args.output_dir)}")
+
+        sys.exit(1 if failed else 0)
+
+
+
+    # Handle random seed - generate one if not specified, and always display it
+
+    # A replay uses the journal's seed, which the rest of the run (IVs, EVs, items, ...) still draws from
+
+    replay = DecisionReplay(args.replay) if args.replay else None
+
+    if args.seed is not None:
+
+        seed = int(args.seed)
+
+    elif replay is not None and replay.seed is not None:
+
+        seed = replay.seed
+
+    else:
+
+        seed = random.randint(0, 2**32 - 1)
+
+    random.seed(seed)
+
+    print(f"Random seed: {seed}")
+
+    
+
+    # Create context and load data
+
+    profiler = PipelineProfiler() if args.profile else None
+
+    ctx = load_base_context(verbosity_overrides, parse_cache, profiler)
+    ctx.seed = seed
+
+    step_cache = StepCache(base_rom_digest()) if args.step_cache else None
+
+    ctx.journal = DecisionJournal(f"{OUTPUT_ROM_NAME}.journal", seed) if args.journal else None
+
+    ctx.replay = replay
+
+    run_randomizer(ctx, args, step_cache)
+
+    if ctx.journal is not None:
+
+        ctx.journal.close()
+
+    if replay is not None:
+
+        replay.check_finished()
+
+        print(f"Replayed {replay.replayed} decisions from {args.replay}")
+
+    if profiler is not None:
+
+        write_profile(profiler, args.profile)
+
+
+    if parse_cache is not None:
+
+        print(f"Parse cache: {parse_cache.hits} hits, {parse_cache.misses} misses")
+
+    if step_cache is not None:
+
+        print(f"Step cache: {step_cache.hits} hits, {step_cache.misses} misses")
+
+    if (ctx.verbosity_map.get([]) or 0) >= 1:
+
+        print(f"Filter cache: {ctx.filter_cache_hits} hits, {ctx.filter_cache_misses} misses")
+
+    
+
+    # Save modified ROM
+
+    save_output(ctx.rom, OUTPUT_ROM_NAME, args.patch)
+
+
+
     print("Done")
 
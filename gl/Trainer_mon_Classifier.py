@@ -13,7 +13,7 @@ import re
 from framework import Step
 from steps import Trainers, TrainerData, TrainerInfo, Mons, IdentifyTier, Moves, LoadAbilityNames
 from enums import Type, TrainerClass, Tier, Item, MonClass
-from TypeEffectiveness import get_all_weaknesses, get_4x_weaknesses, get_type_effectiveness
+from TypeEffectiveness import EFFECTIVENESS, get_all_weaknesses, get_4x_weaknesses
 
 
 
@@ -42,26 +42,21 @@ class TrainerMonClassifier:
         self.type_effectiveness = {}
         self._build_type_effectiveness_table()
         
+        # Two-layer classification cache, see classify_pokemon
+        self._species_layer = {}  # species_id -> (species signature, stat/type classifications)
+        self._set_layer = {}  # (species_id, moves, ability) -> (species signature, Moves entries, classifications)
+        self.species_hits = self.species_misses = 0
+        self.set_hits = self.set_misses = 0
+        
     def _build_type_effectiveness_table(self):
         """
         Build a lookup dictionary for type effectiveness using TypeEffectiveness module.
         This allows for quick lookup of matchups for weakness detection.
         """
-        # Get all standard types (excluding STELLAR)
-        standard_types = list(Type)
-        
-        # Initialize all type combinations with normal effectiveness (1.0)
-        for atk_type in standard_types:
-            self.type_effectiveness[atk_type.value] = {}
-            for def_type in standard_types:
-                self.type_effectiveness[atk_type.value][def_type.value] = 1.0
-        
-        # Apply type effectiveness from TypeEffectiveness module
-        for atk_type in standard_types:
-            for def_type in standard_types:
-                # Get effectiveness from TypeEffectiveness module
-                effectiveness = get_type_effectiveness(atk_type, def_type)
-                self.type_effectiveness[atk_type.value][def_type.value] = effectiveness
+        # Nested dict view of the precomputed matrix, keyed by type value
+        self.type_effectiveness = {
+            atk_type: dict(enumerate(row)) for atk_type, row in enumerate(EFFECTIVENESS.tolist())
+        }
         
         # Load move data
         self.move_data = self.context.get(Moves)
@@ -167,11 +162,18 @@ class TrainerMonClassifier:
         """
         Classify a Pokémon according to various criteria.
         
+        Results are cached in two layers: stat- and type-based classifications
+        per species, and complete results per (species, moves, ability). An
+        entry is reused only while the species' stats and types and the Moves
+        entries it was built from are unchanged, so edits to Mons or Moves
+        invalidate it.
+        
         Args:
             pokemon: The Pokémon to classify.
             
         Returns:
             dict: A dictionary containing detailed classifications and a set of MonClass enum values.
+                  The MonClass set is the caller's own; other values are shared and must not be modified.
         """
         classifications = {}
         
@@ -182,22 +184,71 @@ class TrainerMonClassifier:
             print(f"Warning: No species data for Pokémon ID {pokemon.species_id}")
             return classifications
         
-        # Stat-based classifications
-        self._classify_by_stats(pokemon, mon, classifications)
+        moves = tuple(pokemon.moves) if hasattr(pokemon, 'moves') else None
+        ability = pokemon.ability if hasattr(pokemon, 'ability') else None
+        signature = self._species_signature(mon)
+        move_entries = self._move_entries(moves)
         
-        # Type-based classifications
-        self._classify_by_types(pokemon, mon, classifications)
-        
-        # Move-based classifications
-        if hasattr(pokemon, 'moves'):
-            self._classify_by_moves(pokemon, classifications)
-        
-        # Ability-based classifications
-        if hasattr(pokemon, 'ability'):
-            self._classify_by_ability(pokemon, classifications)
+        key = (pokemon.species_id, moves, ability)
+        entry = self._set_layer.get(key)
+        if entry is not None and entry[0] == signature and self._same_entries(entry[1], move_entries):
+            self.set_hits += 1
+        else:
+            self.set_misses += 1
+            # Stat- and type-based classifications
+            classifications.update(self._species_classifications(pokemon, mon, signature))
+            classifications['MonClass'] = set(classifications['MonClass'])
+            
+            # Move-based classifications
+            if moves is not None:
+                self._classify_by_moves(pokemon, classifications)
+            
+            # Ability-based classifications
+            if ability is not None:
+                self._classify_by_ability(pokemon, classifications)
+            
+            entry = self._set_layer[key] = (signature, move_entries, classifications)
         
+        return {**entry[2], 'MonClass': set(entry[2]['MonClass'])}
+    
+    def _species_classifications(self, pokemon, mon, signature):
+        """Stat- and type-based classifications for pokemon's species, from the species layer."""
+        entry = self._species_layer.get(pokemon.species_id)
+        if entry is not None and entry[0] == signature:
+            self.species_hits += 1
+            return entry[1]
+        
+        self.species_misses += 1
+        classifications = {}
+        self._classify_by_stats(pokemon, mon, classifications)
+        self._classify_by_types(pokemon, mon, classifications)
+        self._species_layer[pokemon.species_id] = (signature, classifications)
         return classifications
     
+    @staticmethod
+    def _species_signature(mon):
+        """The species fields classifications depend on."""
+        return (mon.hp, mon.attack, mon.defense, mon.sp_attack, mon.sp_defense, mon.speed, mon.type1, mon.type2)
+    
+    def _move_entries(self, moves):
+        if not moves:
+            return ()
+        data = self.move_data.data
+        return tuple(data[move_id] if 0 < move_id < len(data) else None for move_id in moves)
+    
+    @staticmethod
+    def _same_entries(a, b):
+        return len(a) == len(b) and all(x is y for x, y in zip(a, b))
+    
+    def cache_stats(self):
+        """Hit and miss counts of both cache layers."""
+        return {
+            'species_hits': self.species_hits,
+            'species_misses': self.species_misses,
+            'set_hits': self.set_hits,
+            'set_misses': self.set_misses,
+        }
+    
     def _classify_by_stats(self, pokemon, mon, classifications):
         """
         Apply stat-based classifications.
@@ -9,8 +9,15 @@ Each list represents a different effectiveness multiplier:
 - no_eff: No effect (0x)
 
 Using Type enum directly for clarity and maintainability.
+
+The lists are compiled at import into EFFECTIVENESS, an attack x defense
+matrix indexed by Type value, and WEAKNESS_TABLE, the multiplier of every
+attacking type against every (type1, type2) pair. The functions below are
+lookups into those tables.
 """
 
+import numpy as np
+
 from enums import Type
 
 # Not very effective (0.5x) - attacker does half damage to defender
@@ -211,6 +218,62 @@ no_eff = [
     (Type.DRAGON, Type.FAIRY),  # if implemented
 ]
 
+# Attack x defense multipliers, indexed by Type value
+EFFECTIVENESS = np.ones((len(Type), len(Type)))
+for _attack, _defend in not_eff:
+    EFFECTIVENESS[_attack, _defend] *= 0.5
+for _attack, _defend in sup_eff:
+    EFFECTIVENESS[_attack, _defend] *= 2.0
+for _attack, _defend in no_eff:
+    EFFECTIVENESS[_attack, _defend] = 0.0
+
+# Defensive index for anything that isn't a Type: neutral to every attack, as
+# a value missing from the lists above always was (e.g. construct enum strings)
+NEUTRAL = len(Type)
+
+# WEAKNESS_TABLE[type1, type2] is the vector of multipliers of every attacking
+# type against that pair; the diagonal holds the single-type vectors
+_DEFENSE = np.hstack([EFFECTIVENESS, np.ones((len(Type), 1))])
+WEAKNESS_TABLE = _DEFENSE.T[:, None, :] * _DEFENSE.T[None, :, :]
+WEAKNESS_TABLE[np.arange(NEUTRAL + 1), np.arange(NEUTRAL + 1)] = _DEFENSE.T
+EFFECTIVENESS.flags.writeable = False
+WEAKNESS_TABLE.flags.writeable = False
+
+_TYPES = list(Type)
+_INDEX = {t: t.value for t in Type}
+
+def weakness_vector(defend_type1, defend_type2=None):
+    """
+    Multipliers of every attacking type (in Type order) against a Pokémon with given type(s).
+    
+    Args:
+        defend_type1: Primary Type enum of the Pokémon
+        defend_type2: Secondary Type enum of the Pokémon (if any)
+        
+    Returns:
+        numpy.ndarray: Read-only view of WEAKNESS_TABLE, one multiplier per Type
+    """
+    i = _INDEX.get(defend_type1, NEUTRAL)
+    j = i if defend_type2 is None or defend_type1 == defend_type2 else _INDEX.get(defend_type2, NEUTRAL)
+    return WEAKNESS_TABLE[i, j]
+
+def weakness_profiles(type1_values, type2_values):
+    """
+    Weakness vectors for many type pairs at once.
+    
+    Args:
+        type1_values: Array of primary type values
+        type2_values: Array of secondary type values (equal to the primary for single-typed)
+        
+    Returns:
+        numpy.ndarray: Shape (len(type1_values), len(Type)); values outside Type count as neutral
+    """
+    type1_values = np.asarray(type1_values, dtype=np.intp)
+    type2_values = np.asarray(type2_values, dtype=np.intp)
+    i = np.where((type1_values >= 0) & (type1_values < NEUTRAL), type1_values, NEUTRAL)
+    j = np.where((type2_values >= 0) & (type2_values < NEUTRAL), type2_values, NEUTRAL)
+    return WEAKNESS_TABLE[i, j]
+
 def get_type_effectiveness(attack_type, defend_type):
     """
     Calculate effectiveness multiplier of an attack type against a defending type.
@@ -222,22 +285,11 @@ def get_type_effectiveness(attack_type, defend_type):
     Returns:
         float: Effectiveness multiplier (0.0, 0.5, 1.0, or 2.0)
     """
-    # Default effectiveness is neutral (1.0x)
-    effectiveness = 1.0
-    
-    # Check if attack has no effect (0x)
-    if (attack_type, defend_type) in no_eff:
-        return 0.0
-    
-    # Check if attack is not very effective (0.5x)
-    if (attack_type, defend_type) in not_eff:
-        effectiveness *= 0.5
-    
-    # Check if attack is super effective (2x)
-    if (attack_type, defend_type) in sup_eff:
-        effectiveness *= 2.0
-    
-    return effectiveness
+    attack = _INDEX.get(attack_type)
+    defend = _INDEX.get(defend_type)
+    if attack is None or defend is None:
+        return 1.0
+    return float(EFFECTIVENESS[attack, defend])
 
 def get_dual_type_effectiveness(attack_type, defend_type1, defend_type2=None):
     """
@@ -251,15 +303,10 @@ def get_dual_type_effectiveness(attack_type, defend_type1, defend_type2=None):
     Returns:
         float: Effectiveness multiplier (0.0, 0.25, 0.5, 1.0, 2.0, or 4.0)
     """
-    # If there's only one defending type, use simple effectiveness
-    if defend_type2 is None or defend_type1 == defend_type2:
-        return get_type_effectiveness(attack_type, defend_type1)
-    
-    # For dual-type, multiply the effectiveness against each type
-    type1_effectiveness = get_type_effectiveness(attack_type, defend_type1)
-    type2_effectiveness = get_type_effectiveness(attack_type, defend_type2)
-    
-    return type1_effectiveness * type2_effectiveness
+    attack = _INDEX.get(attack_type)
+    if attack is None:
+        return 1.0
+    return float(weakness_vector(defend_type1, defend_type2)[attack])
 
 def get_all_weaknesses(defend_type1, defend_type2=None):
     """
@@ -272,18 +319,9 @@ def get_all_weaknesses(defend_type1, defend_type2=None):
     Returns:
         dict: Dictionary mapping attacking Type enum to effectiveness multiplier
     """
-    weaknesses = {}
-    
-    # Check effectiveness of each attack type against the defending type(s)
-    for attack_type in Type:
-            
-        effectiveness = get_dual_type_effectiveness(attack_type, defend_type1, defend_type2)
-        
-        # Only include non-neutral effectiveness
-        if effectiveness != 1.0:
-            weaknesses[attack_type] = effectiveness
-    
-    return weaknesses
+    vector = weakness_vector(defend_type1, defend_type2)
+    # Only include non-neutral effectiveness
+    return {_TYPES[i]: float(vector[i]) for i in np.flatnonzero(vector != 1.0)}
 
 def get_4x_weaknesses(defend_type1, defend_type2=None):
     """
@@ -296,5 +334,5 @@ def get_4x_weaknesses(defend_type1, defend_type2=None):
     Returns:
         list: List of Type enums that the Pokémon is 4x weak to
     """
-    weaknesses = get_all_weaknesses(defend_type1, defend_type2)
-    return [attack_type for attack_type, effectiveness in weaknesses.items() if effectiveness >= 4.0]
+    vector = weakness_vector(defend_type1, defend_type2)
+    return [_TYPES[i] for i in np.flatnonzero(vector >= 4.0)]
@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""
+BPS patches between a base NDS ROM and a randomized one.
+
+create_rom_patch() builds the patch at file granularity: it pairs up the
+regions of both images (header, ARM9/ARM7, overlay tables, FNT, FAT, banner
+and every FAT file) and only compares bytes inside regions that differ, so a
+128 MB ROM is never diffed byte by byte. Unchanged regions become SourceCopy
+actions no matter where the target layout moved them.
+
+create_edit_patch() builds one from (offset, bytes) edits over the base
+image instead, as rom_writer.plan_rom() lays out a modified ndspy ROM: the
+target is never built, only the edited bytes are compared with the source
+and everything else is read from it.
+
+apply_patch() is a plain BPS applier with CRC checks, so patches can also be
+applied with any BPS tool (Flips, beat, ...).
+
+  python gl/bps.py create <base.nds> <randomized.nds> <out.bps>
+  python gl/bps.py apply <base.nds> <patch.bps> <out.nds>
+"""
+import bisect
+import struct
+import sys
+import zlib
+
+BPS_MAGIC = b"BPS1"
+
+SOURCE_READ = 0
+TARGET_READ = 1
+SOURCE_COPY = 2
+TARGET_COPY = 3
+
+# Changed regions are compared against their source region in blocks of this
+# size; matching blocks are copied from the source instead of stored
+BLOCK_SIZE = 64
+
+# Size of the banner by version (header field at the start of the banner)
+BANNER_SIZES = {1: 0x840, 2: 0x940, 3: 0xA40, 0x103: 0x23C0}
+
+
+class PatchError(Exception):
+    """Raised for malformed patches or a source/target that fails its CRC check."""
+
+
+def encode_number(n):
+    out = bytearray()
+    while True:
+        x = n & 0x7F
+        n >>= 7
+        if n == 0:
+            out.append(0x80 | x)
+            return bytes(out)
+        out.append(x)
+        n -= 1
+
+
+def _decode_number(patch, pos):
+    data, shift = 0, 1
+    while True:
+        if pos >= len(patch):
+            raise PatchError("truncated number")
+        x = patch[pos]
+        pos += 1
+        data += (x & 0x7F) * shift
+        if x & 0x80:
+            return data, pos
+        shift <<= 7
+        data += shift
+
+
+def _encode_signed(n):
+    return encode_number((abs(n) << 1) | (n < 0))
+
+
+def rom_regions(image):
+    """Map region key -> (start, end) for the parts of an NDS image ndspy lays out.
+
+    Keys are "header", "arm9", "arm7", "fnt", "fat", "arm9ovt", "arm7ovt",
+    "banner" and ("file", id) for FAT entries. Empty regions are left out.
+    """
+    def u32(offset):
+        return struct.unpack_from("<I", image, offset)[0]
+
+    regions = {"header": (0, min(u32(0x84) or 0x200, len(image)))}
+    for name, offset_field in (("arm9", 0x20), ("arm7", 0x30)):
+        regions[name] = (u32(offset_field), u32(offset_field) + u32(offset_field + 0xC))
+    for name, offset_field in (("fnt", 0x40), ("fat", 0x48), ("arm9ovt", 0x50), ("arm7ovt", 0x58)):
+        regions[name] = (u32(offset_field), u32(offset_field) + u32(offset_field + 4))
+
+    banner = u32(0x68)
+    if banner and banner + 2 <= len(image):
+        version = struct.unpack_from("<H", image, banner)[0]
+        regions["banner"] = (banner, banner + BANNER_SIZES.get(version, 0x840))
+
+    fat_start, fat_end = regions["fat"]
+    for file_id, offset in enumerate(range(fat_start, fat_end, 8)):
+        start, end = struct.unpack_from("<II", image, offset)
+        regions[("file", file_id)] = (start, end)
+
+    return {key: (start, min(end, len(image))) for key, (start, end) in regions.items()
+            if start < end and start < len(image)}
+
+
+class _PatchWriter:
+    """Accumulates BPS actions, merging adjacent ones of the same kind."""
+
+    def __init__(self, source, target):
+        self.source = source
+        self.target = target
+        self.actions = bytearray()
+        self.output_offset = 0
+        self.source_relative = 0
+        self.target_relative = 0
+        self._pending = None  # [command, start, length, source_start]
+
+    def copy_from_source(self, source_start, length):
+        if not length:
+            return
+        pending = self._pending
+        if pending and pending[0] == SOURCE_COPY and pending[3] + pending[2] == source_start:
+            pending[2] += length
+        else:
+            self._flush()
+            self._pending = [SOURCE_COPY, self.output_offset, length, source_start]
+        self.output_offset += length
+
+    def take_from_target(self, length):
+        if not length:
+            return
+        start = self.output_offset
+        end = start + length
+        # Long runs of one byte (padding) become one byte plus a TargetCopy of itself
+        if length > 16 and self.target[start:end] == self.target[start:start + 1] * length:
+            self._emit_target_read(start, 1)
+            self._flush()
+            self.actions += encode_number(((length - 2) << 2) | TARGET_COPY)
+            self.actions += _encode_signed(start - self.target_relative)
+            self.target_relative = start + length - 1
+        else:
+            self._emit_target_read(start, length)
+        self.output_offset = end
+
+    def _emit_target_read(self, start, length):
+        pending = self._pending
+        if pending and pending[0] == TARGET_READ and pending[1] + pending[2] == start:
+            pending[2] += length
+        else:
+            self._flush()
+            self._pending = [TARGET_READ, start, length, None]
+
+    def _flush(self):
+        if self._pending is None:
+            return
+        command, start, length, source_start = self._pending
+        self._pending = None
+        if command == SOURCE_COPY and source_start == start:
+            # Same offset in both images
+            self.actions += encode_number(((length - 1) << 2) | SOURCE_READ)
+        elif command == SOURCE_COPY:
+            self.actions += encode_number(((length - 1) << 2) | SOURCE_COPY)
+            self.actions += _encode_signed(source_start - self.source_relative)
+            self.source_relative = source_start + length
+        else:
+            self.actions += encode_number(((length - 1) << 2) | TARGET_READ)
+            self.actions += self.target[start:start + length]
+
+    def finish(self, metadata=b"", target_crc=None):
+        self._flush()
+        patch = bytearray(BPS_MAGIC)
+        patch += encode_number(len(self.source))
+        patch += encode_number(len(self.target))
+        patch += encode_number(len(metadata))
+        patch += metadata
+        patch += self.actions
+        if target_crc is None:
+            target_crc = zlib.crc32(self.target)
+        patch += struct.pack("<II", zlib.crc32(self.source), target_crc)
+        patch += struct.pack("<I", zlib.crc32(patch))
+        return bytes(patch)
+
+
+def _emit_region(writer, source, target, source_start, source_end, length):
+    """Emit one target region that corresponds to source[source_start:source_end]."""
+    start = writer.output_offset
+    # Past the end of the source (target outgrew it) nothing can be copied
+    common = max(0, min(length, source_end - source_start))
+    if target[start:start + common] == source[source_start:source_start + common]:
+        writer.copy_from_source(source_start, common)
+    else:
+        for offset in range(0, common, BLOCK_SIZE):
+            size = min(BLOCK_SIZE, common - offset)
+            if target[start + offset:start + offset + size] == source[source_start + offset:source_start + offset + size]:
+                writer.copy_from_source(source_start + offset, size)
+            else:
+                writer.take_from_target(size)
+    writer.take_from_target(length - common)
+
+
+def create_rom_patch(source, target, metadata=b""):
+    """Return a BPS patch that turns NDS image source into NDS image target."""
+    source = bytes(source)
+    target = bytes(target)
+    source_regions = rom_regions(source)
+    target_regions = sorted(rom_regions(target).items(), key=lambda item: item[1])
+    writer = _PatchWriter(source, target)
+
+    for key, (start, end) in target_regions:
+        if start < writer.output_offset:
+            continue  # overlaps a region already emitted (zero-length or shared files)
+        # Bytes between regions (alignment padding, ARM9 footer, ...)
+        _emit_region(writer, source, target, writer.output_offset, len(source), start - writer.output_offset)
+        if key in source_regions:
+            _emit_region(writer, source, target, *source_regions[key], end - start)
+        else:
+            writer.take_from_target(end - start)
+    _emit_region(writer, source, target, writer.output_offset, len(source), len(target) - writer.output_offset)
+
+    return writer.finish(metadata)
+
+
+class _EditedImage:
+    """source with edits written over it in order, read by slice without building the whole image."""
+
+    def __init__(self, source, edits):
+        self.source = source
+        self.starts = []
+        self.segments = []  # [(start, bytes)], sorted and non-overlapping
+        for offset, data in edits:
+            if data:
+                self._write(offset, bytes(data))
+        self.size = max([len(source)] + [start + len(data) for start, data in self.segments])
+
+    def __len__(self):
+        return self.size
+
+    def _write(self, offset, data):
+        end = offset + len(data)
+        lo = bisect.bisect_right(self.starts, offset)
+        if lo and self.starts[lo - 1] + len(self.segments[lo - 1][1]) > offset:
+            lo -= 1
+        hi = bisect.bisect_left(self.starts, end)
+        if lo < hi:
+            # Merge with the segments it overlaps
+            start = min(offset, self.starts[lo])
+            last_start, last_data = self.segments[hi - 1]
+            merged = bytearray(self._read(start, max(end, last_start + len(last_data))))
+            merged[offset - start:end - start] = data
+            offset, data = start, bytes(merged)
+        self.starts[lo:hi] = [offset]
+        self.segments[lo:hi] = [(offset, data)]
+
+    def _read(self, start, stop):
+        out = bytearray()
+        i = max(0, bisect.bisect_right(self.starts, start) - 1)
+        pos = start
+        while pos < stop:
+            if i < len(self.segments) and self.starts[i] <= pos < self.starts[i] + len(self.segments[i][1]):
+                segment_start, data = self.segments[i]
+                chunk = data[pos - segment_start:stop - segment_start]
+                i += 1
+            else:
+                if i < len(self.segments) and self.starts[i] < pos:
+                    i += 1
+                    continue
+                gap_end = min(stop, self.starts[i]) if i < len(self.segments) else stop
+                chunk = self.source[pos:gap_end].ljust(gap_end - pos, b"\0")
+            out += chunk
+            pos += len(chunk)
+        return bytes(out)
+
+    def __getitem__(self, index):
+        start, stop, _ = index.indices(self.size)
+        return self._read(start, max(start, stop))
+
+    def crc32(self):
+        crc = 0
+        pos = 0
+        for start, data in self.segments:
+            crc = zlib.crc32(self.source[pos:start], crc)
+            crc = zlib.crc32(data, crc)
+            pos = start + len(data)
+        return zlib.crc32(self.source[pos:], crc)
+
+
+def create_edit_patch(source, edits, metadata=b""):
+    """Return a BPS patch that turns source into source with edits [(offset, bytes)] written over it in order.
+
+    The edits may run past the end of source. Edited bytes are compared with
+    the source at the same offset; everything else is a SourceRead.
+    """
+    source = bytes(source)
+    target = _EditedImage(source, edits)
+    writer = _PatchWriter(source, target)
+    for start, data in target.segments:
+        writer.copy_from_source(writer.output_offset, start - writer.output_offset)
+        _emit_region(writer, source, target, start, len(source), len(data))
+    writer.copy_from_source(writer.output_offset, len(target) - writer.output_offset)
+    return writer.finish(metadata, target.crc32())
+
+
+def apply_patch(source, patch):
+    """Apply BPS patch to source, returning the target bytes."""
+    source = bytes(source)
+    patch = bytes(patch)
+    if patch[:4] != BPS_MAGIC:
+        raise PatchError("not a BPS patch")
+    if len(patch) < 16 or zlib.crc32(patch[:-4]) != struct.unpack_from("<I", patch, len(patch) - 4)[0]:
+        raise PatchError("patch checksum mismatch")
+
+    source_crc, target_crc = struct.unpack_from("<II", patch, len(patch) - 12)
+    if zlib.crc32(source) != source_crc:
+        raise PatchError("source ROM does not match the patch's base ROM")
+
+    pos = 4
+    source_size, pos = _decode_number(patch, pos)
+    target_size, pos = _decode_number(patch, pos)
+    metadata_size, pos = _decode_number(patch, pos)
+    pos += metadata_size
+    if source_size != len(source):
+        raise PatchError(f"source is {len(source)} bytes, patch expects {source_size}")
+
+    target = bytearray(target_size)
+    output = 0
+    source_relative = 0
+    target_relative = 0
+    end = len(patch) - 12
+    while pos < end:
+        data, pos = _decode_number(patch, pos)
+        command = data & 3
+        length = (data >> 2) + 1
+        if output + length > target_size:
+            raise PatchError("action writes past the end of the target")
+        if command == SOURCE_READ:
+            target[output:output + length] = source[output:output + length]
+        elif command == TARGET_READ:
+            target[output:output + length] = patch[pos:pos + length]
+            pos += length
+        else:
+            offset, pos = _decode_number(patch, pos)
+            offset = -(offset >> 1) if offset & 1 else offset >> 1
+            if command == SOURCE_COPY:
+                source_relative += offset
+                target[output:output + length] = source[source_relative:source_relative + length]
+                source_relative += length
+            else:
+                target_relative += offset
+                if target_relative + length <= output:
+                    target[output:output + length] = target[target_relative:target_relative + length]
+                else:
+                    # Overlapping copy repeats earlier output (run-length fill)
+                    for i in range(length):
+                        target[output + i] = target[target_relative + i]
+                target_relative += length
+        output += length
+
+    if output != target_size:
+        raise PatchError(f"patch produced {output} bytes, expected {target_size}")
+    if zlib.crc32(target) != target_crc:
+        raise PatchError("patched ROM checksum mismatch")
+    return bytes(target)
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) != 4 or args[0] not in ("create", "apply"):
+        print(f"Usage: python {sys.argv[0]} create <base.nds> <randomized.nds> <out.bps>")
+        print(f"       python {sys.argv[0]} apply <base.nds> <patch.bps> <out.nds>")
+        return 1
+
+    command, base_path, second_path, out_path = args
+    with open(base_path, "rb") as f:
+        base = f.read()
+    with open(second_path, "rb") as f:
+        second = f.read()
+
+    result = create_rom_patch(base, second) if command == "create" else apply_patch(base, second)
+    with open(out_path, "wb") as f:
+        f.write(result)
+    print(f"Wrote {len(result)} bytes to {out_path!r}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Binary journal of decide() results, written instead of (or next to) the
+verbosity-2 console lines.
+
+The file is a header (magic, version, the run's seed as text) followed by
+an append-only stream of records:
+  - string   (tag 0): u32 byte length + UTF-8 text. Strings are numbered in
+                      the order they appear; paths and labels refer to them.
+  - decision (tag 1): fixed 25 bytes, see _DECISION.
+A decision stores its path, the labels of the original and selected values
+(their name, or repr() like the console log), the index of the selected
+value in the candidate list (-1 if the original was kept) and the number of
+candidates before and after filtering.
+
+Records are kept in memory until flush(); run_pipeline flushes after every
+step, so a crashed run leaves a readable prefix. Use render_journal.py to
+read one, and DecisionReplay to make a run return the recorded selections.
+"""
+import struct
+from collections import defaultdict, deque
+from typing import NamedTuple
+
+MAGIC = b"GLDJ"
+VERSION = 2
+
+_HEADER = struct.Struct("<4sHI")  # magic, version, seed text length
+_TAG = struct.Struct("<B")
+_STRING = struct.Struct("<I")
+# path id, original label id, selected label id, selected index, candidates, filtered
+_DECISION = struct.Struct("<IIIiII")
+
+TAG_STRING = 0
+TAG_DECISION = 1
+
+
+class JournalFormatError(Exception):
+    """The file is not a decision journal, or is from an incompatible version."""
+
+
+class JournalDivergence(Exception):
+    """A replayed run asked for a decision the journal doesn't match."""
+
+
+class Decision(NamedTuple):
+    path: str
+    original: str
+    selected: str
+    index: int
+    candidates: int
+    filtered: int
+
+
+def label(value):
+    """Text a value is recorded as, matching decide()'s console output."""
+    return value.name if hasattr(value, "name") else repr(value)
+
+
+class DecisionJournal:
+    """Collects decisions and appends them to a journal file."""
+
+    def __init__(self, path, seed=None):
+        self.path = path
+        self.records = []  # Decision tuples; run_parallel and StepCache copy these between runs of a step
+        self._written = 0
+        self._string_ids = {}
+        self._file = open(path, "wb")
+        seed_text = b"" if seed is None else str(seed).encode("utf-8")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(seed_text)) + seed_text)
+
+    def record(self, path, original, selected, index, candidates, filtered):
+        self.records.append(Decision(path, label(original), label(selected), index, candidates, filtered))
+
+    def _string_id(self, text, out):
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = self._string_ids[text] = len(self._string_ids)
+            data = text.encode("utf-8")
+            out += _TAG.pack(TAG_STRING) + _STRING.pack(len(data)) + data
+        return string_id
+
+    def flush(self):
+        """Append the records collected since the last flush to the file."""
+        out = bytearray()
+        for decision in self.records[self._written:]:
+            ids = [self._string_id(text, out) for text in decision[:3]]
+            out += _TAG.pack(TAG_DECISION) + _DECISION.pack(*ids, *decision[3:])
+        self._written = len(self.records)
+        self._file.write(out)
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_header(data, path):
+    """Return (seed, offset of the first record)."""
+    if len(data) < _HEADER.size:
+        raise JournalFormatError(f"{path}: too short for a decision journal")
+    magic, version, seed_length = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise JournalFormatError(f"{path}: not a decision journal")
+    if version != VERSION:
+        raise JournalFormatError(f"{path}: journal version {version}, expected {VERSION}")
+    seed_text = data[_HEADER.size:_HEADER.size + seed_length].decode("utf-8")
+    return (int(seed_text) if seed_text else None), _HEADER.size + seed_length
+
+
+def read_journal_seed(path):
+    """Seed the journaled run used, or None if it had none."""
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) == _HEADER.size:
+            header += f.read(_HEADER.unpack(header)[2])
+    return _read_header(header, path)[0]
+
+
+def read_journal(path):
+    """Yield the Decisions in a journal file, in the order they were recorded."""
+    with open(path, "rb") as f:
+        data = f.read()
+    _, offset = _read_header(data, path)
+
+    strings = []
+    while offset < len(data):
+        tag, = _TAG.unpack_from(data, offset)
+        offset += _TAG.size
+        if tag == TAG_STRING:
+            length, = _STRING.unpack_from(data, offset)
+            offset += _STRING.size
+            strings.append(data[offset:offset + length].decode("utf-8"))
+            offset += length
+        elif tag == TAG_DECISION:
+            path_id, original_id, selected_id, index, candidates, filtered = _DECISION.unpack_from(data, offset)
+            offset += _DECISION.size
+            yield Decision(strings[path_id], strings[original_id], strings[selected_id], index, candidates, filtered)
+        else:
+            raise JournalFormatError(f"{path}: unknown record tag {tag} at offset {offset - _TAG.size}")
+
+
+class DecisionReplay:
+    """Serves a journal's selections back to decide(), in recorded order per path.
+    
+    Every call must match the recorded decision for its path: same original,
+    same number of candidates, and the recorded candidate index must hold a
+    value with the recorded label. Anything else raises JournalDivergence.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.seed = read_journal_seed(path)
+        self._pending = defaultdict(deque)
+        for decision in read_journal(path):
+            self._pending[decision.path].append(decision)
+        self.replayed = 0
+
+    def select(self, path, original, candidates):
+        """The recorded Decision for this call; its index is the selection in candidates, or -1 for the original."""
+        pending = self._pending.get(path)
+        if not pending:
+            raise JournalDivergence(f"{path}: no recorded decision left in {self.path}")
+        decision = pending.popleft()
+        if label(original) != decision.original:
+            raise JournalDivergence(f"{path}: original is {label(original)}, journal has {decision.original}")
+        if len(candidates) != decision.candidates:
+            raise JournalDivergence(f"{path}: {len(candidates)} candidates, journal has {decision.candidates}")
+        if decision.index >= 0 and label(candidates[decision.index]) != decision.selected:
+            raise JournalDivergence(f"{path}: candidate {decision.index} is {label(candidates[decision.index])}, "
+                                    f"journal selected {decision.selected}")
+        self.replayed += 1
+        return decision
+
+    def check_finished(self):
+        """Raise JournalDivergence if the run made fewer decisions than the journal holds."""
+        left = {path: len(pending) for path, pending in self._pending.items() if pending}
+        if left:
+            first = sorted(left)[:5]
+            raise JournalDivergence(f"{sum(left.values())} recorded decisions were never replayed, "
+                                    f"e.g. under {', '.join(first)}")
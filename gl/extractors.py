@@ -1,10 +1,19 @@
+import bisect
 import json
+import math
+import numpy as np
 from framework import *
 from enums import Type, Split
 from form_mapping import FormMapping
+from TypeEffectiveness import weakness_profiles
 
 
 class Moves(NarcExtractor):
+    LAZY_NARC = True
+    FAST_CODEC = True
+    PARSE_CACHE_VERSION = 1
+    PARSE_CACHE_INPUTS = (LoadMoveNamesStep.filename,)
+    
     def __init__(self, context):
         super().__init__(context)
         move_names_step = context.get(LoadMoveNamesStep)
@@ -26,6 +35,7 @@ class Moves(NarcExtractor):
             "move_id" / Computed(lambda ctx: ctx._.narc_index),
             "name" / Computed(lambda ctx: move_names_step.id_to_name.get(ctx._.narc_index, None))
         )
+        self.move_codec = self.compile_codec(self.move_struct)
 
         self.data = self.load_narc()
 
@@ -36,10 +46,10 @@ class Moves(NarcExtractor):
         return self.move_struct
     
     def parse_file(self, file_data, file_index):
-        return self.move_struct.parse(file_data, narc_index=file_index)
+        return self.move_codec.parse(file_data, narc_index=file_index)
     
     def serialize_file(self, data, index):
-        return self.move_struct.build(data, narc_index=index)
+        return self.move_codec.build(data, narc_index=index)
 
 
 class Levelups(NarcExtractor):
@@ -52,7 +62,11 @@ class Levelups(NarcExtractor):
     - Indexed by species ID
     """
     
+    SOURCES = ('Moves',)
+    
     MAX_LEVELUP_MOVES = 46  # From generated learnsets.h
+    FAST_CODEC = True
+    PARSE_CACHE_VERSION = 1
     
     def __init__(self, context):
         super().__init__(context)
@@ -69,6 +83,7 @@ class Levelups(NarcExtractor):
         
         # Giant file structure: GreedyRange of Arrays (46 entries each)
         self.struct = GreedyRange(Array(self.MAX_LEVELUP_MOVES, learnset_entry))
+        self.codec = self.compile_codec(self.struct)
         
         # Filter out terminator entries (move_id == 0xFFFF)
         self.data = [[e for e in s if e.move_id != 0xFFFF] for s in self.load_narc()]
@@ -80,18 +95,30 @@ class Levelups(NarcExtractor):
                 base_id = form_mapping.get_base_species(i)
                 if base_id is not None and base_id < len(self.data):
                     self.data[i] = list(self.data[base_id])
+        
+        # Level-sorted move ids per learnset, so level cutoffs are a bisect (learnsets are not edited)
+        self.sorted_levels = []
+        self.sorted_moves = []
+        for learnset in self.data:
+            entries = sorted(learnset, key=lambda e: e.level)
+            self.sorted_levels.append([e.level for e in entries])
+            self.sorted_moves.append([e.move_id for e in entries])
+    
+    def moves_up_to(self, index, level):
+        """Move ids learnset index learns at or below level, in level order."""
+        return self.sorted_moves[index][:bisect.bisect_right(self.sorted_levels[index], level)]
     
     def get_narc_path(self):
         return "a/0/3/3"
     
     def parse_narc(self, narc_data):
         # Parse the first file as the giant learnset structure
-        return self.struct.parse(narc_data.files[0])
+        return self.codec.parse(narc_data.files[0])
     
     def serialize_narc(self, data):
         # Serialize back to a single-file NARC
         narc_data = ndspy.narc.NARC()
-        narc_data.files = [self.struct.build(data)]
+        narc_data.files = [self.codec.build(data)]
         return narc_data
     
     def parse_file(self, file_data, index):
@@ -173,6 +200,8 @@ class EggMoves(NarcExtractor):
 class LoadTrainerNamesStep(Extractor):
     """Extractor that loads trainer names from assembly source."""
     
+    INPUT_PATHS = (os.path.join("armips", "data", "trainers", "trainers.s"),)
+    
     def __init__(self, context):
         super().__init__(context)
         self.by_id = {}
@@ -195,6 +224,11 @@ class LoadTrainerNamesStep(Extractor):
 
 
 class TrainerTeam(Writeback,NarcExtractor ):
+    SOURCES = ('TrainerData',)
+    
+    # Not lazy: parse_file depends on TrainerData.trainermontype, which steps change
+    FAST_CODEC = True
+    PARSE_CACHE_VERSION = 1
     
     def __init__(self, context):
         mondata_extractor = context.get(Mons)
@@ -211,6 +245,9 @@ class TrainerTeam(Writeback,NarcExtractor ):
         # Store original raw file data for files we can't fully parse (e.g., nummons=0)
         self._original_file_data = {}
         
+        # Team codecs by (trainermontype bytes, nummons)
+        self._team_codecs = {}
+        
         super().__init__(context)
         self.data = self.load_narc()
     
@@ -269,9 +306,22 @@ class TrainerTeam(Writeback,NarcExtractor ):
         # Build the complete struct
         return self.struct_common + Struct(*struct_fields)
     
+    def _get_team_codec(self, trainer):
+        key = (bytes(trainer.trainermontype.data), trainer.nummons)
+        codec = self._team_codecs.get(key)
+        if codec is None:
+            struct = self._build_trainer_pokemon_struct(trainer.trainermontype.data)
+            codec = self._team_codecs[key] = self.compile_codec(Array(trainer.nummons, struct))
+        return codec
+    
     def get_narc_path(self):
         return "a/0/5/6"
     
+    def parse_cache_extra_key(self):
+        # Team layouts come from TrainerData, which may already have been edited
+        return b"".join(bytes(t.trainermontype.data) + t.nummons.to_bytes(1, 'little')
+                        for t in self.context.get(TrainerData).data)
+    
     def parse_file(self, file_data, index):
         # Store original data for files we might not fully parse
         self._original_file_data[index] = file_data
@@ -280,19 +330,19 @@ class TrainerTeam(Writeback,NarcExtractor ):
             return []
         
         trainer = self.context.get(TrainerData).data[index]
-        struct = self._build_trainer_pokemon_struct(trainer.trainermontype.data)
-        
-        return Array(trainer.nummons, struct).parse(file_data)
+        return self._get_team_codec(trainer).parse(file_data)
     
     def serialize_file(self, data, index):
         
         trainer = self.context.get(TrainerData).data[index]
-        struct = self._build_trainer_pokemon_struct(trainer.trainermontype.data)
-        
-        return Array(trainer.nummons, struct).build(data)
+        return self._get_team_codec(trainer).build(data)
 
 
 class TrainerData(Writeback, NarcExtractor):
+    LAZY_NARC = True
+    PARSE_CACHE_VERSION = 1
+    PARSE_CACHE_INPUTS = (os.path.join("armips", "data", "trainers", "trainers.s"),)
+    
     def __init__(self, context):
         trainer_names_step = context.get(LoadTrainerNamesStep)
         
@@ -334,6 +384,8 @@ class TrainerInfo:
         return imaxlvl[0] if len(imaxlvl) == 1 else None
 
 class Trainers(Extractor):
+    SOURCES = ('TrainerData', 'TrainerTeam')
+    
     def __init__(self, context):
         super().__init__(context)
         
@@ -348,6 +400,10 @@ class Trainers(Extractor):
 class Mons(Writeback, NarcExtractor):
     """Extractor for Pokemon data from ROM with full mondata structure."""
     
+    LAZY_NARC = True
+    FAST_CODEC = True
+    PARSE_CACHE_VERSION = 1
+    PARSE_CACHE_INPUTS = (LoadPokemonNamesStep.filename, os.path.join("gl", "form_mapping.py"))
     
     BST_OVERRIDES = {
         "Wishiwashi": 550, 
@@ -413,6 +469,7 @@ class Mons(Writeback, NarcExtractor):
         )
         
         super().__init__(context)
+        self.mondata_codec = self.compile_codec(self.mondata_struct)
         
         self.data = self.load_narc()
     
@@ -451,10 +508,24 @@ class Mons(Writeback, NarcExtractor):
         return "a/0/0/2"
     
     def parse_file(self, file_data, index):
-        return self.mondata_struct.parse(file_data, narc_index=index)
+        return self.mondata_codec.parse(file_data, narc_index=index)
     
     def serialize_file(self, data, index):
-        return self.mondata_struct.build(data, narc_index=index)
+        return self.mondata_codec.build(data, narc_index=index)
+    
+    @property
+    def columns(self):
+        """SpeciesColumns for vectorized filters, with a row for every entry in data."""
+        columns = self.context.species_columns
+        for mon in self.data:
+            columns.add(mon)
+        return columns
+    
+    def weakness_profiles(self):
+        """Multiplier of every attacking type (columns, in Type order) against every entry in data (rows)."""
+        type1 = np.fromiter((int(mon.type1) for mon in self.data), dtype=np.intp, count=len(self.data))
+        type2 = np.fromiter((int(mon.type2) for mon in self.data), dtype=np.intp, count=len(self.data))
+        return weakness_profiles(type1, type2)
     
     def get(self, species_id):
         """
@@ -498,6 +569,68 @@ class Mons(Writeback, NarcExtractor):
         """
         return self.get(species_id)
 
+
+class BstIndex(Extractor):
+    """Mons entries sorted by adjusted BST, for O(log n) nearest-BST and BST-range lookups.
+    
+    Queries take an optional exclude set of pokemon_ids (blacklist, legendary
+    by_id sets, ...). Results come back in Mons.data order, so picking from them
+    with context.decide matches picking from the equivalent filtered mondata.
+    """
+    
+    SOURCES = ('Mons',)
+    
+    def __init__(self, context):
+        super().__init__(context)
+        self.mons = context.get(Mons)
+        # Sorted by (bst, data index); ties keep data order
+        order = sorted(range(len(self.mons.data)), key=lambda i: (self.mons.data[i].bst, i))
+        self._bsts = [self.mons.data[i].bst for i in order]
+        self._species = [self.mons.data[i] for i in order]
+    
+    def nearest(self, bst, exclude=()):
+        """Species whose BST is closest to bst; the first in data order on ties. None if all are excluded."""
+        below = self._first_allowed(self._bst_below(bisect.bisect_right(self._bsts, bst) - 1, exclude), exclude)
+        above = self._first_allowed(self._bst_above(bisect.bisect_left(self._bsts, bst), exclude), exclude)
+        candidates = [s for s in (below, above) if s is not None]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda s: (abs(s.bst - bst), s.pokemon_id))
+    
+    def _bst_below(self, i, exclude):
+        """BST of the first allowed entry at or below position i, or None."""
+        while i >= 0:
+            if self._species[i].pokemon_id not in exclude:
+                return self._bsts[i]
+            i -= 1
+        return None
+    
+    def _bst_above(self, i, exclude):
+        """BST of the first allowed entry at or above position i, or None."""
+        while i < len(self._species):
+            if self._species[i].pokemon_id not in exclude:
+                return self._bsts[i]
+            i += 1
+        return None
+    
+    def _first_allowed(self, bst, exclude):
+        """Allowed species with exactly this BST that comes first in data order."""
+        if bst is None:
+            return None
+        for i in range(bisect.bisect_left(self._bsts, bst), bisect.bisect_right(self._bsts, bst)):
+            if self._species[i].pokemon_id not in exclude:
+                return self._species[i]
+        return None
+    
+    def window(self, lo, hi, exclude=()):
+        """Species with lo <= BST <= hi, in data order."""
+        start = bisect.bisect_left(self._bsts, lo)
+        end = bisect.bisect_right(self._bsts, hi)
+        found = [s for s in self._species[start:end] if s.pokemon_id not in exclude]
+        found.sort(key=lambda s: s.pokemon_id)
+        return found
+
+
 class TMHM(Extractor):
     """Extractor for TM/HM/TR data from machine_moves.json.
     
@@ -538,6 +671,19 @@ class TMHM(Extractor):
         
         print(f"TMHM: Loaded {len(self.data)} machine moves from machine_moves.json", file=sys.stderr)
     
+    def machine_move_table(self, moves):
+        """{(kind, number): move} for every machine, resolved like get_move_for_tm/get_move_for_hm in one pass."""
+        by_name = {}
+        for m in moves.data:
+            if m.name:
+                by_name.setdefault(m.name.upper().replace(' ', '_').replace('-', '_'), m)
+        table = {}
+        for entry in self.data:
+            move = by_name.get(entry['move_name'].replace('MOVE_', ''))
+            if move is not None:
+                table.setdefault((entry['kind'], entry['number']), move)
+        return table
+    
     def get_move_for_tm(self, tm_number, moves):
         """Get move data for a TM number.
         
@@ -577,34 +723,100 @@ class TMHM(Extractor):
         return None
 
 
+class WeightedSampler:
+    """Fenwick tree over non-negative integer slot weights.
+    
+    draw() picks a slot with probability weight / total and set_weight()
+    changes one slot, both in O(log n). A slot with weight 0 is never drawn,
+    so removing an entry is set_weight(slot, 0); live counts the others.
+    """
+    
+    def __init__(self, weights):
+        self.weights = list(weights)
+        if any(weight < 0 for weight in self.weights):
+            raise ValueError("WeightedSampler: weights must be non-negative")
+        self._tree = [0] * (len(self.weights) + 1)
+        for i, weight in enumerate(self.weights, 1):
+            self._tree[i] += weight
+            parent = i + (i & -i)
+            if parent < len(self._tree):
+                self._tree[parent] += self._tree[i]
+        self.total = sum(self.weights)
+        self.live = sum(1 for weight in self.weights if weight)
+        self._top = 1 << (len(self.weights).bit_length() - 1) if self.weights else 0
+    
+    def __len__(self):
+        return len(self.weights)
+    
+    def set_weight(self, slot, weight):
+        if weight < 0:
+            raise ValueError(f"WeightedSampler: negative weight {weight} for slot {slot}")
+        delta = weight - self.weights[slot]
+        self.live += bool(weight) - bool(self.weights[slot])
+        self.weights[slot] = weight
+        self.total += delta
+        i = slot + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+    
+    def find(self, target):
+        """Slot whose cumulative weight range holds target (0 <= target < total)."""
+        pos = 0
+        step = self._top
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= target:
+                pos = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        return pos
+    
+    def draw(self, rng):
+        """Weighted random slot, drawing one integer from rng. total must be > 0."""
+        return self.find(rng.randrange(self.total))
+
+
 class ItemPool(Extractor):
     """Stateful item pool (deck of cards) for randomization.
     
     Manages a pool of items organized by rarity tier. When an item is drawn:
-    - Regular items are returned to the deck and reshuffled
+    - Regular items stay in the pool
     - TMs/TRs are removed from the pool (one-time use)
     
     This ensures each TM appears at most once in the final ROM.
     
     Tiers: 1 (common), 2 (uncommon), 3 (rare), 4 (master)
+    
+    Ground_Item_Tier.csv lines are item_name,rarity[,weight]. The weight
+    column is optional: a non-negative integer, default 1, where 0 keeps the
+    line out of the pool. Lines with any other weight are skipped.
+    
+    Each tier is a WeightedSampler over its CSV lines, and TMs are also
+    indexed per move type, so draws and TM removal are O(log n). Draws with
+    a context and path go through context.decide_weighted, so they are
+    journaled and replayed like decide(); other draws use the pool's own
+    stream.
     """
     
+    @property
+    def random(self):
+        """Draws made without a path use the pool's own stream."""
+        return self.context.rng(["item_pool"])
+    
     def __init__(self, context):
         super().__init__(context)
-        import os
-        import random
-        
-        self.random = random
         self.tmhm = context.get(TMHM)
         
         # Load item pools from Ground_Item_Tier.csv
-        # Format: item_name,rarity (common/uncommon/rare/master)
-        self.pools = {
+        # Format: item_name,rarity (common/uncommon/rare/master)[,weight]
+        self.slots = {
             1: [],  # common
             2: [],  # uncommon
             3: [],  # rare
             4: []   # master
         }
+        weights = {tier: [] for tier in self.slots}
         
         # Map rarity names to tier numbers
         rarity_to_tier = {
@@ -644,11 +856,21 @@ class ItemPool(Extractor):
                 if tier is None:
                     continue
                 
+                # Optional weight column: a non-negative integer, default 1
+                weight_text = parts[2].strip() if len(parts) > 2 else ""
+                if weight_text and not weight_text.isdigit():
+                    print(f"ItemPool: WARNING - Skipping '{item_name}': weight '{weight_text}' "
+                          f"is not a non-negative integer", file=sys.stderr)
+                    continue
+                weight = int(weight_text) if weight_text else 1
+                
                 try:
                     item_id = self._get_item_id(item_name)
-                    self.pools[tier].append(item_id)
                 except ValueError:
                     print(f"ItemPool: WARNING - Could not find item '{item_name}'", file=sys.stderr)
+                    continue
+                self.slots[tier].append(item_id)
+                weights[tier].append(weight)
         
         # Exclude TMs/TRs whose move is UNIMPLEMENTED so they can never be drawn
         # (e.g. given out by NPCs/gym leaders or placed as ground items).
@@ -668,22 +890,64 @@ class ItemPool(Extractor):
                 if move_name in unimplemented_move_names:
                     self.unimplemented_tm_ids.add(entry['item_id'])
         
-        # Remove those TMs from every tier pool and from the TM tracking set.
+        # Give those TMs weight 0 in every tier pool and drop them from the TM tracking set.
         removed = 0
-        for tier in self.pools:
-            before = len(self.pools[tier])
-            self.pools[tier] = [iid for iid in self.pools[tier] if iid not in self.unimplemented_tm_ids]
-            removed += before - len(self.pools[tier])
+        for tier, slots in self.slots.items():
+            for slot, item_id in enumerate(slots):
+                if item_id in self.unimplemented_tm_ids and weights[tier][slot]:
+                    weights[tier][slot] = 0
+                    removed += 1
         self.tm_item_ids -= self.unimplemented_tm_ids
         print(f"ItemPool: Excluded {removed} TM(s) teaching unimplemented moves", file=sys.stderr)
         
-        # Shuffle all pools initially
-        for tier in self.pools:
-            self.random.shuffle(self.pools[tier])
+        self.samplers = {tier: WeightedSampler(weights[tier]) for tier in self.slots}
+        self._index_tms_by_type()
         
-        total = sum(len(p) for p in self.pools.values())
+        total = sum(1 for sampler in self.samplers.values() for weight in sampler.weights if weight)
         print(f"ItemPool: Loaded {total} items across 4 tiers", file=sys.stderr)
     
+    def _index_tms_by_type(self):
+        """Per move type, a sampler over the TM slots of that type in every tier."""
+        self.tm_slots_by_type = {}  # Type -> [(tier, slot)]
+        self.tm_items_by_type = {}  # Type -> [item_id], parallel to tm_slots_by_type
+        self._tm_type_slot = {}  # (tier, slot) -> (Type, position in tm_slots_by_type[Type])
+        type_weights = {}
+        for tier, slots in self.slots.items():
+            for slot, item_id in enumerate(slots):
+                if item_id not in self.tm_item_ids:
+                    continue
+                entry = self.tmhm.by_item_id.get(item_id)
+                if not entry:
+                    continue
+                tm_type = Type.__members__.get(entry['move_type'].replace('TYPE_', ''))
+                if tm_type is None:
+                    continue
+                type_slots = self.tm_slots_by_type.setdefault(tm_type, [])
+                self._tm_type_slot[(tier, slot)] = (tm_type, len(type_slots))
+                type_slots.append((tier, slot))
+                self.tm_items_by_type.setdefault(tm_type, []).append(item_id)
+                type_weights.setdefault(tm_type, []).append(self.samplers[tier].weights[slot])
+        self.tm_samplers = {tm_type: WeightedSampler(w) for tm_type, w in type_weights.items()}
+    
+    @property
+    def pools(self):
+        """Items still in each tier, one entry per CSV line, in file order."""
+        return {tier: [item_id for item_id, weight in zip(slots, self.samplers[tier].weights) if weight]
+                for tier, slots in self.slots.items()}
+    
+    def _draw(self, sampler, candidates, context, path):
+        """Slot drawn from sampler, through context.decide_weighted when there is a path."""
+        if context and path:
+            return context.decide_weighted(path, None, candidates, sampler)
+        return sampler.draw(self.random)
+    
+    def _remove(self, tier, slot):
+        """Take a drawn TM out of its tier and its type index."""
+        self.samplers[tier].set_weight(slot, 0)
+        type_slot = self._tm_type_slot.get((tier, slot))
+        if type_slot is not None:
+            self.tm_samplers[type_slot[0]].set_weight(type_slot[1], 0)
+    
     def _get_item_id(self, item_name):
         """Convert item name to ID."""
         # Handle bare numbers (TMs)
@@ -709,14 +973,14 @@ class ItemPool(Extractor):
         Args:
             tier: 1-4 for rarity tier
             context: Optional RandomizationContext for deterministic selection
-            path: Optional path for context.decide
+            path: Optional path for context.decide_weighted
             
         Returns:
             item_id of the drawn item
             
         If the pool for this tier is empty, falls back to adjacent tiers.
         TMs are removed from the pool after being drawn.
-        Regular items are returned and reshuffled.
+        Regular items stay in the pool.
         """
         # Try the requested tier first, then expand to adjacent tiers
         tiers_to_try = [tier]
@@ -730,28 +994,14 @@ class ItemPool(Extractor):
                 tiers_to_try.append(t)
         
         for try_tier in tiers_to_try:
-            if self.pools[try_tier]:
-                pool = self.pools[try_tier]
-                
-                # Use context.decide if available for determinism
-                if context and path:
-                    idx = context.decide(
-                        path=path,
-                        original=0,
-                        candidates=list(range(len(pool))),
-                        filter=NoFilter()
-                    )
-                else:
-                    idx = self.random.randint(0, len(pool) - 1)
-                
-                item_id = pool[idx]
+            sampler = self.samplers[try_tier]
+            if sampler.total:
+                slot = self._draw(sampler, self.slots[try_tier], context, path)
+                item_id = self.slots[try_tier][slot]
                 
-                # Remove TMs permanently, reshuffle regular items
+                # Remove TMs permanently
                 if item_id in self.tm_item_ids:
-                    pool.pop(idx)
-                else:
-                    # Return to deck and shuffle
-                    self.random.shuffle(pool)
+                    self._remove(try_tier, slot)
                 
                 return item_id
         
@@ -769,66 +1019,38 @@ class ItemPool(Extractor):
             True if at least one replacement was made, False otherwise
         """
         replaced = False
-        for tier, pool in self.pools.items():
-            for i, item_id in enumerate(pool):
-                if item_id == old_item_id:
-                    pool[i] = new_item_id
+        for tier, slots in self.slots.items():
+            for slot, item_id in enumerate(slots):
+                if item_id == old_item_id and self.samplers[tier].weights[slot]:
+                    slots[slot] = new_item_id
                     replaced = True
+        if replaced:
+            self._index_tms_by_type()
         return replaced
     
     def draw_tm_by_type(self, type_enum, tier=None, context=None, path=None):
-        """Draw a TM of a specific type, optionally filtered by tier.
+        """Draw a TM of a specific type from any tier.
         
         Args:
             type_enum: Type enum value to match
-            tier: Optional tier to prefer (will expand +/- 1 if needed)
+            tier: Requested tier; every remaining TM of the type is equally
+                  likely (per its weight) whatever the tier
             context: Optional RandomizationContext for determinism
-            path: Optional path for context.decide
+            path: Optional path for context.decide_weighted
             
         Returns:
             item_id of the drawn TM, or None if no matching TM available
         """
-        # Get all TMs of this type that are still in the pool
-        available_tms = []
-        for t, pool in self.pools.items():
-            for item_id in pool:
-                if item_id in self.tm_item_ids:
-                    # Check if this TM is of the requested type
-                    entry = self.tmhm.by_item_id.get(item_id)
-                    if entry:
-                        type_str = entry['move_type']
-                        type_name = type_str.replace('TYPE_', '')
-                        from enums import Type
-                        try:
-                            tm_type = Type[type_name]
-                            if tm_type == type_enum:
-                                available_tms.append((t, item_id))
-                        except KeyError:
-                            pass
-        
-        if not available_tms:
+        sampler = self.tm_samplers.get(type_enum)
+        if sampler is None or not sampler.total:
             return None
         
-        # If tier specified, prefer TMs from that tier or adjacent
-        if tier is not None:
-            # Sort by distance from preferred tier
-            available_tms.sort(key=lambda x: abs(x[0] - tier))
-        
-        # Select from available
-        if context and path:
-            idx = context.decide(
-                path=path,
-                original=0,
-                candidates=list(range(len(available_tms))),
-                filter=NoFilter()
-            )
-        else:
-            idx = self.random.randint(0, len(available_tms) - 1)
-        
-        selected_tier, item_id = available_tms[idx]
+        type_slot = self._draw(sampler, self.tm_items_by_type[type_enum], context, path)
+        selected_tier, slot = self.tm_slots_by_type[type_enum][type_slot]
+        item_id = self.slots[selected_tier][slot]
         
         # Remove from pool
-        self.pools[selected_tier].remove(item_id)
+        self._remove(selected_tier, slot)
         
         return item_id
 
@@ -839,6 +1061,8 @@ class StarterExtractor(Writeback, Extractor):
     Reads/writes the three starter species stored at address 0x02108514 in ARM9.
     """
     
+    SOURCES = ('Mons', 'ARM9Manager')
+    
     def __init__(self, context):
         super().__init__(context)
         mons = context.get(Mons)
@@ -904,7 +1128,28 @@ class ARM9Manager(Extractor):
         self.apply_modifications()
 
 
+# Levels at which evolutions by other methods than level happen, per step of a line
+DEFAULT_STAGE_LEVELS = (22, 36)
+
+
+def _is_level_method(method):
+    try:
+        return EvolutionMethod(method).param_type == EvoParam.LEVEL
+    except ValueError:
+        return False
+
+
 class EvolutionData(NarcExtractor):
+    """Evolution entries per species, plus tables of the evolution tree built at load time.
+    
+    Nothing edits evolutions, so paths, stages, final forms, ancestor and
+    descendant sets and per-level thresholds are computed once and every
+    query is a lookup (or a bisect, for evolved_form_at).
+    """
+    SOURCES = ('Mons',)
+    
+    # Not LAZY_NARC: _build_closure reads every entry at load time anyway
+    PARSE_CACHE_VERSION = 2
     
     def __init__(self, context):
         mons = context.get(Mons)
@@ -925,27 +1170,90 @@ class EvolutionData(NarcExtractor):
         
         super().__init__(context)
         self.data = self.load_narc()
+        self._build_closure()
     
     def get_evolution_paths(self, species_id):
-        def walk_evolution_tree(current_species_id, current_path):
-            current_pokemon = self.data[current_species_id]
-            current_path = current_path + [current_pokemon.species]
-            
-            if not current_pokemon.valid_evolutions:
-                return [current_path]
-            
-            all_paths = []
-            for evolution in current_pokemon.valid_evolutions:
-                if evolution.target and evolution.target.pokemon_id not in [p.pokemon_id for p in current_path]:
-                    paths = walk_evolution_tree(evolution.target.pokemon_id, current_path)
-                    all_paths.extend(paths)
-            
-            if not all_paths:
-                return [current_path]
-            
-            return all_paths
+        """Every evolution path from species_id to a final form, as lists of Mons entries."""
+        return [list(path) for path in self.paths[species_id]]
+    
+    def main_path(self, species_id):
+        """The first evolution path from species_id (just the species itself if it doesn't evolve)."""
+        return self.paths[species_id][0]
+    
+    def can_evolve(self, species_id):
+        return bool(self._targets[species_id])
+    
+    def evolved_form_at(self, species, level, stage_levels=DEFAULT_STAGE_LEVELS):
+        """The form species reaches by level along its main path (species itself if none).
         
-        return walk_evolution_tree(species_id, [])
+        Level-based evolutions happen at their parameter. The i-th evolution
+        of any other method happens at stage_levels[i]; past the end of
+        stage_levels it never does. Evolution stops at the first step not reached.
+        """
+        if stage_levels == DEFAULT_STAGE_LEVELS:
+            thresholds = self._default_thresholds[species.pokemon_id]
+        else:
+            thresholds = self._thresholds(species.pokemon_id, stage_levels)
+        steps = bisect.bisect_right(thresholds, level)
+        return self.main_path(species.pokemon_id)[steps] if steps else species
+    
+    def _thresholds(self, species_id, stage_levels):
+        """Level needed to get through each step of the main path; non-decreasing, so a bisect finds the form."""
+        thresholds = []
+        needed = 0
+        for i, evolution in enumerate(self._main_evolutions[species_id]):
+            if _is_level_method(evolution.method):
+                level = evolution.parameter
+            else:
+                level = stage_levels[i] if i < len(stage_levels) else math.inf
+            needed = max(needed, level)
+            thresholds.append(needed)
+        return thresholds
+    
+    def _build_closure(self):
+        """Precompute evolution paths, stages, final forms and ancestor/descendant sets for every species."""
+        count = len(self.data)
+        self._targets = [[evo for evo in entry.valid_evolutions if evo.target] for entry in self.data]
+        
+        # Paths as the recursive walk always returned them: depth first, never revisiting a species on the path
+        self.paths = []
+        self._main_evolutions = []
+        for species_id in range(count):
+            paths = []
+            main_evolutions = None
+            stack = [((self.data[species_id].species,), (species_id,), ())]
+            while stack:
+                path, ids, evolutions = stack.pop()
+                branches = [evo for evo in self._targets[ids[-1]] if evo.target.pokemon_id not in ids]
+                if not branches:
+                    paths.append(path)
+                    if main_evolutions is None:
+                        main_evolutions = list(evolutions)
+                for evo in reversed(branches):
+                    target_id = evo.target.pokemon_id
+                    stack.append((path + (self.data[target_id].species,), ids + (target_id,), evolutions + (evo,)))
+            self.paths.append(paths)
+            self._main_evolutions.append(main_evolutions)
+        self._default_thresholds = [self._thresholds(i, DEFAULT_STAGE_LEVELS) for i in range(count)]
+        
+        self.descendants = [frozenset(s.pokemon_id for path in self.paths[i] for s in path[1:]) for i in range(count)]
+        ancestors = [set() for _ in range(count)]
+        for species_id, descendants in enumerate(self.descendants):
+            for descendant in descendants:
+                ancestors[descendant].add(species_id)
+        self.ancestors = [frozenset(a) for a in ancestors]
+        # Stage 0 is a base form; a species reached through several lines gets its longest
+        self.stages = [0] * count
+        for species_id in range(count):
+            for path in self.paths[species_id]:
+                for stage, species in enumerate(path[1:], 1):
+                    self.stages[species.pokemon_id] = max(self.stages[species.pokemon_id], stage)
+        self.final_forms = []
+        for paths in self.paths:
+            finals = {}
+            for path in paths:
+                finals.setdefault(id(path[-1]), path[-1])
+            self.final_forms.append(tuple(finals.values()))
     
     def get_narc_path(self):
         return "a/0/3/4"
@@ -975,6 +1283,8 @@ class EvioliteUser(Extractor):
     - Helper methods to check if a Pokemon is an Eviolite user
     """
     
+    SOURCES = ('Mons', 'EvolutionData')
+    
     # Eviolite item ID - used when assigning the item to Eviolite users
     EVIOLITE_ITEM_ID = 113
     
@@ -1009,42 +1319,10 @@ class EvioliteUser(Extractor):
         - Base forms of 2-stage evolution lines (e.g., Charmander)
         - Middle forms of 3-stage evolution lines (e.g., Charmeleon)
         """
-        candidates = []
-        
-        for pokemon_data in self.evolution_data.data:
-            # Skip if no evolutions
-            if not pokemon_data.valid_evolutions:
-                continue
-            
-            # Get the Pokemon species
-            pokemon = pokemon_data.species
-            if not pokemon:
-                continue
-            
-            # Check if this Pokemon can evolve exactly once
-            # (has evolutions but none of its evolutions can evolve further)
-            can_evolve_once = False
-            
-            for evolution in pokemon_data.valid_evolutions:
-                if evolution.target:
-                    # Check if the evolution target can also evolve
-                    target_data = self.evolution_data.data[evolution.target.pokemon_id]
-                    
-                    # If target has no further evolutions, this is a candidate
-                    if not target_data.valid_evolutions:
-                        can_evolve_once = True
-                        break
-                    
-                    # If target has evolutions, this is a middle stage (also a candidate)
-                    # Example: Charmeleon can evolve to Charizard (which can't evolve further)
-                    if target_data.valid_evolutions:
-                        can_evolve_once = True
-                        break
-            
-            if can_evolve_once:
-                candidates.append(pokemon)
-        
-        return candidates
+        # Every species with an evolution target counts: a base form of a 2-stage
+        # line or the middle form of a 3-stage line (Charmeleon -> Charizard)
+        return [pokemon_data.species for species_id, pokemon_data in enumerate(self.evolution_data.data)
+                if pokemon_data.species and self.evolution_data.can_evolve(species_id)]
     
     def _calculate_eviolite_stats(self, pokemon):
         """Calculate a Pokemon's stats with Eviolite boost.
@@ -1377,6 +1655,8 @@ class EventFiles(Writeback, NarcExtractor):
     Each section has its own 4-byte count prefix.
     """
     
+    LAZY_NARC = True
+    
     SPAWNABLE_SIZE = 0x14  # 20 bytes
     OVERWORLD_SIZE = 0x20  # 32 bytes
     WARP_SIZE = 0x0C       # 12 bytes
@@ -6,12 +6,26 @@ import os
 from abc import ABC, abstractmethod
 from enums import *
 from typing import List
-from collections import Counter
+from collections import Counter, OrderedDict
+from collections.abc import Sequence
 import ndspy.rom
 import ndspy.narc
 import os
 import re
 import random
+import hashlib
+import inspect
+import io
+import pickle
+import shutil
+import copy
+import multiprocessing
+import time
+from contextlib import nullcontext
+import numpy as np
+from struct_codec import compile_struct
+from step_graph import REPO_DIR, StepGraph, changed_reads, read_only_extractors, run_parallel, watch_reads
+from decision_journal import JournalDivergence, label
 from construct import Struct, Int8ul, Int8sl, Int16ul, Int32ul, Array, Padding, Computed, this, Enum, FlagsEnum, RawCopy, Container, GreedyRange, StopIf, Check, BitsSwapped, Bitwise, Flag, Bytes
 
 from enums import (
@@ -59,10 +73,135 @@ class PathHierMap:
         return go(self.root, path_lower, None)
 
 
+class SpeciesColumns:
+    """Column store of species attributes (ids, bst, types, form info) for vectorized filtering.
+    
+    Rows are added the first time an object is seen as a decide() candidate, so
+    Mons entries and derived objects (e.g. Eviolite copies) share one table. An
+    object's attributes are captured when its row is added; rows are keyed by
+    id() and the table keeps the object alive so ids can't be reused.
+    """
+    
+    def __init__(self):
+        self._row_of = {}
+        self._objects = []
+        self._rows = []  # (pokemon_id, bst, type1, type2, form_category code, is_form)
+        self._category_codes = {None: -1}
+        self._built = 0
+        self.ids = self.bst = self.type1 = self.type2 = self.form_category = np.zeros(0, dtype=np.int32)
+        self.is_form = np.zeros(0, dtype=bool)
+    
+    def __deepcopy__(self, memo):
+        # Rows are keyed by id(), which copies don't share
+        return SpeciesColumns()
+    
+    def __getstate__(self):
+        return {}
+    
+    def __setstate__(self, state):
+        self.__init__()
+    
+    def category_code(self, category):
+        return self._category_codes.setdefault(category, len(self._category_codes) - 1)
+    
+    def add(self, obj):
+        """Add obj's row if missing. Raises AttributeError for objects that aren't species-like."""
+        if id(obj) in self._row_of:
+            return
+        self._rows.append((
+            obj.pokemon_id,
+            obj.bst,
+            int(obj.type1),
+            int(obj.type2),
+            self.category_code(obj.form_category),
+            obj.is_form_of is not None,
+        ))
+        self._row_of[id(obj)] = len(self._objects)
+        self._objects.append(obj)
+    
+    def _build(self):
+        if self._built == len(self._rows):
+            return
+        ids, bst, type1, type2, category, is_form = zip(*self._rows)
+        self.ids = np.array(ids, dtype=np.int32)
+        self.bst = np.array(bst, dtype=np.int32)
+        self.type1 = np.array(type1, dtype=np.int32)
+        self.type2 = np.array(type2, dtype=np.int32)
+        self.form_category = np.array(category, dtype=np.int32)
+        self.is_form = np.array(is_form, dtype=bool)
+        self._built = len(self._rows)
+    
+    def view(self, candidates):
+        """Return a CandidateView over candidates, or None if any candidate isn't species-like."""
+        row_of = self._row_of
+        try:
+            rows = [row_of[id(c)] for c in candidates]
+        except KeyError:
+            try:
+                for c in candidates:
+                    self.add(c)
+            except AttributeError:
+                return None
+            rows = [row_of[id(c)] for c in candidates]
+        self._build()
+        return CandidateView(self, candidates, np.array(rows, dtype=np.intp))
+
+
+class CandidateView:
+    """Columns of SpeciesColumns restricted to a subset of one candidate list, in candidate order."""
+    
+    def __init__(self, columns, candidates, rows, positions=None):
+        self.columns = columns
+        self.candidates = candidates
+        self.rows = rows  # row in columns for each candidate in the view
+        self.positions = np.arange(len(rows)) if positions is None else positions  # index into candidates
+        self._cache = {}
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def column(self, name):
+        if name not in self._cache:
+            self._cache[name] = getattr(self.columns, name)[self.rows]
+        return self._cache[name]
+    
+    def subset(self, mask):
+        return CandidateView(self.columns, self.candidates, self.rows[mask], self.positions[mask])
+    
+    def select(self, mask=None):
+        """Candidates in the view (where mask is True), keeping their original order."""
+        positions = self.positions if mask is None else self.positions[mask]
+        candidates = self.candidates
+        return [candidates[i] for i in positions]
+
+
+def species_view(context, candidates):
+    columns = getattr(context, "species_columns", None)
+    if columns is None or not candidates:
+        return None
+    return columns.view(candidates)
+
+
 class Filter(ABC):
+    # Pure filters give the same result for the same (original, candidates)
+    # every time, so decide() may reuse it; see RandomizationContext.FILTER_CACHE_SIZE.
+    # decide() keys those results on repr(), so a pure filter's repr must either
+    # spell out its parameters or be the default (id-based) one
+    PURE = False
+    
     @abstractmethod
     def filter_all(self, context, original, candidates: List) -> List:
         pass
+    
+    def is_pure(self):
+        return self.PURE
+    
+    def mask(self, context, original, view):
+        """Boolean array over view's candidates, or None if this filter can't be vectorized.
+        
+        Must agree with filter_all: view.select(mask) == filter_all(candidates).
+        """
+        return None
 
 class SimpleFilter(Filter):
     @abstractmethod
@@ -70,9 +209,15 @@ class SimpleFilter(Filter):
         pass
     
     def filter_all(self, context, original, candidates: List) -> List:
+        if type(self).mask is not Filter.mask:
+            view = species_view(context, candidates)
+            if view is not None:
+                return view.select(self.mask(context, original, view))
         return [c for c in candidates if self.check(context, original, c)]
 
 class BstWithinFactor(SimpleFilter):
+    PURE = True
+    
     def __init__(self, factor: float):
         self.factor = factor
     
@@ -84,24 +229,43 @@ class BstWithinFactor(SimpleFilter):
         # For higher-BST Pokémon (349 and above), use the factor-based filtering
         return abs(candidate.bst - original.bst) <= original.bst * self.factor
 
+    def mask(self, context, original, view):
+        bst = view.column("bst")
+        if original.bst <= 348:
+            return bst <= 348
+        return np.abs(bst - original.bst) <= original.bst * self.factor
+
     def __repr__(self):
         return f"BstWithinFactor({self.factor})"
 
 class NotInSet(SimpleFilter):
+    # excluded is normally a by_id set filled in by its extractor's constructor;
+    # don't change it after the filter has been used
+    PURE = True
+    
     def __init__(self, excluded: set):
         self.excluded = excluded
     
     def check(self, context, original, candidate) -> bool:
         return candidate.pokemon_id not in self.excluded
 
+    def mask(self, context, original, view):
+        return ~np.isin(view.column("ids"), np.fromiter(self.excluded, dtype=np.int64, count=len(self.excluded)))
+
 class TypeMatches(SimpleFilter):
     """Filter Pokemon that have type1 or type2 matching any of the specified types."""
+    PURE = True
+    
     def __init__(self, type_ids: List[int]):
         self.type_ids = set(type_ids)
+        self._type_array = np.array(sorted(int(t) for t in self.type_ids), dtype=np.int32)
     
     def check(self, context, original, candidate) -> bool:
         return (int(candidate.type1) in self.type_ids or int(candidate.type2) in self.type_ids)
 
+    def mask(self, context, original, view):
+        return np.isin(view.column("type1"), self._type_array) | np.isin(view.column("type2"), self._type_array)
+
     def __repr__(self):
         s = ","
         return f"TypeMatches({s.join([str(Type(t)) for t in self.type_ids])})"
@@ -111,38 +275,103 @@ class Stratified(Filter):
     def __init__(self, filters: List[Filter]):
         self.filters = filters
     
+    def is_pure(self):
+        return all(f.is_pure() for f in self.filters)
+    
     def filter_all(self, context, original, candidates: List) -> List:
+        view = species_view(context, candidates)
+        if view is not None:
+            mask = self.mask(context, original, view)
+            if mask is not None:
+                return view.select(mask)
         for f in self.filters:
             filtered = f.filter_all(context, original, candidates)
             if filtered:
                 return filtered
         return []
 
+    def mask(self, context, original, view):
+        for f in self.filters:
+            mask = f.mask(context, original, view)
+            if mask is None:
+                return None
+            if mask.any():
+                return mask
+        return np.zeros(len(view), dtype=bool)
+
 class AllFilters(Filter):
     """Combine multiple filters with AND logic."""
     def __init__(self, filters: List[Filter]):
         self.filters = filters
     
+    def is_pure(self):
+        return all(f.is_pure() for f in self.filters)
+    
     def filter_all(self, context, original, candidates: List) -> List:
+        filters = self.filters
+        view = species_view(context, candidates)
+        if view is not None:
+            # Narrow with masks until a filter can't be vectorized, then continue in Python
+            for i, f in enumerate(self.filters):
+                mask = f.mask(context, original, view)
+                if mask is None:
+                    break
+                view = view.subset(mask)
+            else:
+                i = len(self.filters)
+            candidates = view.select()
+            filters = self.filters[i:]
+        
         result = candidates
-        for f in self.filters:
+        for f in filters:
             result = f.filter_all(context, original, result)
             if not result:
                 break
         return result
 
+    def mask(self, context, original, view):
+        mask = np.zeros(len(view), dtype=bool)
+        keep = np.arange(len(view))
+        for f in self.filters:
+            # Each filter sees only what the previous ones kept, as in filter_all
+            m = f.mask(context, original, view)
+            if m is None:
+                return None
+            keep = keep[m]
+            view = view.subset(m)
+        mask[keep] = True
+        return mask
+
     def __repr__(self):
         s = ","
         return f"AllFilters({s.join([repr(f) for f in self.filters])})"
 
 class NoFilter(Filter):
     """Filter that passes all candidates unchanged."""
+    PURE = True
+    
     def filter_all(self, context, original, candidates: List) -> List:
         return candidates
 
+    def mask(self, context, original, view):
+        return np.ones(len(view), dtype=bool)
+
 
 class Extractor(ABC):
     """Base class for all context-managed objects."""
+    
+    # Names of extractors this one wraps or is computed from (Trainers ->
+    # TrainerData, IdentifyTier -> Trainers). Step declarations are closed over these.
+    SOURCES = ()
+    
+    # Files and directories outside the package (relative to the repo root)
+    # this one reads while it is built; StepCache keys cover their contents
+    INPUT_PATHS = ()
+    
+    # Attributes holding caches that reads fill in (memoized lookups); a step
+    # that only READS this extractor may change them (see step_graph.watch_reads)
+    MEMO_ATTRS = ()
+    
     def __init__(self, context):
         self.context = context
         self.rom = context.rom
@@ -152,16 +381,277 @@ class Extractor(ABC):
         pass
 
 
+class LazyNarcData(Sequence):
+    """Sequence-like view over NARC member files that decodes each entry on first access.
+    
+    Parsed entries are mutated in place by steps, so every entry that has been
+    decoded (or assigned) is treated as dirty. Entries that were never touched
+    keep their original bytes and never go through parse/serialize.
+    """
+    
+    def __init__(self, files, parse_file):
+        self._files = files
+        self._parse_file = parse_file
+        self._decoded = {}
+    
+    def __len__(self):
+        return len(self._files)
+    
+    def _normalize_index(self, index):
+        if index < 0:
+            index += len(self._files)
+        if not 0 <= index < len(self._files):
+            raise IndexError(f"NARC entry index {index} out of range")
+        return index
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = self._normalize_index(index)
+        if index not in self._decoded:
+            self._decoded[index] = self._parse_file(self._files[index], index)
+        return self._decoded[index]
+    
+    def __setitem__(self, index, value):
+        self._decoded[self._normalize_index(index)] = value
+    
+    def __iter__(self):
+        for i in range(len(self._files)):
+            yield self[i]
+    
+    def is_decoded(self, index):
+        return self._normalize_index(index) in self._decoded
+    
+    def materialize(self):
+        """Decode every entry that has not been decoded yet, leaving them in index order."""
+        for i in range(len(self._files)):
+            self[i]
+        if list(self._decoded) != list(range(len(self._files))):
+            entries = sorted(self._decoded.items())
+            self._decoded.clear()
+            self._decoded.update(entries)
+    
+    def dirty_indices(self):
+        """Indices of entries that must be re-serialized on write."""
+        return sorted(self._decoded)
+    
+    def original_bytes(self, index):
+        return self._files[self._normalize_index(index)]
+
+
+class ParseCache:
+    """On-disk cache of parsed NARC data, shared across runs on the same base ROM.
+    
+    An entry is keyed by the SHA-256 of the raw NARC, the extractor's
+    PARSE_CACHE_VERSION, the source of the module defining the extractor and
+    of the modules defining the decoded layout (this one, struct_codec, and
+    enums, whose classes end up in the pickled values), the
+    files listed in PARSE_CACHE_INPUTS (name tables, ..., relative to the repo
+    root; they must exist) and whatever parse_cache_extra_key() returns. Any
+    change to these picks a new key.
+    
+    Parsed data may point at entries of other cached extractors (Levelups ->
+    Moves, EvolutionData -> Mons). Those are pickled as references and re-linked
+    to the live objects on load, so identity is preserved.
+    
+    LAZY_NARC extractors store each entry as its own pickle and get a
+    LazyNarcData back over the NARC's member bytes, which unpickles an entry
+    the first time it is read instead of parsing it. Entries stay undecoded,
+    and clean, until something reads them. A cache miss still parses every
+    entry once, on the side, to store them; the returned data stays undecoded.
+    """
+    
+    DEFAULT_DIR = os.path.join("build", "gl_parse_cache")
+    
+    def __init__(self, cache_dir=DEFAULT_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._owners = {}  # extractor class name -> parsed data
+        self._file_digests = {}
+    
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+    
+    def fork(self):
+        """Cache for a forked context: same directory, no extractors loaded yet."""
+        child = ParseCache(self.cache_dir)
+        child._file_digests = self._file_digests
+        return child
+    
+    def adopt(self, parent, name, memo):
+        """Register the forked copy of parent's parsed data for name, so new entries can reference it."""
+        if parent is not None and name in parent._owners:
+            self._owners[name] = copy.deepcopy(parent._owners[name], memo)
+    
+    def _file_digest(self, path):
+        if path not in self._file_digests:
+            full_path = os.path.join(REPO_DIR, path)
+            if not os.path.isfile(full_path):
+                raise FileNotFoundError(f"ParseCache: input file {full_path} does not exist")
+            with open(full_path, "rb") as f:
+                self._file_digests[path] = hashlib.sha256(f.read()).digest()
+        return self._file_digests[path]
+    
+    def key_for(self, extractor):
+        h = hashlib.sha256()
+        h.update(f"{type(extractor).__name__}:{extractor.PARSE_CACHE_VERSION}".encode())
+        h.update(hashlib.sha256(extractor._original_narc_raw).digest())
+        sources = (inspect.getsourcefile(type(extractor)), inspect.getsourcefile(ParseCache),
+                   inspect.getsourcefile(compile_struct), inspect.getsourcefile(Type))
+        for path in (*sorted(set(sources)), *extractor.PARSE_CACHE_INPUTS):
+            h.update(os.path.relpath(os.path.join(REPO_DIR, path), REPO_DIR).encode())
+            h.update(self._file_digest(path))
+        h.update(extractor.parse_cache_extra_key())
+        return h.hexdigest()
+    
+    def _entry_refs(self, skip_name):
+        refs = {}
+        for name, data in self._owners.items():
+            if name == skip_name:
+                continue
+            entries = data._decoded.items() if isinstance(data, LazyNarcData) else enumerate(data)
+            for i, entry in entries:
+                refs[id(entry)] = (name, i)
+        return refs
+    
+    def load_or_parse(self, extractor, parse):
+        """Return cached parse output for extractor, or call parse() and store it."""
+        name = type(extractor).__name__
+        key = self.key_for(extractor)
+        path = os.path.join(self.cache_dir, f"{name}-{key[:32]}.pickle")
+        
+        data = None
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    if extractor.LAZY_NARC:
+                        entries = _CachedEntries(extractor, pickle.load(f))
+                        data = LazyNarcData(list(extractor._original_narc_files), entries.parse_file)
+                    else:
+                        data = _CacheUnpickler(f, self._owners).load()
+                self.hits += 1
+            except Exception as e:
+                print(f"ParseCache: ignoring unreadable entry {path}: {e}", file=sys.stderr)
+                data = None
+        
+        if data is None:
+            self.misses += 1
+            data = parse()
+            self._store(name, path, data)
+        
+        self._owners[name] = data
+        return data
+    
+    def _store(self, name, path, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Drop entries left over from older keys of this extractor
+        for old in os.listdir(self.cache_dir):
+            if old.startswith(f"{name}-") and old.endswith(".pickle"):
+                os.remove(os.path.join(self.cache_dir, old))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            if isinstance(data, LazyNarcData):
+                # Parse every entry on the side, so data itself stays undecoded
+                parsed = [data._decoded[i] if i in data._decoded else data._parse_file(raw, i)
+                          for i, raw in enumerate(data._files)]
+                refs = self._entry_refs(name)
+                blobs = {}
+                for i, entry in enumerate(parsed):
+                    blob = io.BytesIO()
+                    _CachePickler(blob, refs).dump(entry)
+                    blobs[i] = blob.getvalue()
+                pickle.dump(blobs, f, protocol=pickle.HIGHEST_PROTOCOL)
+            else:
+                _CachePickler(f, self._entry_refs(name)).dump(list(data))
+        os.replace(tmp_path, path)
+
+
+class _CachedEntries:
+    """parse_file for a LazyNarcData restored from the ParseCache: unpickles the stored entry."""
+    
+    def __init__(self, extractor, blobs):
+        self.extractor = extractor
+        self.blobs = blobs  # entry index -> pickled entry
+    
+    def parse_file(self, data, index):
+        blob = self.blobs.pop(index, None)
+        if blob is not None:
+            try:
+                return _CacheUnpickler(io.BytesIO(blob), self.extractor.context.parse_cache._owners).load()
+            except KeyError:
+                pass  # refers to an extractor this context hasn't loaded yet; parse instead
+        return self.extractor.parse_file(data, index)
+
+
+class _CachePickler(pickle.Pickler):
+    def __init__(self, f, refs):
+        super().__init__(f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.refs = refs
+    
+    def persistent_id(self, obj):
+        return self.refs.get(id(obj))
+    
+    def reducer_override(self, obj):
+        # construct keeps the source stream in Container._io; never worth storing
+        if type(obj) is Container:
+            return (Container, (), None, None, iter([(k, v) for k, v in obj.items() if k != "_io"]))
+        return NotImplemented
+
+
+class _CacheUnpickler(pickle.Unpickler):
+    def __init__(self, f, owners):
+        super().__init__(f)
+        self.owners = owners
+    
+    def persistent_load(self, pid):
+        name, i = pid
+        return self.owners[name][i]
+
+
 class NarcExtractor(Extractor):
     """Extractor that provides NARC parsing infrastructure
     
     Set PRESERVE_NARC_FORMAT = True (default) to use custom NARC writer that 
     preserves exact binary format. Set to False to use ndspy's default save().
+    
+    Set LAZY_NARC = True on subclasses whose parse_file only depends on static
+    data (names, form tables, ...) to get a LazyNarcData instead of a list.
+    Entries are then decoded on first access, and on write only decoded entries
+    are re-serialized; the rest are copied from the original NARC untouched.
+    
+    Set FAST_CODEC = True to have compile_codec() turn fixed-layout construct
+    definitions into precompiled struct_codec codecs (same parse/build output).
+    
+    Set PARSE_CACHE_VERSION to opt into the context's ParseCache. Bump it
+    whenever parse output changes in a way the cache key would not notice.
     """
     
     # Toggle between format-preserving writer (True) and ndspy default (False)
     PRESERVE_NARC_FORMAT = True
     
+    # Decode entries on demand instead of parsing the whole NARC up front
+    LAZY_NARC = False
+    
+    # Parse/build fixed layouts through struct_codec instead of construct
+    FAST_CODEC = False
+    
+    # Schema version for ParseCache entries; None disables caching
+    PARSE_CACHE_VERSION = None
+    
+    # Extra files whose contents feed parse_file (name tables, ...)
+    PARSE_CACHE_INPUTS = ()
+    
+    def parse_cache_extra_key(self):
+        """Bytes describing any other state parse_file depends on."""
+        return b""
+    
+    def compile_codec(self, construct_obj):
+        """Return a precompiled codec for construct_obj if FAST_CODEC is set, else construct_obj itself."""
+        if self.FAST_CODEC:
+            return compile_struct(construct_obj)
+        return construct_obj
+    
     @abstractmethod
     def write_to_rom(self):
         """Write data back to ROM."""
@@ -189,7 +679,7 @@ class NarcExtractor(Extractor):
     def serialize_narc(self, data_list):
         """Serialize data back to NARC, preserving original NARC structure."""
         # Update the original NARC's files instead of creating a new one
-        self._original_narc.files = [self.serialize_file(item, i) for i, item in enumerate(data_list)]
+        self._original_narc.files = self._serialize_entries(data_list)
         return self._original_narc
     
     def load_narc(self):
@@ -199,7 +689,58 @@ class NarcExtractor(Extractor):
         self._original_narc_raw = bytes(narc_file)
         narc_data = ndspy.narc.NARC(narc_file)
         self._original_narc = narc_data
-        return self.parse_narc(narc_data)
+        # Member bytes as loaded, to tell which entries a write actually changes
+        self._original_narc_files = list(narc_data.files)
+        
+        def parse():
+            if self.LAZY_NARC:
+                return LazyNarcData(list(narc_data.files), self.parse_file)
+            return self.parse_narc(narc_data)
+        
+        cache = getattr(self.context, "parse_cache", None)
+        if cache is not None and self.PARSE_CACHE_VERSION is not None:
+            return cache.load_or_parse(self, parse)
+        return parse()
+    
+    def _serialize_entries(self, data_list):
+        """Serialize every entry, reusing original bytes for never-decoded lazy entries."""
+        return self._encode_entries(data_list)[0]
+    
+    def _encode_entries(self, data_list):
+        """Serialize entries for writing and count what actually changed.
+        
+        Never-decoded lazy entries, and entries that are still the original
+        bytes object (raw-bytes extractors like ScriptNarc), are not re-encoded.
+        Returns (files, stats) with stats as returned by write_to_rom.
+        """
+        lazy = isinstance(data_list, LazyNarcData)
+        originals = self._original_narc_files
+        files = []
+        encoded = changed = bytes_encoded = 0
+        for i in range(len(data_list)):
+            original = originals[i] if i < len(originals) else None
+            if lazy and not data_list.is_decoded(i):
+                files.append(data_list.original_bytes(i))
+                continue
+            item = data_list[i]
+            if item is original:
+                files.append(original)
+                continue
+            file_bytes = self.serialize_file(item, i)
+            encoded += 1
+            bytes_encoded += len(file_bytes)
+            if file_bytes != original:
+                changed += 1
+            files.append(file_bytes)
+        stats = {
+            "path": self.get_narc_path(),
+            "entries": len(files),
+            "encoded": encoded,
+            "changed": changed + abs(len(files) - len(originals)),
+            "bytes_encoded": bytes_encoded,
+            "written": False,
+        }
+        return files, stats
     
     def _rebuild_narc_preserving_format(self, new_files):
         """Rebuild NARC with new file contents while preserving exact binary format."""
@@ -265,26 +806,45 @@ class NarcExtractor(Extractor):
         return bytes(result)
     
     def write_to_rom(self):
+        """Write data back to the ROM if any entry changed.
+        
+        Returns a dict with the NARC path, entry count, entries re-encoded,
+        entries changed, bytes re-encoded and whether the NARC was rewritten.
+        """
         narc_file_id = self.rom.filenames.idOf(self.get_narc_path())
+        new_files, stats = self._encode_entries(self.data)
+        if not stats["changed"]:
+            # Identical to what was loaded; leave the ROM's copy alone
+            return stats
         
         if self.PRESERVE_NARC_FORMAT:
             # Use custom writer that preserves exact binary format
-            new_files = [self.serialize_file(item, i) for i, item in enumerate(self.data)]
             narc_bytes = self._rebuild_narc_preserving_format(new_files)
             self.rom.files[narc_file_id] = narc_bytes
         else:
-            # Use ndspy's default save (may add 4 bytes to NARC)
-            narc_data = self.serialize_narc(self.data)
-            self.rom.files[narc_file_id] = narc_data.save()
+            # Use ndspy's default save (may add 4 bytes to NARC), reusing the entries encoded above
+            self._original_narc.files = new_files
+            self.rom.files[narc_file_id] = self._original_narc.save()
+        stats["written"] = True
+        return stats
 
 
 class Writeback:
     """Mixin that enables ROM writeback for NarcExtractor"""
     def write(self):
-        self.write_to_rom()
+        return self.write_to_rom()
 
 class Step(ABC):
-    """Base class for pipeline steps that run in order."""
+    """Base class for pipeline steps that run in order.
+    
+    READS and WRITES name the extractor classes the step gets from the context
+    and those it modifies. run_pipeline orders steps by them (see StepGraph);
+    a step that declares neither runs after everything before it and before
+    everything after it.
+    """
+    
+    READS = None
+    WRITES = None
     
     @abstractmethod
     def run(self, context):
@@ -316,13 +876,215 @@ class ObjectRegistry:
         return self._objects[obj_class]
 
 
+class PathRandom(random.Random):
+    """random.Random whose draws are a pure function of a key.
+    
+    Output block n is blake2b(n, key=key), so a stream never depends on what
+    other streams (or the global random module) were used for, and copying or
+    pickling one is just (key, counter). Reseeding is ignored.
+    """
+    
+    def __init__(self, key=b""):
+        self._key = key
+        self._counter = 0
+        super().__init__()
+    
+    def seed(self, *args, **kwargs):
+        pass
+    
+    def getrandbits(self, k):
+        nbytes = (k + 7) // 8
+        out = b""
+        while len(out) < nbytes:
+            out += hashlib.blake2b(self._counter.to_bytes(8, "little"), key=self._key, digest_size=8).digest()
+            self._counter += 1
+        return int.from_bytes(out[:nbytes], "little") >> (nbytes * 8 - k)
+    
+    def random(self):
+        return self.getrandbits(53) * (1.0 / (1 << 53))
+    
+    def getstate(self):
+        return self._key, self._counter
+    
+    def setstate(self, state):
+        self._key, self._counter = state
+
+
 class RandomizationContext(ObjectRegistry):
     """Manages ROM data, pipeline execution, and shared objects."""
     
-    def __init__(self, rom, verbosity=0, verbosity_overrides=None):
+    # Max (filter, original, candidates) results decide() keeps for pure filters; 0 disables
+    FILTER_CACHE_SIZE = 1024
+    
+    def __init__(self, rom, verbosity=0, verbosity_overrides=None, parse_cache=None):
         super().__init__()
         self.rom = rom
+        self.parse_cache = parse_cache
+        # Attribute columns for vectorized filters; see SpeciesColumns
+        self.species_columns = SpeciesColumns()
+        self._reset_filter_cache()
         self.verbosity_map = PathHierMap(verbosity_overrides or [([], verbosity)])
+        self._parent = None
+        self._fork_memo = None
+        # WRITES closure of the step run_pipeline is running, None outside declared steps; see fork()
+        self._step_writes = None
+        # Optional profiler.PipelineProfiler; see run_pipeline, decide and get
+        self.profiler = None
+        # Classes fetched with get() outside extractor construction, when run_pipeline checks access
+        self._access_log = None
+        # With a seed, decide() and rng() draw from per-path streams; see rng()
+        self.seed = None
+        self.reroll_map = PathHierMap([])
+        self._rng_streams = {}
+        # Optional decision_journal.DecisionJournal that decide() records every result in
+        self.journal = None
+        # Optional decision_journal.DecisionReplay; decide() then returns its recorded selections unfiltered
+        self.replay = None
+    
+    def fork(self):
+        """Return a copy-on-write child context.
+        
+        The child starts with nothing loaded and a copy of the ROM's file table.
+        Extractors this context (or an ancestor) already has are shared with
+        the child until a step may change them:
+          - while run_pipeline runs a step that declares READS/WRITES, getting
+            an extractor outside its WRITES closure returns the parent's object
+            itself, uncopied;
+          - a step's declared WRITES are deep-copied into the child when the
+            step starts, and anything fetched by an undeclared step, or while
+            another extractor is being built, is copied when first fetched.
+        All copies share one memo, so cross-extractor references (Levelups ->
+        Moves, Trainers -> TrainerData) resolve to the child's copies, and an
+        extractor copied along with another one is never shared again.
+        
+        Sharing relies on READS being honest: a step that changes an extractor
+        it declares only in READS changes the parent (--check-step-access
+        reports such steps), and references a step stores to shared objects
+        keep pointing at the parent's. Steps run in parallel workers copy
+        everything they touch.
+        
+        The parent is used as a read-only template: fork it before running steps
+        on it (or after write_all()), and don't mutate it while children exist.
+        """
+        child = copy.copy(self)
+        ObjectRegistry.__init__(child)
+        child.rom = copy.copy(self.rom)
+        child.rom.files = list(self.rom.files)
+        child.parse_cache = self.parse_cache.fork() if self.parse_cache is not None else None
+        child.species_columns = SpeciesColumns()
+        child._reset_filter_cache()
+        child._rng_streams = {}
+        child.journal = None
+        child.replay = None
+        child._parent = self
+        child._step_writes = None
+        # Modules are shared, not copied
+        child._fork_memo = {id(m): m for m in list(sys.modules.values())}
+        child._fork_memo[id(self)] = child
+        child._fork_memo[id(self.rom)] = child.rom
+        return child
+    
+    def _has_loaded(self, obj_class):
+        if obj_class in self._objects:
+            return True
+        return self._parent is not None and self._parent._has_loaded(obj_class)
+    
+    def _ancestor_object(self, obj_class):
+        """The nearest ancestor's instance of obj_class, or None."""
+        parent = self._parent
+        while parent is not None:
+            if obj_class in parent._objects:
+                return parent._objects[obj_class]
+            parent = parent._parent
+        return None
+    
+    def _shared_object(self, obj_class):
+        """The ancestor's obj_class instance if the running step may use it uncopied (see fork), else None."""
+        if self._parent is None or self._step_writes is None or obj_class in self._step_writes or self._creating:
+            return None
+        original = self._ancestor_object(obj_class)
+        if original is None or id(original) in self._fork_memo:
+            return None
+        return original
+    
+    def get(self, obj_class):
+        if self._access_log is not None and not self._creating:
+            self._access_log.add(obj_class)
+        if obj_class not in self._objects:
+            shared = self._shared_object(obj_class)
+            if shared is not None:
+                return shared
+        if self.profiler is not None and obj_class not in self._objects and obj_class not in self._creating:
+            with self.profiler.extractor(obj_class):
+                return self._get(obj_class)
+        return self._get(obj_class)
+    
+    def _get(self, obj_class):
+        if obj_class not in self._objects and self._parent is not None:
+            original = self._ancestor_object(obj_class)
+            if original is not None:
+                # Computed fields close over the parent's extractors, so decode there first
+                if isinstance(getattr(original, "data", None), LazyNarcData):
+                    original.data.materialize()
+                self._objects[obj_class] = copy.deepcopy(original, self._fork_memo)
+                if self.parse_cache is not None:
+                    self.parse_cache.adopt(self._parent.parse_cache, obj_class.__name__, self._fork_memo)
+        return super().get(obj_class)
+    
+    def _begin_step(self, graph, i):
+        """Note step i's declared writes for get(), copying those a fork still shares with its parent."""
+        self._step_writes = graph.writes[i] if graph.declared[i] else None
+        if self._parent is not None and self._step_writes:
+            for cls in sorted(self._step_writes, key=lambda c: c.__name__):
+                if cls not in self._objects and self._ancestor_object(cls) is not None:
+                    self.get(cls)
+    
+    def _reset_filter_cache(self):
+        self._filter_cache = OrderedDict()
+        self.filter_cache_hits = 0
+        self.filter_cache_misses = 0
+    
+    def _filter_candidates(self, filter, original, candidates):
+        """Run filter.filter_all, reusing an earlier result for pure filters. Returns (filtered, cache hit or None)."""
+        if not self.FILTER_CACHE_SIZE or not filter.is_pure():
+            return filter.filter_all(self, original, candidates), None
+        
+        pool = tuple(candidates)
+        # Equal reprs let filters rebuilt per call (AllFilters([self.filter, TypeMatches(...)])) share entries
+        key = (repr(filter), id(original), tuple(map(id, pool)))
+        entry = self._filter_cache.get(key)
+        if entry is not None:
+            self._filter_cache.move_to_end(key)
+            self.filter_cache_hits += 1
+            return entry[-1], True
+        
+        self.filter_cache_misses += 1
+        filtered = filter.filter_all(self, original, candidates)
+        # Keep the keyed objects alive so their ids can't be reused
+        self._filter_cache[key] = (filter, original, pool, tuple(filtered))
+        if len(self._filter_cache) > self.FILTER_CACHE_SIZE:
+            self._filter_cache.popitem(last=False)
+        return filtered, False
+    
+    def rng(self, path):
+        """Random stream for decision path (["encounters", area, species], ...).
+        
+        With self.seed set, the stream is derived from (seed, path) alone, so
+        what a path draws doesn't depend on which steps ran before it, and
+        steps can be reordered or run in parallel without changing results.
+        reroll_map salts paths by prefix, which re-rolls just that subtree.
+        Repeated calls with one path continue the same stream. Without a seed
+        this is the global random module.
+        """
+        if self.seed is None:
+            return random
+        key = tuple(str(p).lower() for p in path)
+        stream = self._rng_streams.get(key)
+        if stream is None:
+            salt = self.reroll_map.get(key) or 0
+            stream_key = hashlib.blake2b(f"{self.seed}:{salt}:/{'/'.join(key)}".encode(), digest_size=32).digest()
+            stream = self._rng_streams[key] = PathRandom(stream_key)
+        return stream
     
     def decide(self, path, original, candidates, filter=NoFilter()):
         def n(e):
@@ -331,13 +1093,22 @@ class RandomizationContext(ObjectRegistry):
         path_str = "/" + "/".join(str(p) for p in path)
         verbosity = self.verbosity_map.get(path) or 0
     
+        if self.replay is not None:
+            return self._replay_decision(path_str, verbosity, original, candidates)
+        
         if verbosity >= 3:
             print(f"{path_str:50} {len(candidates)} candidates")
         
-        filtered = filter.filter_all(self, original, candidates)
+        if self.profiler is not None:
+            filter_start = time.perf_counter()
+            filtered, cache_hit = self._filter_candidates(filter, original, candidates)
+            self.profiler.record_decide(time.perf_counter() - filter_start)
+        else:
+            filtered, cache_hit = self._filter_candidates(filter, original, candidates)
     
         if verbosity >= 3:
-            print(f"{path_str:50} {len(filtered)} candidates")
+            cache_note = "" if cache_hit is None else f" (filter cache {'hit' if cache_hit else 'miss'}, {self.filter_cache_hits} hits / {self.filter_cache_misses} misses)"
+            print(f"{path_str:50} {len(filtered)} candidates{cache_note}")
     
         if verbosity >= 5:
             print(f"{path_str:50} Filtered candidates:")
@@ -348,31 +1119,147 @@ class RandomizationContext(ObjectRegistry):
             if verbosity >= 1:
                 print(f"{path_str:50} [WARNING] No valid candidates, keeping original: {n(original)}")
                 print(f"{path_str:50}           Filter: {repr(filter)}")
+            if self.journal is not None:
+                self.journal.record(path_str, original, original, -1, len(candidates), 0)
                 
             return original
         
-        selected = random.choice(filtered)
+        selected = self.rng(path).choice(filtered)
+        if self.journal is not None:
+            index = next((i for i, c in enumerate(candidates) if c is selected), None)
+            self.journal.record(path_str, original, selected, candidates.index(selected) if index is None else index,
+                                len(candidates), len(filtered))
     
         if verbosity >= 2:
             print(f"{path_str:50} {n(original):20} -> {n(selected):20}")
     
         return selected
     
-    def run_pipeline(self, steps, log_function=None, progress_callback=None):
-        """Run all pipeline steps in order."""
-        for i, step in enumerate(steps):
+    def _replay_decision(self, path_str, verbosity, original, candidates):
+        """decide() in replay mode: the journal's selection, without filtering or drawing from the rng."""
+        decision = self.replay.select(path_str, original, candidates)
+        selected = original if decision.index < 0 else candidates[decision.index]
+        if self.profiler is not None:
+            self.profiler.record_decide(0.0)
+        if self.journal is not None:
+            self.journal.record(path_str, original, selected, decision.index, len(candidates), decision.filtered)
+        if verbosity >= 2:
+            print(f"{path_str:50} {label(original):20} -> {label(selected):20} (replayed)")
+        return selected
+    
+    def decide_weighted(self, path, original, candidates, sampler):
+        """decide() for a weighted draw: sampler picks one slot of candidates.
+        
+        sampler (an extractors.WeightedSampler with one slot per candidate)
+        takes the place of filtering and draws from rng(path). The draw is
+        journaled and logged like decide(), and in replay mode the recorded
+        slot is returned instead; a recorded slot the sampler no longer holds
+        raises JournalDivergence. Returns the slot, so the caller can update
+        its sampler.
+        """
+        path_str = "/" + "/".join(str(p) for p in path)
+        verbosity = self.verbosity_map.get(path) or 0
+        
+        if self.replay is not None:
+            decision = self.replay.select(path_str, original, candidates)
+            if decision.index < 0 or not sampler.weights[decision.index]:
+                raise JournalDivergence(f"{path_str}: recorded slot {decision.index} is not left in the pool")
+            slot = decision.index
+            if self.profiler is not None:
+                self.profiler.record_decide(0.0)
+            if self.journal is not None:
+                self.journal.record(path_str, original, candidates[slot], slot, len(candidates), decision.filtered)
+            if verbosity >= 2:
+                print(f"{path_str:50} {label(original):20} -> {label(candidates[slot]):20} (replayed)")
+            return slot
+        
+        if verbosity >= 3:
+            print(f"{path_str:50} {len(candidates)} candidates, {sampler.live} in the pool")
+        
+        if self.profiler is not None:
+            draw_start = time.perf_counter()
+            slot = sampler.draw(self.rng(path))
+            self.profiler.record_decide(time.perf_counter() - draw_start)
+        else:
+            slot = sampler.draw(self.rng(path))
+        if self.journal is not None:
+            self.journal.record(path_str, original, candidates[slot], slot, len(candidates), sampler.live)
+        
+        if verbosity >= 2:
+            print(f"{path_str:50} {label(original):20} -> {label(candidates[slot]):20}")
+        
+        return slot
+    
+    def run_pipeline(self, steps, log_function=None, progress_callback=None, workers=1, check_access=False,
+                     step_cache=None):
+        """Run all pipeline steps and return their StepGraph, with each step's wall time recorded.
+        
+        With workers > 1, independent steps run concurrently in forked
+        processes (see step_graph.run_parallel). With check_access, steps run
+        in order and any extractor a step gets without declaring it, or changes
+        while declaring it only in READS, is reported.
+        With a step_cache (step_cache.StepCache), steps run in order and steps
+        whose inputs are unchanged since a previous run are replayed from disk.
+        Replaying a decision journal (self.replay) also runs steps in order,
+        since each decision must be taken from the journal exactly once.
+        """
+        graph = StepGraph(steps)
+        cache_keys = step_cache.keys_for(self, graph) if step_cache is not None else None
+        if workers > 1 and not check_access and step_cache is None and self.replay is None:
+            if "fork" in multiprocessing.get_all_start_methods():
+                run_parallel(self, graph, workers, log_function, progress_callback)
+                return graph
+            if log_function:
+                log_function("Parallel steps need fork(); running them in order")
+        
+        for i, step in enumerate(graph.steps):
             if log_function:
                 log_function(f"Running {step.__class__.__name__}...")
             
-            step.run(self)
+            start = time.perf_counter()
+            try:
+                with self.profiler.step(step) if self.profiler is not None else nullcontext():
+                    self._begin_step(graph, i)
+                    if check_access:
+                        watched = watch_reads(read_only_extractors(self, graph, i), self)
+                        self._access_log = set()
+                    if step_cache is not None:
+                        step_cache.run(self, graph, i, cache_keys[i])
+                    else:
+                        step.run(self)
+            finally:
+                accessed, self._access_log = self._access_log, None
+                self._step_writes = None
+            graph.durations[i] = time.perf_counter() - start
+            
+            allowed = graph.accessible(i)
+            if check_access and allowed is not None:
+                undeclared = sorted(cls.__name__ for cls in accessed - allowed)
+                if undeclared:
+                    print(f"{step.__class__.__name__}: gets undeclared {', '.join(undeclared)}", file=sys.stderr)
+                changed = changed_reads(watched)
+                if changed:
+                    print(f"{step.__class__.__name__}: changes {', '.join(changed)}, declared only in READS", file=sys.stderr)
+            
+            if self.journal is not None:
+                self.journal.flush()
             
             if progress_callback:
-                progress_percent = int((i + 1) * 100 / len(steps))
+                progress_percent = int((i + 1) * 100 / len(graph.steps))
                 progress_callback(progress_percent)
+        return graph
     
     def write_all(self, log_function=None):
+        """Write every loaded extractor back to the ROM, logging per-NARC re-encode stats."""
         for obj in self._objects.values():
-            obj.write()
+            stats = obj.write()
+            if log_function and isinstance(stats, dict):
+                if stats["written"]:
+                    log_function(f"{stats['path']}: re-encoded {stats['encoded']}/{stats['entries']} entries "
+                                 f"({stats['bytes_encoded']} bytes), {stats['changed']} changed")
+                else:
+                    log_function(f"{stats['path']}: unchanged, skipped "
+                                 f"({stats['encoded']} entries / {stats['bytes_encoded']} bytes checked)")
 
 
 #########################
@@ -409,13 +1296,16 @@ class NameTableReader(Extractor):
 
 class LoadPokemonNamesStep(NameTableReader):
     filename = "build/rawtext/237.txt"
+    INPUT_PATHS = (filename,)
 
         
 class LoadMoveNamesStep(NameTableReader):
     filename = "build/rawtext/750.txt"
+    INPUT_PATHS = (filename,)
 
 class LoadAbilityNames(NameTableReader):
     filename = "data/text/720.txt"
+    INPUT_PATHS = (filename,)
 
 
 
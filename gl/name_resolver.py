@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Shared name resolution over the move, ability and Pokemon name tables.
+
+A NameIndex answers three questions about one table:
+  - get(name):     the ID of an exact match, else of the first name (in table
+                   order) with the same canonical form
+  - closest(name): the nearest name by edit distance between canonical forms,
+                   for "did you mean" warnings
+  - ids:           the plain name -> ID mapping
+Canonical forms are lower-cased names; indexes over the MOVE_/ABILITY_/
+SPECIES_ constants (NameResolver.from_headers, for tools that run without a
+ROM) drop the prefix and punctuation as well, so "U-turn" finds MOVE_U_TURN.
+NameIndex.name() gives the table name a lookup resolves to. Fuzzy lookups go through a bigram
+index: a name within edit distance d of the query shares all but at most 2*d
+of its bigrams with it, so candidates are tried in order of that lower bound
+and the search stops once the bound passes the best distance found. Every
+answer is memoized, so all callers that share a NameResolver get the same
+result for the same input.
+"""
+import functools
+import os
+import re
+from collections import Counter, defaultdict
+
+from framework import Extractor, LoadAbilityNames, LoadPokemonNamesStep
+from extractors import Moves
+
+# Table entries that never make sense as a fuzzy match
+PLACEHOLDER_NAMES = ("", "-")
+
+CONSTANTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "include", "constants")
+
+_DEFINE = re.compile(r"^\s*#define\s+(\w+)\s+(.+?)\s*(?://.*)?$")
+
+
+def canonical_name(name):
+    return name.lower()
+
+
+def constant_form(prefix):
+    """Canonical form for constants named prefix + NAME: the prefix, case and punctuation are dropped."""
+    def form(name):
+        if name.upper().startswith(prefix):
+            name = name[len(prefix):]
+        return re.sub(r"[^a-z0-9]", "", name.lower())
+    return form
+
+
+def read_constants(path, prefix):
+    """Name -> value of the #defines in a C header whose names start with prefix, in file order.
+
+    Values may be arithmetic over earlier defines; ones that don't evaluate
+    to an int are skipped.
+    """
+    values = {}
+    constants = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            match = _DEFINE.match(line)
+            if not match:
+                continue
+            name, expression = match.groups()
+            try:
+                value = eval(expression, {"__builtins__": {}}, values)
+            except Exception:
+                continue
+            if not isinstance(value, int):
+                continue
+            values[name] = value
+            if name.startswith(prefix):
+                constants[name] = value
+    return constants
+
+
+def edit_distance(s1, s2, limit=None):
+    """Levenshtein edit distance between two strings.
+    
+    With a limit, stops early and returns limit + 1 once the distance is
+    known to exceed it.
+    """
+    if len(s1) < len(s2):
+        return edit_distance(s2, s1, limit)
+
+    if len(s2) == 0:
+        return len(s1)
+
+    previous_row = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1):
+        current_row = [i + 1]
+        for j, c2 in enumerate(s2):
+            insertions = previous_row[j + 1] + 1
+            deletions = current_row[j] + 1
+            substitutions = previous_row[j] + (c1 != c2)
+            current_row.append(min(insertions, deletions, substitutions))
+        if limit is not None and min(current_row) > limit:
+            return limit + 1
+        previous_row = current_row
+
+    return previous_row[-1]
+
+
+def _bigrams(form):
+    padded = f"\0{form}\0"
+    return Counter(padded[i:i + 2] for i in range(len(padded) - 1))
+
+
+class NameIndex:
+    """Exact, canonical and fuzzy lookups over one name -> ID mapping.
+
+    canonical maps a name to its canonical form (canonical_name by default).
+    """
+
+    # Memoized answers; filled in by lookups (see Extractor.MEMO_ATTRS)
+    MEMO_ATTRS = ("_resolved", "_closest")
+
+    def __init__(self, name_to_id, canonical=canonical_name):
+        self.ids = dict(name_to_id)
+        self._form = canonical
+        self._canonical = {}  # canonical form -> first name with it
+        # Fuzzy candidates, one per canonical form: (form, table position, name, bigram count)
+        self._forms = []
+        self._postings = defaultdict(list)  # bigram -> [(candidate, occurrences)]
+        seen = set()
+        for position, name in enumerate(self.ids):
+            if not name:
+                continue
+            form = self._form(name)
+            self._canonical.setdefault(form, name)
+            if name in PLACEHOLDER_NAMES or form in seen:
+                continue  # an earlier name with the same form is the one reported
+            seen.add(form)
+            grams = _bigrams(form)
+            for gram, count in grams.items():
+                self._postings[gram].append((len(self._forms), count))
+            self._forms.append((form, position, name, len(form) + 1))
+        self._resolved = {}
+        self._closest = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get(self, name):
+        """ID of name, or of the first name with the same canonical form; None if there is none."""
+        if not name:
+            return None
+        if name in self._resolved:
+            return self._resolved[name]
+        table_name = self.name(name)
+        name_id = None if table_name is None else self.ids[table_name]
+        self._resolved[name] = name_id
+        return name_id
+
+    def name(self, name):
+        """The table name get(name) resolves to: name itself, or the first name with its canonical form; None if there is none."""
+        if not name:
+            return None
+        if name in self.ids:
+            return name
+        return self._canonical.get(self._form(name))
+
+    def closest(self, name):
+        """(closest name, edit distance) between canonical forms, or None.
+
+        Ties go to the name that comes first in the table.
+        """
+        if not name or not self._forms:
+            return None
+        if name in self._closest:
+            return self._closest[name]
+        target = self._form(name)
+        grams = _bigrams(target)
+        total = len(target) + 1
+
+        shared = defaultdict(int)
+        for gram, count in grams.items():
+            for candidate, occurrences in self._postings.get(gram, ()):
+                shared[candidate] += min(count, occurrences)
+
+        def lower_bound(candidate):
+            form, _, _, count = self._forms[candidate]
+            return max(abs(len(form) - len(target)), -(-(max(count, total) - shared.get(candidate, 0)) // 2))
+
+        best = None  # (distance, position, name)
+        for candidate in sorted(shared, key=lambda c: (lower_bound(c), self._forms[c][1])):
+            if best is not None and lower_bound(candidate) > best[0]:
+                break
+            best = self._try(candidate, target, best)
+        # Names sharing no bigram are at least half the longer bigram count away
+        if best is None or best[0] >= -(-total // 2):
+            for candidate in range(len(self._forms)):
+                if candidate not in shared and (best is None or lower_bound(candidate) <= best[0]):
+                    best = self._try(candidate, target, best)
+
+        result = self._closest[name] = (best[2], best[0])
+        return result
+
+    def _try(self, candidate, target, best):
+        form, position, name, _ = self._forms[candidate]
+        distance = edit_distance(target, form, None if best is None else best[0])
+        if best is None or (distance, position) < best[:2]:
+            return (distance, position, name)
+        return best
+
+
+class NameResolver(Extractor):
+    """NameIndex for each name table, shared by every caller in a context.
+
+    moves maps the names of moves in the Moves NARC to their IDs and
+    abilities the ability name table; a repeated name keeps its last ID, as
+    the dicts CustomSetReader used to build did. pokemon maps the species
+    name table and keeps a repeated name's first ID, like
+    LoadPokemonNamesStep.get_by_name.
+    """
+
+    SOURCES = ('Moves', 'LoadAbilityNames', 'LoadPokemonNamesStep')
+
+    def __init__(self, context):
+        super().__init__(context)
+        self.moves = NameIndex({move.name: move.move_id for move in context.get(Moves).data if move.name})
+        self.abilities = NameIndex({name: ability_id for ability_id, name in context.get(LoadAbilityNames).id_to_name.items()})
+        self.pokemon = NameIndex({name: ids[0] for name, ids in context.get(LoadPokemonNamesStep).name_to_ids.items()})
+
+    @classmethod
+    def from_headers(cls, constants_dir=CONSTANTS_DIR):
+        """NameResolver over the MOVE_, ABILITY_ and SPECIES_ constants, for tools that run without a ROM.
+
+        Names are the constants themselves; the first constant with a value wins.
+        """
+        resolver = cls.__new__(cls)
+        resolver.context = resolver.rom = None
+        for attr, header, prefix in (("moves", "moves.h", "MOVE_"), ("abilities", "ability.h", "ABILITY_"),
+                                     ("pokemon", "species.h", "SPECIES_")):
+            setattr(resolver, attr, NameIndex(read_constants(os.path.join(constants_dir, header), prefix), constant_form(prefix)))
+        return resolver
+
+    def species_id(self, name):
+        """Species ID for name, as get_by_name, falling back to a case-insensitive match.
+
+        Raises KeyError naming the closest species when nothing matches.
+        """
+        species_id = self.pokemon.get(name)
+        if species_id is None:
+            closest_match = self.pokemon.closest(name)
+            hint = f" (closest match: '{closest_match[0]}', edit distance {closest_match[1]})" if closest_match else ""
+            raise KeyError(f"{name!r}{hint}")
+        return species_id
+
+
+@functools.lru_cache(maxsize=None)
+def header_names(constants_dir=CONSTANTS_DIR):
+    """Shared NameResolver.from_headers(constants_dir)."""
+    return NameResolver.from_headers(constants_dir)
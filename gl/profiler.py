@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Per-step instrumentation for RandomizationContext.run_pipeline.
+
+Attach a PipelineProfiler to a context (ctx.profiler = PipelineProfiler()) and
+every step run through run_pipeline records wall time, CPU time, peak traced
+memory, the number of decisions (context.decide and decide_weighted, replayed
+ones included) and the time spent inside filters or weighted draws. Extractor
+construction triggered through context.get is recorded too, nested under
+whichever step caused it. Steps run in --parallel-steps workers are measured
+in the worker and merged back; their memory figures cover the worker only.
+
+Results can be printed as a table (report()), dumped as JSON (write_json()) or
+written as a Chrome trace (write_chrome_trace(), open in chrome://tracing or
+Perfetto).
+"""
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class StepProfile:
+    """Measurements for one pipeline step or extractor construction."""
+
+    def __init__(self, kind, name):
+        self.kind = kind  # "step" or "extractor"
+        self.name = name
+        self.start = 0.0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_memory = 0
+        self.mem_before = 0
+        self.decide_calls = 0
+        self.filter_time = 0.0
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "start": self.start,
+            "wall": self.wall,
+            "cpu": self.cpu,
+            "peak_memory": self.peak_memory,
+            "decide_calls": self.decide_calls,
+            "filter_time": self.filter_time,
+        }
+
+
+class PipelineProfiler:
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.records = []
+        self._stack = []
+        self._origin = time.perf_counter()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def _measure(self, kind, name):
+        record = StepProfile(kind, name)
+        record.start = time.perf_counter() - self._origin
+        if self.trace_memory:
+            record.mem_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        self._stack.append(record)
+        try:
+            yield record
+        finally:
+            self._stack.pop()
+            record.wall = time.perf_counter() - wall_start
+            record.cpu = time.process_time() - cpu_start
+            peak = tracemalloc.get_traced_memory()[1] if self.trace_memory else 0
+            if self.trace_memory:
+                record.peak_memory = max(record.peak_memory, peak - record.mem_before)
+            self.records.append(record)
+            # Nested work also counts toward the enclosing step
+            if self._stack:
+                parent = self._stack[-1]
+                parent.decide_calls += record.decide_calls
+                parent.filter_time += record.filter_time
+                if self.trace_memory:
+                    # reset_peak() above discarded the parent's peak so far
+                    parent.peak_memory = max(parent.peak_memory, peak - parent.mem_before)
+
+    def step(self, step):
+        return self._measure("step", step.__class__.__name__)
+
+    def extractor(self, obj_class):
+        return self._measure("extractor", obj_class.__name__)
+
+    def record_decide(self, filter_time):
+        if self._stack:
+            record = self._stack[-1]
+            record.decide_calls += 1
+            record.filter_time += filter_time
+
+    def merge(self, records):
+        """Add records measured in a forked worker; it inherited this profiler's origin, so start times line up."""
+        self.records.extend(records)
+
+    def stop(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def report(self, sort_by="wall"):
+        """Format steps and extractor constructions as tables sorted by sort_by (descending)."""
+        lines = []
+        for kind, title in (("step", "Step"), ("extractor", "Extractor (construction)")):
+            records = sorted((r for r in self.records if r.kind == kind),
+                             key=lambda r: getattr(r, sort_by), reverse=True)
+            if not records:
+                continue
+            lines.append(f"{title:40} {'wall s':>9} {'cpu s':>9} {'peak MB':>9} {'decides':>8} {'filter s':>9}")
+            for r in records:
+                lines.append(f"{r.name:40} {r.wall:9.3f} {r.cpu:9.3f} {r.peak_memory / 2**20:9.1f} "
+                             f"{r.decide_calls:8} {r.filter_time:9.3f}")
+            if kind == "step":
+                # Extractor rows nest inside each other, so only steps add up
+                lines.append(f"{'total':40} {sum(r.wall for r in records):9.3f}")
+            lines.append("")
+        return "\n".join(lines)
+
+    def to_json(self):
+        return {"records": [r.to_dict() for r in self.records]}
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, indent=2)
+
+    def write_chrome_trace(self, path):
+        """Write complete ("X") events in the Chrome trace event format."""
+        events = []
+        for r in self.records:
+            events.append({
+                "name": r.name,
+                "cat": r.kind,
+                "ph": "X",
+                "ts": r.start * 1e6,
+                "dur": r.wall * 1e6,
+                "pid": os.getpid(),
+                "tid": 0,
+                "args": {
+                    "cpu_s": r.cpu,
+                    "peak_memory": r.peak_memory,
+                    "decide_calls": r.decide_calls,
+                    "filter_s": r.filter_time,
+                },
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
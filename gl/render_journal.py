@@ -0,0 +1,92 @@
+import argparse
+import sys
+import os
+from collections import Counter, defaultdict
+from framework import PathHierMap
+from decision_journal import JournalFormatError, read_journal
+
+
+def split_path(path_str):
+    return [p.lower() for p in path_str.split("/") if p]
+
+
+def parse_path_filters(path_args):
+    """Parse --path arguments into a PathHierMap of path -> include flag (PATH, PATH=1 or PATH=0)."""
+    mappings = [([], not path_args or all(arg.endswith("=0") for arg in path_args))]
+    for arg in path_args:
+        path_str, _, flag = arg.partition("=")
+        mappings.append((split_path(path_str), flag != "0"))
+    return PathHierMap(mappings)
+
+
+def render(decisions):
+    for d in decisions:
+        if d.index < 0:
+            print(f"{d.path:50} [WARNING] No valid candidates, keeping original: {d.original}")
+        else:
+            print(f"{d.path:50} {d.original:20} -> {d.selected:20}")
+
+
+def summarize(decisions, depth, top):
+    """Print decision counts and mean candidate counts per path prefix of the given depth."""
+    groups = defaultdict(list)
+    for d in decisions:
+        groups["/" + "/".join(d.path.split("/")[1:depth + 1])].append(d)
+
+    print(f"{'Path':50} {'Decisions':>9} {'Kept':>6} {'Candidates':>10} {'Filtered':>9}")
+    for prefix in sorted(groups):
+        group = groups[prefix]
+        kept = sum(1 for d in group if d.index < 0)
+        candidates = sum(d.candidates for d in group) / len(group)
+        filtered = sum(d.filtered for d in group) / len(group)
+        print(f"{prefix:50} {len(group):9} {kept:6} {candidates:10.1f} {filtered:9.1f}")
+        if top:
+            for selected, count in Counter(d.selected for d in group if d.index >= 0).most_common(top):
+                print(f"    {count:6}  {selected}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render, filter and aggregate a decision journal written by Randomizer.py --journal",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Print every decision, like the verbosity 2 console log
+  python render_journal.py Goldilockes.journal
+
+  # Only encounters, except area_12
+  python render_journal.py Goldilockes.journal --path /encounters --path /encounters/area_12=0
+
+  # Decision counts per second-level path, with the 5 most common picks
+  python render_journal.py Goldilockes.journal --summary --depth 2 --top 5
+        """
+    )
+
+    parser.add_argument("journal", help="Journal file (.journal)")
+    parser.add_argument("--path", action="append", default=[], metavar="PATH[=0]",
+                       help="Include decisions under PATH (PATH=0 excludes); the most specific match wins, as with -v")
+    parser.add_argument("--summary", action="store_true", help="Aggregate decisions per path prefix instead of listing them")
+    parser.add_argument("--depth", type=int, default=1, help="Path depth to aggregate at with --summary (default: 1)")
+    parser.add_argument("--top", type=int, default=0, metavar="K", help="With --summary, list the K most common selections per prefix")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.journal):
+        print(f"Error: journal file '{args.journal}' not found")
+        sys.exit(1)
+
+    filters = parse_path_filters(args.path)
+    try:
+        decisions = [d for d in read_journal(args.journal) if filters.get(split_path(d.path))]
+    except JournalFormatError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.summary:
+        summarize(decisions, args.depth, args.top)
+    else:
+        render(decisions)
+
+
+if __name__ == "__main__":
+    main()
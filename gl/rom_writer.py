@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental NDS writer: save a modified ndspy ROM by patching a copy of the
+base ROM file instead of re-laying out the whole image with rom.save().
+
+The base file is copied as is, then for each FAT file that changed:
+  - if it fits in its slot (up to the next region in the base layout) it is
+    overwritten in place and its FAT end offset updated;
+  - otherwise it is appended after the last file (0x200 aligned) and its FAT
+    entry repointed; the RSA signature moves to the new end.
+ARM9/ARM7, the overlay tables and the banner are overwritten in place when
+their size is unchanged. When the image grows, the header's device capacity
+is raised to fit it; the header CRC is updated whenever the header changes.
+
+plan_rom() works this out as a list of (offset, bytes) edits over the base
+image, which write_rom() applies to a copy of the base file and
+bps.create_edit_patch() turns into a patch. Anything else (different file
+count, renamed files, resized ARM binaries, writing over the base file
+itself) raises IncrementalWriteError so the caller can fall back to
+rom.save(). Saving then costs one file copy plus the changed data.
+"""
+import bisect
+import os
+import shutil
+import struct
+
+from ndspy import _common, fnt
+
+ALIGNMENT = 0x200
+PADDING = b"\xFF"
+
+# (name, ndspy attribute, header offset field, header size field)
+_BLOBS = [
+    ("arm9", "arm9", 0x20, 0x2C),
+    ("arm7", "arm7", 0x30, 0x3C),
+    ("arm9 overlay table", "arm9OverlayTable", 0x50, 0x54),
+    ("arm7 overlay table", "arm7OverlayTable", 0x58, 0x5C),
+]
+
+
+class IncrementalWriteError(Exception):
+    """The ROM has changes the incremental writer can't express; use rom.save() instead."""
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _read_at(f, offset, size):
+    f.seek(offset)
+    return f.read(size)
+
+
+def _write_at(f, offset, data):
+    f.seek(offset)
+    f.write(data)
+
+
+def plan_rom(rom, base, base_files=None):
+    """Edits that turn the base image into rom, as ([(offset, bytes)], stats).
+
+    base is a readable binary file (or BytesIO) holding the ROM rom was
+    loaded from. Edits are applied in order over a copy of it; the image may
+    grow past its end. base_files, if given, is rom.files as originally
+    loaded; files that are still those exact objects are skipped without
+    reading them back.
+
+    stats counts files written in place, files relocated and bytes written.
+    Raises IncrementalWriteError if rom can't be written this way.
+    """
+    stats = {"in_place": 0, "relocated": 0, "bytes_written": 0}
+    edits = []
+
+    original_header = _read_at(base, 0, 0x200)
+    header = bytearray(original_header)
+
+    def u32(offset):
+        return struct.unpack_from("<I", header, offset)[0]
+
+    fnt_offset, fnt_size, fat_offset, fat_size = struct.unpack_from("<4I", header, 0x40)
+    if fat_size // 8 != len(rom.files):
+        raise IncrementalWriteError(f"file count changed ({fat_size // 8} -> {len(rom.files)})")
+
+    if fnt.save(rom.filenames) != _read_at(base, fnt_offset, fnt_size):
+        raise IncrementalWriteError("filename table changed")
+
+    fat = list(struct.iter_unpack("<II", _read_at(base, fat_offset, fat_size)))
+    rsa_offset = u32(0x80)
+    rsa_signature = _read_at(base, rsa_offset, len(rom.rsaSignature))
+
+    # Every region start in the base layout, to know how far a file may grow in place
+    region_starts = [start for start, end in fat] + [0x200, fnt_offset, fat_offset, rsa_offset]
+    region_starts += [u32(offset_field) for _, _, offset_field, _ in _BLOBS if u32(offset_field)]
+    if u32(0x68):
+        region_starts.append(u32(0x68))
+    region_starts.sort()
+
+    for name, attr, offset_field, size_field in _BLOBS:
+        data = getattr(rom, attr)
+        if len(data) != u32(size_field):
+            raise IncrementalWriteError(f"{name} size changed")
+        if data and data != _read_at(base, u32(offset_field), len(data)):
+            edits.append((u32(offset_field), data))
+            stats["bytes_written"] += len(data)
+
+    if u32(0x68) and rom.iconBanner:
+        banner = _read_at(base, u32(0x68), len(rom.iconBanner))
+        if len(banner) != len(rom.iconBanner):
+            raise IncrementalWriteError("icon/banner size changed")
+        if banner != rom.iconBanner:
+            edits.append((u32(0x68), rom.iconBanner))
+            stats["bytes_written"] += len(rom.iconBanner)
+
+    end_of_files = rsa_offset
+    new_fat = list(fat)
+    for file_id, data in enumerate(rom.files):
+        if base_files is not None and data is base_files[file_id]:
+            continue
+        start, end = fat[file_id]
+        if len(data) == end - start and data == _read_at(base, start, end - start):
+            continue
+
+        # A shared start (aliased or empty files) leaves no room to grow
+        next_start = bisect.bisect_right(region_starts, start)
+        shared = bisect.bisect_left(region_starts, start) != next_start - 1
+        limit = end if shared else (region_starts[next_start] if next_start < len(region_starts) else rsa_offset)
+
+        if start + len(data) <= limit:
+            edits.append((start, data + PADDING * (end - start - len(data))))
+            new_fat[file_id] = (start, start + len(data))
+            stats["in_place"] += 1
+        else:
+            start = _align(end_of_files)
+            edits.append((end_of_files, PADDING * (start - end_of_files) + data))
+            end_of_files = start + len(data)
+            new_fat[file_id] = (start, end_of_files)
+            stats["relocated"] += 1
+        stats["bytes_written"] += len(data)
+
+    if new_fat != fat:
+        edits.append((fat_offset, b"".join(struct.pack("<II", *entry) for entry in new_fat)))
+
+    if end_of_files != rsa_offset:
+        # Files were appended: the RSA signature goes after them, as rom.save() lays it out
+        new_rsa_offset = (end_of_files + 0x1F) // 0x20 * 0x20
+        edits.append((end_of_files, b"\0" * (new_rsa_offset - end_of_files) + rsa_signature))
+        struct.pack_into("<I", header, 0x80, new_rsa_offset)
+        if struct.unpack("<I", _read_at(base, 0x1000, 4))[0] == rsa_offset:
+            edits.append((0x1000, struct.pack("<I", new_rsa_offset)))
+        # Device capacity is 128 KB << n; raise it if the image no longer fits
+        image_end = new_rsa_offset + len(rsa_signature)
+        header[0x14] = max(header[0x14], (image_end - 1).bit_length() - 17)
+
+    if header != original_header:
+        struct.pack_into("<H", header, 0x15E, _common.crc16(header[0:0x15E]))
+        edits.append((0, bytes(header)))
+
+    return edits, stats
+
+
+def write_rom(rom, base_path, out_path, base_files=None):
+    """Write rom to out_path by patching a copy of base_path (the ROM rom was loaded from).
+
+    base_files is as for plan_rom(). Returns plan_rom()'s stats.
+    Raises IncrementalWriteError if rom can't be written this way.
+    """
+    if os.path.exists(out_path) and os.path.samefile(base_path, out_path):
+        raise IncrementalWriteError(f"output {out_path!r} is the base ROM")
+
+    with open(base_path, "rb") as base:
+        edits, stats = plan_rom(rom, base, base_files)
+
+    shutil.copyfile(base_path, out_path)
+    with open(out_path, "r+b") as f:
+        for offset, data in edits:
+            _write_at(f, offset, data)
+
+    return stats
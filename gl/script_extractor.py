@@ -11,6 +11,8 @@ class ScriptNarc(Writeback, NarcExtractor):
     to avoid overwriting each other's changes.
     """
     
+    LAZY_NARC = True
+    
     def __init__(self, context):
         super().__init__(context)
         self.data = self.load_narc()
@@ -26,6 +28,134 @@ class ScriptNarc(Writeback, NarcExtractor):
         return data
 
 
+class ScriptCommandIndex(Extractor):
+    """Opcode -> [(file_index, offset, params)] index over every script in a/0/1/2.
+    
+    Each script file is walked once, instruction by instruction, starting at its
+    scrdef entries and following Jump/call targets, using the command table
+    ScriptDisassembler builds from scriptmacros.s. Matches are therefore always
+    on instruction boundaries, unlike a byte-pattern scan.
+    
+    A walk can't continue past an opcode with no known signature. When that
+    happens the file is also swept linearly from the end of its header, the
+    way ScriptDisassembler does (unknown opcodes skip 2 bytes), so commands
+    after the unknown opcode or only reachable through tables the walk doesn't
+    follow are still indexed. Those files are listed in linear_files.
+    
+    Offsets stay valid as extractors patch commands in place, but params are
+    the values in the original scripts: read current values from
+    ScriptNarc.data at the offset.
+    
+    Usage:
+        index = context.get(ScriptCommandIndex)
+        for file_index, offset, params in index.find(0x0089):  # GivePokemon
+            ...
+    """
+    
+    SOURCES = ('ScriptNarc',)
+    
+    # Relative operands of these commands point at data (movement scripts), not code
+    DATA_REFERENCE_COMMANDS = {0x005E}  # Movement
+    FLOW_END_COMMANDS = ('end', 'return', 'Jump')
+    
+    def __init__(self, context):
+        super().__init__(context)
+        disassembler = context.get(ScriptDisassembler)
+        self.cmd_lookup = disassembler.cmd_lookup
+        if not self.cmd_lookup:
+            raise RuntimeError("ScriptCommandIndex: no script command table (is armips/include/scriptmacros.s present?)")
+        
+        self.by_opcode = {}
+        self._commands_at = {}
+        self.unknown_opcodes = 0  # walks stopped at an opcode with no fixed-size signature
+        self.linear_files = []  # files also swept linearly because a walk stopped early
+        for file_index, file_data in enumerate(context.get(ScriptNarc).data):
+            self._index_file(disassembler, file_index, file_data)
+        for commands in self.by_opcode.values():
+            commands.sort()
+        print(f"ScriptCommandIndex: Indexed {len(self._commands_at)} commands "
+              f"({self.unknown_opcodes} walks stopped at unknown opcodes, "
+              f"{len(self.linear_files)} files swept linearly)", file=sys.stderr)
+    
+    def _decode(self, data, offset):
+        """(cmd_id, params, next offset) of the instruction at offset; None if unknown or truncated."""
+        cmd_id = data[offset] | (data[offset + 1] << 8)
+        sig = self.cmd_lookup.get(cmd_id)
+        if sig is None:
+            return None
+        params = []
+        param_offset = offset + 2
+        for slot in sig.slots:
+            if param_offset + slot.size > len(data):
+                return None  # truncated command at end of file
+            params.append(int.from_bytes(data[param_offset:param_offset + slot.size], 'little', signed=slot.is_relative))
+            param_offset += slot.size
+        return cmd_id, tuple(params), param_offset
+    
+    def _index_file(self, disassembler, file_index, data):
+        scrdefs, header_end = disassembler._parse_header(data)
+        work_queue = [target for _, target in scrdefs]
+        visited = set()
+        commands = {}  # offset -> (cmd_id, params, next offset)
+        stopped = False
+        
+        while work_queue:
+            offset = work_queue.pop()
+            while header_end <= offset and offset + 2 <= len(data) and offset not in visited:
+                visited.add(offset)
+                if (data[offset] | (data[offset + 1] << 8)) not in self.cmd_lookup:
+                    # Unknown length: the walk can't go on, the linear sweep below covers the rest
+                    self.unknown_opcodes += 1
+                    stopped = True
+                    break
+                decoded = self._decode(data, offset)
+                if decoded is None:
+                    break  # truncated command at end of file
+                
+                cmd_id, params, next_offset = decoded
+                commands[offset] = decoded
+                sig = self.cmd_lookup[cmd_id]
+                if cmd_id not in self.DATA_REFERENCE_COMMANDS:
+                    param_offset = offset + 2
+                    for slot, value in zip(sig.slots, params):
+                        if slot.is_relative:
+                            # Stored as dest - . - 4, relative to the operand
+                            work_queue.append(param_offset + value + 4)
+                        param_offset += slot.size
+                if sig.name in self.FLOW_END_COMMANDS:
+                    break
+                offset = next_offset
+        
+        if stopped:
+            self.linear_files.append(file_index)
+            offset = header_end
+            while offset + 2 <= len(data):
+                if offset in commands:
+                    offset = commands[offset][2]
+                    continue
+                decoded = self._decode(data, offset)
+                if decoded is None:
+                    offset += 2
+                    continue
+                commands[offset] = decoded
+                offset = decoded[2]
+        
+        for offset, (cmd_id, params, _) in commands.items():
+            self.by_opcode.setdefault(cmd_id, []).append((file_index, offset, params))
+            self._commands_at[(file_index, offset)] = (cmd_id, params)
+    
+    def find(self, cmd_id, file_index=None):
+        """All (file_index, offset, params) for cmd_id, in file then offset order."""
+        commands = self.by_opcode.get(cmd_id, [])
+        if file_index is None:
+            return list(commands)
+        return [c for c in commands if c[0] == file_index]
+    
+    def command_at(self, file_index, offset):
+        """(cmd_id, params) of the instruction starting at offset, or None."""
+        return self._commands_at.get((file_index, offset))
+
+
 class GiftPokemon(Extractor):
     """Extractor for GivePokemon script commands in NARC a/0/1/2
     
@@ -48,6 +178,8 @@ class GiftPokemon(Extractor):
             gift.pokemon_id = 25  # Change to Pikachu
     """
     
+    SOURCES = ('ScriptNarc',)
+    
     COMMAND_ID = 0x0089  # GivePokemon command
     COMMAND_SIZE = 14    # 2 (cmd) + 12 (6 params * 2 bytes each)
     
@@ -72,35 +204,26 @@ class GiftPokemon(Extractor):
         print(f"Found {len(self.gifts)} GivePokemon commands", file=sys.stderr)
     
     def _find_all_gifts(self):
-        """Scan all script files for GivePokemon commands.
+        """Find all GivePokemon commands via ScriptCommandIndex.
         
         Returns list of construct Containers with file_index and offset added.
         """
         gifts = []
         
-        for file_idx, file_data in enumerate(self.data):
-            if len(file_data) < self.COMMAND_SIZE:
-                continue
+        for file_idx, offset, _ in self.context.get(ScriptCommandIndex).find(self.COMMAND_ID):
+            file_data = self.data[file_idx]
+            parsed = self.gift_struct.parse(file_data[offset:offset + self.COMMAND_SIZE])
             
-            # Scan for command pattern (0x0089 as little-endian)
-            for offset in range(len(file_data) - self.COMMAND_SIZE + 1):
-                if file_data[offset] == 0x89 and file_data[offset + 1] == 0x00:
-                    # Parse using construct
-                    try:
-                        parsed = self.gift_struct.parse(file_data[offset:offset + self.COMMAND_SIZE])
-                    except Exception:
-                        continue
-                    
-                    # Validate: result_var should be in 0x8000+ range (script variable)
-                    # and pokemon/level should be reasonable
-                    if (parsed.result_var >= 0x8000 and 
-                        1 <= parsed.pokemon_id <= 700 and 
-                        1 <= parsed.level <= 100):
-                        
-                        # Add location metadata to the Container
-                        parsed.file_index = file_idx
-                        parsed.offset = offset
-                        gifts.append(parsed)
+            # Validate: result_var should be in 0x8000+ range (script variable)
+            # and pokemon/level should be reasonable
+            if (parsed.result_var >= 0x8000 and 
+                1 <= parsed.pokemon_id <= 700 and 
+                1 <= parsed.level <= 100):
+                
+                # Add location metadata to the Container
+                parsed.file_index = file_idx
+                parsed.offset = offset
+                gifts.append(parsed)
         
         return gifts
     
@@ -138,6 +261,8 @@ class WildBattle(Extractor):
             # If battle.playcry_offset is not None, the cry will also be updated
     """
     
+    SOURCES = ('ScriptNarc',)
+    
     COMMAND_ID = 0x00F9  # WildBattle command
     COMMAND_SIZE = 6     # 2 (cmd) + 4 (2 params * 2 bytes each)
     PLAYCRY_CMD = 0x004C
@@ -158,38 +283,30 @@ class WildBattle(Extractor):
         self.battles = self._find_all_battles()
         print(f"Found {len(self.battles)} WildBattle commands", file=sys.stderr)
     
-    def _find_playcry_before(self, file_data, wildbattle_offset):
-        """Search for PlayCry command at exactly 12 or 17 bytes before WildBattle."""
+    def _find_playcry_before(self, index, file_idx, wildbattle_offset):
+        """Find a PlayCry command exactly 12 or 17 bytes before WildBattle."""
         for dist in self.PLAYCRY_DISTANCES:
-            search_offset = wildbattle_offset - dist
-            if search_offset >= 0 and search_offset + 1 < len(file_data):
-                if file_data[search_offset] == 0x4C and file_data[search_offset + 1] == 0x00:
-                    return search_offset
+            command = index.command_at(file_idx, wildbattle_offset - dist)
+            if command is not None and command[0] == self.PLAYCRY_CMD:
+                return wildbattle_offset - dist
         return None
     
     def _find_all_battles(self):
-        """Scan all script files for WildBattle commands."""
+        """Find all WildBattle commands via ScriptCommandIndex."""
         battles = []
+        index = self.context.get(ScriptCommandIndex)
         
-        for file_idx, file_data in enumerate(self.data):
-            if len(file_data) < self.COMMAND_SIZE:
-                continue
+        for file_idx, offset, _ in index.find(self.COMMAND_ID):
+            file_data = self.data[file_idx]
+            parsed = self.battle_struct.parse(file_data[offset:offset + self.COMMAND_SIZE])
             
-            # Scan for command pattern (0x00F9 as little-endian)
-            for offset in range(len(file_data) - self.COMMAND_SIZE + 1):
-                if file_data[offset] == 0xF9 and file_data[offset + 1] == 0x00:
-                    try:
-                        parsed = self.battle_struct.parse(file_data[offset:offset + self.COMMAND_SIZE])
-                    except Exception:
-                        continue
-                    
-                    # Validate: pokemon/level should be reasonable
-                    if 1 <= parsed.pokemon_id <= 2000 and 1 <= parsed.level <= 100:
-                        parsed.file_index = file_idx
-                        parsed.offset = offset
-                        # Find associated PlayCry command
-                        parsed.playcry_offset = self._find_playcry_before(file_data, offset)
-                        battles.append(parsed)
+            # Validate: pokemon/level should be reasonable
+            if 1 <= parsed.pokemon_id <= 2000 and 1 <= parsed.level <= 100:
+                parsed.file_index = file_idx
+                parsed.offset = offset
+                # Find associated PlayCry command
+                parsed.playcry_offset = self._find_playcry_before(index, file_idx, offset)
+                battles.append(parsed)
         
         return battles
     
@@ -232,6 +349,8 @@ class GiftEggs(Extractor):
             egg.pokemon_id = 25  # Change to Pikachu egg
     """
     
+    SOURCES = ('ScriptNarc',)
+    
     COMMAND_ID = 0x008A  # GivePokemonEgg command
     COMMAND_SIZE = 6     # 2 (cmd) + 4 (2 params * 2 bytes each)
     
@@ -267,6 +386,7 @@ class GiftEggs(Extractor):
         Returns list of construct Containers with file_index and offset added.
         """
         eggs = []
+        index = self.context.get(ScriptCommandIndex)
         
         for file_idx in self.KNOWN_EGG_FILES:
             if file_idx >= len(self.data):
@@ -274,24 +394,16 @@ class GiftEggs(Extractor):
                 continue
             
             file_data = self.data[file_idx]
-            if len(file_data) < self.COMMAND_SIZE:
-                continue
             
-            # Scan for the GivePokemonEgg command pattern (0x008A little-endian).
             # A single file can contain more than one egg command (e.g. file 858
             # has two GivePokemonEgg commands on separate script branches), so we
             # collect every occurrence rather than stopping at the first.
-            for offset in range(len(file_data) - self.COMMAND_SIZE + 1):
-                if file_data[offset] == 0x8A and file_data[offset + 1] == 0x00:
-                    try:
-                        parsed = self.egg_struct.parse(file_data[offset:offset + self.COMMAND_SIZE])
-                    except Exception:
-                        continue
-                    
-                    parsed.file_index = file_idx
-                    parsed.offset = offset
-                    eggs.append(parsed)
-                    print(f"GiftEggs: Found egg in file {file_idx} at offset 0x{offset:04X}: species={parsed.pokemon_id}, location={parsed.location}", file=sys.stderr)
+            for _, offset, _ in index.find(self.COMMAND_ID, file_idx):
+                parsed = self.egg_struct.parse(file_data[offset:offset + self.COMMAND_SIZE])
+                parsed.file_index = file_idx
+                parsed.offset = offset
+                eggs.append(parsed)
+                print(f"GiftEggs: Found egg in file {file_idx} at offset 0x{offset:04X}: species={parsed.pokemon_id}, location={parsed.location}", file=sys.stderr)
         
         return eggs
     
@@ -318,6 +430,8 @@ class ShinyGyarados(Extractor):
     Also tracks associated PlayCry command at 17 bytes before.
     """
     
+    SOURCES = ('ScriptNarc',)
+    
     FILE_INDEX = 938
     COMMAND_OFFSET = 0x0098  # Known offset of WildBattleSp in file 938
     PLAYCRY_OFFSET = 0x0087  # PlayCry is 17 bytes before (0x0098 - 17 = 0x0087)
@@ -377,6 +491,8 @@ class NpcGiftItems(Extractor):
     gifttiers.csv format: script_file, item_id, gift_class, tier
     """
     
+    SOURCES = ('ScriptNarc',)
+    
     SETVAR_CMD = 0x0029
     VAR_ITEM = 0x8004
     VAR_QUANTITY = 0x8005
@@ -442,7 +558,7 @@ class NpcGiftItems(Extractor):
     def _find_all_gift_offsets(self, file_index, expected_item_id):
         """Find ALL offsets of a gift item's SetVar command in a script file.
         
-        Searches for pattern: SetVar(0x8004, item_id) followed by SetVar(0x8005, quantity)
+        Looks for: SetVar(0x8004, item_id) followed by SetVar(0x8005, quantity)
         Returns list of offsets of the item_id value (SetVar command offset + 4).
         
         Multiple offsets can exist due to branching paths in the script.
@@ -451,34 +567,21 @@ class NpcGiftItems(Extractor):
             return []
         
         file_data = self.data[file_index]
+        index = self.context.get(ScriptCommandIndex)
         offsets = []
         
-        # Search for SetVar 0x8004 with the expected item_id
-        for offset in range(len(file_data) - 12):  # Need at least 12 bytes for both SetVars
-            # Check for SetVar command (0x0029)
-            if file_data[offset] != 0x29 or file_data[offset + 1] != 0x00:
-                continue
-            
-            # Check for var 0x8004
-            var = file_data[offset + 2] | (file_data[offset + 3] << 8)
+        for _, offset, (var, _) in index.find(self.SETVAR_CMD, file_index):
             if var != self.VAR_ITEM:
                 continue
             
-            # Check item_id matches
+            # Check item_id matches (current value, earlier steps may have changed it)
             item_id = file_data[offset + 4] | (file_data[offset + 5] << 8)
             if item_id != expected_item_id:
                 continue
             
             # Verify next command is SetVar 0x8005 (quantity)
-            next_offset = offset + 6
-            if next_offset + 6 > len(file_data):
-                continue
-            
-            if file_data[next_offset] != 0x29 or file_data[next_offset + 1] != 0x00:
-                continue
-            
-            next_var = file_data[next_offset + 2] | (file_data[next_offset + 3] << 8)
-            if next_var != self.VAR_QUANTITY:
+            next_command = index.command_at(file_index, offset + 6)
+            if next_command is None or next_command[0] != self.SETVAR_CMD or next_command[1][0] != self.VAR_QUANTITY:
                 continue
             
             # Found the pattern - add offset of item_id value
@@ -515,6 +618,8 @@ class ItemScript(Extractor):
     Slots are indexed in order of appearance in the file.
     """
     
+    SOURCES = ('ScriptNarc',)
+    
     ITEMSCRIPT_FILE = 141
     SETVAR_CMD = 0x0029
     VAR_ITEM = 0x8008      # Item ID variable for ground items
@@ -533,43 +638,27 @@ class ItemScript(Extractor):
         print(f"ItemScript: Found {len(self.slots)} item slots in file 141", file=sys.stderr)
     
     def _find_all_item_slots(self):
-        """Find all SetVar 0x8004 patterns in file 141.
+        """Find all SetVar 0x8008 commands followed by SetVar 0x8009 in file 141.
         
         Returns list of dicts with 'offset' (of item_id value) and 'item_id'.
         """
         file_data = self.data[self.ITEMSCRIPT_FILE]
+        index = self.context.get(ScriptCommandIndex)
         slots = []
         
-        # Search for SetVar 0x8004 followed by SetVar 0x8005
-        for offset in range(len(file_data) - 12):
-            # Check for SetVar command (0x0029)
-            if file_data[offset] != 0x29 or file_data[offset + 1] != 0x00:
-                continue
-            
-            # Check for var 0x8004
-            var = file_data[offset + 2] | (file_data[offset + 3] << 8)
+        for _, offset, (var, _) in index.find(self.SETVAR_CMD, self.ITEMSCRIPT_FILE):
             if var != self.VAR_ITEM:
                 continue
             
-            # Get item_id
-            item_id = file_data[offset + 4] | (file_data[offset + 5] << 8)
-            
-            # Verify next command is SetVar 0x8005 (quantity)
-            next_offset = offset + 6
-            if next_offset + 6 > len(file_data):
-                continue
-            
-            if file_data[next_offset] != 0x29 or file_data[next_offset + 1] != 0x00:
-                continue
-            
-            next_var = file_data[next_offset + 2] | (file_data[next_offset + 3] << 8)
-            if next_var != self.VAR_QUANTITY:
+            # Verify next command is SetVar 0x8009 (quantity)
+            next_command = index.command_at(self.ITEMSCRIPT_FILE, offset + 6)
+            if next_command is None or next_command[0] != self.SETVAR_CMD or next_command[1][0] != self.VAR_QUANTITY:
                 continue
             
             # Found valid item slot - store offset of item_id value
             slots.append({
                 'offset': offset + 4,
-                'item_id': item_id
+                'item_id': file_data[offset + 4] | (file_data[offset + 5] << 8)
             })
         
         return slots
@@ -607,6 +696,8 @@ class RandomizeGroundItems(Step):
     all item sources (ground items, gift items, etc.).
     """
     
+    WRITES = ('ItemPool', 'ItemScript')
+    
     def __init__(self):
         # Area-based tier selection probabilities: [Tier1, Tier2, Tier3, Tier4]
         # These determine which tier to draw from based on area tier
@@ -685,7 +776,6 @@ class RandomizeGroundItems(Step):
         return selected
     
     def run(self, context):
-        import random
         from extractors import ItemPool
         
         item_script = context.get(ItemScript)
@@ -720,7 +810,7 @@ class RandomizeGroundItems(Step):
             if tier == 'hidden':
                 if not self.junk_items:
                     raise ValueError("No junk items found")
-                selected_item_id = random.choice(self.junk_items)
+                selected_item_id = context.rng(["ground_items", f"slot_{i}", "hidden"]).choice(self.junk_items)
                 slot['item_id'] = selected_item_id
                 hidden_count += 1
                 continue
@@ -753,6 +843,8 @@ class RandomizeBerryPiles(Step):
        to ensure they're always available in every seed
     """
     
+    WRITES = ('ItemScript',)
+    
     NUM_BERRY_SLOTS = 31  # Number of Berry slots in the game
     
     def _get_berry_pool(self):
@@ -839,8 +931,7 @@ class RandomizeBerryPiles(Step):
         return slot_to_tier
     
     def run(self, context):
-        import random
-        
+        rng = context.rng(["berry_piles"])
         item_script = context.get(ItemScript)
         
         # Find all Berry slots
@@ -856,14 +947,14 @@ class RandomizeBerryPiles(Step):
         # Step 1: Shuffle the berry pool and take first 31
         berry_pool = self._get_berry_pool()
         shuffled_berries = berry_pool.copy()
-        random.shuffle(shuffled_berries)
+        rng.shuffle(shuffled_berries)
         selected_berries = shuffled_berries[:len(berry_slots)]
         
         # Step 2: Pick 2 random different positions for Lum and Sitrus
-        lum_position = random.randint(0, len(berry_slots) - 1)
-        sitrus_position = random.randint(0, len(berry_slots) - 1)
+        lum_position = rng.randint(0, len(berry_slots) - 1)
+        sitrus_position = rng.randint(0, len(berry_slots) - 1)
         while sitrus_position == lum_position:
-            sitrus_position = random.randint(0, len(berry_slots) - 1)
+            sitrus_position = rng.randint(0, len(berry_slots) - 1)
         
         # Step 3: Replace those positions with Lum and Sitrus
         selected_berries[lum_position] = self._get_lum_berry()
@@ -891,6 +982,8 @@ class DebugJunkToFocusSash(Step):
     for debugging purposes.
     """
     
+    WRITES = ('ItemScript',)
+    
     def _load_hidden_slots(self):
         """Load Item_Slot_tier.csv to find hidden slots."""
         import os
@@ -940,6 +1033,8 @@ class LevelCaps(Extractor):
             cap.value = 50  # Change level cap
     """
     
+    SOURCES = ('ScriptNarc',)
+    
     SETVAR_CMD = 0x0029   # SetVar command ID
     LEVELCAP_VAR = 0x416F # Level cap variable
     COMMAND_SIZE = 6      # 2 (cmd) + 2 (var) + 2 (value)
@@ -961,34 +1056,22 @@ class LevelCaps(Extractor):
         print(f"LevelCaps: Found {len(self.caps)} level cap assignments", file=sys.stderr)
     
     def _find_all_level_caps(self):
-        """Scan all script files for SetVar 0x416F commands.
+        """Find all SetVar 0x416F commands via ScriptCommandIndex.
         
         Returns list of construct Containers with file_index and offset added.
         """
         caps = []
         
-        for file_idx, file_data in enumerate(self.data):
-            if len(file_data) < self.COMMAND_SIZE:
+        for file_idx, offset, (var, _) in self.context.get(ScriptCommandIndex).find(self.SETVAR_CMD):
+            if var != self.LEVELCAP_VAR:
                 continue
             
-            for offset in range(len(file_data) - self.COMMAND_SIZE + 1):
-                # Check for SetVar command (0x0029)
-                if file_data[offset] == 0x29 and file_data[offset + 1] == 0x00:
-                    # Check for level cap variable (0x416F)
-                    var = file_data[offset + 2] | (file_data[offset + 3] << 8)
-                    if var != self.LEVELCAP_VAR:
-                        continue
-                    
-                    # Parse using construct
-                    try:
-                        parsed = self.setvar_struct.parse(file_data[offset:offset + self.COMMAND_SIZE])
-                    except Exception:
-                        continue
-                    
-                    # Add location metadata
-                    parsed.file_index = file_idx
-                    parsed.offset = offset
-                    caps.append(parsed)
+            parsed = self.setvar_struct.parse(self.data[file_idx][offset:offset + self.COMMAND_SIZE])
+            
+            # Add location metadata
+            parsed.file_index = file_idx
+            parsed.offset = offset
+            caps.append(parsed)
         
         return caps
     
@@ -1019,6 +1102,9 @@ class SyncLevelCapsWithBosses(Step):
     - "higher": File has two different caps - this boss uses the one with higher value
     """
     
+    READS = ('TrainerToBossMapping',)
+    WRITES = ('LevelCaps',)
+    
     def __init__(self):
         self.csv_path = 'gl/boss to cap file.csv'
     
@@ -1118,6 +1204,9 @@ class SyncStarterVariables(Step):
     Located in script file 843.
     """
     
+    READS = ('ScriptCommandIndex', 'StarterExtractor')
+    WRITES = ('ScriptNarc',)
+    
     SCRIPT_FILE = 843
     VAR_STARTER_1 = 0x4067
     VAR_STARTER_2 = 0x4068
@@ -1131,19 +1220,18 @@ class SyncStarterVariables(Step):
             "value" / Int16ul
         )
     
-    def _find_setvar(self, file_data, target_var):
-        """Find SetVar command for a specific variable in file data."""
-        for offset in range(len(file_data) - self.COMMAND_SIZE + 1):
-            if file_data[offset] == 0x29 and file_data[offset + 1] == 0x00:
-                var = file_data[offset + 2] | (file_data[offset + 3] << 8)
-                if var == target_var:
-                    return offset
+    def _find_setvar(self, index, target_var):
+        """Find the first SetVar command for a specific variable in the script file."""
+        for _, offset, (var, _) in index.find(self.SETVAR_CMD, self.SCRIPT_FILE):
+            if var == target_var:
+                return offset
         return None
     
     def run(self, context):
         from steps import StarterExtractor
         
         script_narc = context.get(ScriptNarc)
+        index = context.get(ScriptCommandIndex)
         starter_extractor = context.get(StarterExtractor)
         
         # Get starter IDs (already encoded for encounters)
@@ -1153,7 +1241,7 @@ class SyncStarterVariables(Step):
         file_data = bytearray(script_narc.data[self.SCRIPT_FILE])
         
         # Find and update first starter variable
-        offset_1 = self._find_setvar(file_data, self.VAR_STARTER_1)
+        offset_1 = self._find_setvar(index, self.VAR_STARTER_1)
         if offset_1 is not None:
             old_val = file_data[offset_1 + 4] | (file_data[offset_1 + 5] << 8)
             file_data[offset_1 + 4] = starter_1_id & 0xFF
@@ -1163,7 +1251,7 @@ class SyncStarterVariables(Step):
             print(f"SyncStarterVariables: WARNING - Could not find SetVar 0x4067 in file 843")
         
         # Find and update second starter variable
-        offset_2 = self._find_setvar(file_data, self.VAR_STARTER_2)
+        offset_2 = self._find_setvar(index, self.VAR_STARTER_2)
         if offset_2 is not None:
             old_val = file_data[offset_2 + 4] | (file_data[offset_2 + 5] << 8)
             file_data[offset_2 + 4] = starter_2_id & 0xFF
@@ -1196,6 +1284,8 @@ class ScriptDisassembler(Extractor):
     
     SCRDEF_END_MARKER = 0xFD13  # End of script definition header
     
+    INPUT_PATHS = ('armips/include/scriptmacros.s',)
+    
     def __init__(self, context):
         super().__init__(context)
         
@@ -1210,7 +1300,7 @@ class ScriptDisassembler(Extractor):
     def _build_cmd_lookup(self):
         """Parse scriptmacros.s and build command ID -> signature lookup."""
         # Find scriptmacros.s relative to this file
-        macro_file = 'armips/include/scriptmacros.s'
+        macro_file = self.INPUT_PATHS[0]
         
         if not os.path.exists(macro_file):
             print(f"ScriptDisassembler: WARNING - scriptmacros.s not found at {macro_file}", file=sys.stderr)
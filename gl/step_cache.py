@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk memoization of pipeline steps, for re-running the same seed with a
+few options changed.
+
+Each step gets a key from the base ROM, the package's code and data files,
+the files outside the package that extractors declare in INPUT_PATHS or
+PARSE_CACHE_INPUTS (name tables, assembly sources, custom sets), the seed and re-roll salts, the step's class and constructor state, and the
+keys of the steps it depends on in the StepGraph. Changing --wild-level-mult
+therefore changes WildMult's key and the keys of the steps that (transitively)
+depend on it; every other step keeps its key.
+
+On a miss the step runs and what it changed is stored: the new shallow state
+of every changed object reachable from the step and the extractors it
+writes, the rng streams it advanced and its decision journal records.
+Objects that existed before the step are referred to by their position in a
+deterministic walk from the step and every extractor it may touch. On a
+hit the same walk is done on the current run's objects and the stored
+states are applied in place. If the walk doesn't have the same shape as
+when the entry was stored, the step just runs.
+
+Steps run in order with the cache; lazy NARCs a step may touch are fully
+decoded first, so the first run with the cache is slower than without it.
+Steps that still use the global random module get it seeded from their key.
+"""
+import enum
+import hashlib
+import io
+import os
+import pickle
+import random
+import shutil
+import sys
+
+from step_graph import _PRIMITIVES, GL_DIR, REPO_DIR, _DeltaPickler, _apply_state, _reachable, _shallow_state, _same_state
+
+# Files in the package tree that steps read; any change invalidates every entry
+CODE_EXTENSIONS = (".py", ".csv", ".json", ".txt")
+
+
+def _extractor_inputs():
+    """Repo-relative paths every loaded extractor class declares it reads, sorted."""
+    from framework import Extractor
+    paths = set()
+    pending = [Extractor]
+    seen = set()
+    while pending:
+        cls = pending.pop()
+        if cls in seen:
+            continue
+        seen.add(cls)
+        paths.update(getattr(cls, "INPUT_PATHS", ()))
+        paths.update(getattr(cls, "PARSE_CACHE_INPUTS", ()))
+        pending.extend(cls.__subclasses__())
+    return sorted(paths)
+
+
+def _update_with_file(h, path, name):
+    h.update(name.encode() + b"\0")
+    with open(path, "rb") as f:
+        h.update(hashlib.sha256(f.read()).digest())
+
+
+def _describe(value, seen=None):
+    """Stable text for a step's configuration: no addresses, sets sorted."""
+    if isinstance(value, (int, float, complex, str, bytes, bool, type(None), enum.Enum)):
+        return repr(value)
+    if isinstance(value, type):
+        return f"{value.__module__}.{value.__qualname__}"
+    if hasattr(type(value), "SOURCES") or hasattr(type(value), "run_pipeline"):
+        return type(value).__qualname__  # extractors and the context; their state is covered by dependency keys
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return "<cycle>"
+    seen = seen | {id(value)}
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_describe(v, seen) for v in value) + "]"
+    if isinstance(value, (set, frozenset)):
+        return "{" + ", ".join(sorted(_describe(v, seen) for v in value)) + "}"
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{_describe(k, seen)}: {_describe(v, seen)}" for k, v in value.items()) + "}"
+    if hasattr(value, "__dict__") and not callable(value):
+        return f"{type(value).__qualname__}({_describe(vars(value), seen)})"
+    return getattr(value, "__qualname__", type(value).__qualname__)
+
+
+def _fingerprint(objects):
+    """Hash of the walk's shape: types, sizes and primitive dict keys in walk order."""
+    h = hashlib.sha256()
+    for obj in objects:
+        if isinstance(obj, dict):
+            shape = repr([k for k in obj if isinstance(k, _PRIMITIVES)])
+        else:
+            shape = len(obj) if isinstance(obj, (list, tuple, set, frozenset)) else ""
+        h.update(f"{type(obj).__qualname__}:{shape}\0".encode())
+    return h.hexdigest()
+
+
+def _class_key(cls):
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+class _IndexPickler(_DeltaPickler):
+    """Pickles pre-existing objects as their position in the walk."""
+
+    def __init__(self, f, objects):
+        super().__init__(f, {})
+        self.index = {id(obj): i for i, obj in enumerate(objects)}
+        self.objects = objects
+
+    def persistent_id(self, obj):
+        i = self.index.get(id(obj))
+        if i is not None and self.objects[i] is obj:
+            return i
+        return None
+
+
+class _IndexUnpickler(pickle.Unpickler):
+    def __init__(self, f, objects):
+        super().__init__(f)
+        self.objects = objects
+
+    def persistent_load(self, pid):
+        return self.objects[pid]
+
+
+class StepCache:
+    """Stores and replays what pipeline steps changed, keyed as described in the module docstring."""
+
+    DEFAULT_DIR = os.path.join("build", "gl_step_cache")
+
+    def __init__(self, base_key, cache_dir=DEFAULT_DIR):
+        self.cache_dir = cache_dir
+        self.base_key = base_key
+        self.hits = 0
+        self.misses = 0
+        self._code_digest = None
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def code_digest(self):
+        """Hash of the package tree and of every file extractors declare as inputs.
+        
+        Declared files are hashed by content; declared directories (the
+        custom sets) by their listing, sizes and modification times. A
+        declared path that doesn't exist hashes as missing, so creating it
+        changes the key.
+        """
+        if self._code_digest is None:
+            h = hashlib.sha256()
+            for root, dirs, files in os.walk(GL_DIR):
+                dirs[:] = sorted(d for d in dirs if d != "__pycache__" and not d.startswith("."))
+                for name in sorted(files):
+                    if name.endswith(CODE_EXTENSIONS):
+                        path = os.path.join(root, name)
+                        _update_with_file(h, path, os.path.relpath(path, GL_DIR))
+            for rel_path in _extractor_inputs():
+                path = os.path.join(REPO_DIR, rel_path)
+                if os.path.isdir(path):
+                    h.update(f"{rel_path}/\0".encode())
+                    for root, dirs, files in os.walk(path):
+                        dirs.sort()
+                        for name in sorted(files):
+                            stat = os.stat(os.path.join(root, name))
+                            entry = os.path.relpath(os.path.join(root, name), REPO_DIR)
+                            h.update(f"{entry}:{stat.st_size}:{stat.st_mtime_ns}\0".encode())
+                elif os.path.exists(path):
+                    _update_with_file(h, path, rel_path)
+                else:
+                    h.update(f"{rel_path}:missing\0".encode())
+            self._code_digest = h.hexdigest()
+        return self._code_digest
+
+    def keys_for(self, context, graph):
+        """Key for every step of graph. Call before running anything: keys cover the steps' initial state."""
+        keys = []
+        common = (f"{self.base_key}:{self.code_digest()}:{context.seed}:{_describe(context.reroll_map)}:"
+                  f"{context.journal is not None}")
+        for j, step in enumerate(graph.steps):
+            h = hashlib.sha256(common.encode())
+            h.update(f"{type(step).__module__}.{type(step).__qualname__}:{_describe(step)}".encode())
+            for i in sorted(graph.dependencies[j]):
+                h.update(keys[i].encode())
+            keys.append(h.hexdigest())
+        return keys
+
+    def _roots(self, context, graph, j):
+        """(everything step j may touch, what it may change): the step plus extractors, in a fixed order.
+        
+        Declared extractors are loaded before the step runs, on a hit as well
+        as on a miss, so the walk covers the same objects either way. A step
+        without declarations may touch every loaded extractor.
+        """
+        step = graph.steps[j]
+        accessible = graph.accessible(j)
+        if accessible is None:
+            extractors = [context._objects[cls] for cls in sorted(context._objects, key=_class_key)]
+            written = extractors
+        else:
+            extractors = [context.get(cls) for cls in sorted(accessible, key=_class_key)]
+            written = [context.get(cls) for cls in sorted(graph.writes[j], key=_class_key)]
+        # Decode lazy NARCs fully and in order, so the walk doesn't depend on which entries earlier steps touched
+        for extractor in extractors:
+            materialize = getattr(getattr(extractor, "data", None), "materialize", None)
+            if materialize is not None:
+                materialize()
+        return [step] + extractors, [step] + written
+
+    def run(self, context, graph, j, key):
+        """Replay step j from the cache if possible, otherwise run it and store the result. Returns True on a hit."""
+        step = graph.steps[j]
+        roots, written = self._roots(context, graph, j)
+        objects = list(_reachable(roots, context).values())
+        fingerprint = _fingerprint(objects)
+        path = os.path.join(self.cache_dir, f"{type(step).__name__}-{key[:32]}.pickle")
+
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    stored_fingerprint, payload = pickle.load(f)
+                if stored_fingerprint == fingerprint:
+                    changed, advanced, decisions = _IndexUnpickler(io.BytesIO(payload), objects).load()
+                    for i, state in changed:
+                        _apply_state(objects[i], state)
+                    for stream_key, state in advanced:
+                        context.rng(stream_key).setstate(state)
+                    if context.journal is not None:
+                        context.journal.records.extend(decisions)
+                    self.hits += 1
+                    return True
+            except Exception as e:
+                print(f"StepCache: ignoring unreadable entry {path}: {e}", file=sys.stderr)
+
+        self.misses += 1
+        index = {id(obj): i for i, obj in enumerate(objects)}
+        before = _reachable(written, context)
+        states = {i: _shallow_state(obj) for i, obj in before.items()}
+        loaded = set(context._objects)
+        stream_states = {k: s.getstate() for k, s in context._rng_streams.items()}
+        mark = len(context.journal.records) if context.journal is not None else 0
+        # Anything still drawing from the global random module gets a per-step seed, so replays stay consistent
+        random.seed(int(key[:16], 16))
+        step.run(context)
+
+        created = sorted(cls.__name__ for cls in set(context._objects) - loaded)
+        if created:
+            print(f"StepCache: not caching {type(step).__name__}, it loaded undeclared {', '.join(created)}", file=sys.stderr)
+            return False
+
+        changed = []
+        for i, obj in _reachable(written, context).items():
+            if before.get(i) is not obj:
+                continue  # new object; stored inline through whatever state refers to it
+            state = _shallow_state(obj)
+            if state is not None and not _same_state(state, states[i]):
+                changed.append((index[i], state))
+        advanced = [(k, s.getstate()) for k, s in context._rng_streams.items() if stream_states.get(k) != s.getstate()]
+
+        try:
+            buffer = io.BytesIO()
+            decisions = context.journal.records[mark:] if context.journal is not None else []
+            _IndexPickler(buffer, objects).dump((changed, advanced, decisions))
+            self._store(path, (fingerprint, buffer.getvalue()))
+        except Exception as e:
+            print(f"StepCache: not caching {type(step).__name__}: {e}", file=sys.stderr)
+        return False
+
+    def _store(self, path, entry):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
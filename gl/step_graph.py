@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+"""
+Dependency graph over pipeline steps, built from Step.READS / Step.WRITES.
+Declarations are class names, looked up in the module defining the step (or,
+for SOURCES, the extractor), so they can name classes defined further down.
+
+Step j depends on an earlier step i when one of them writes an extractor the
+other reads or writes. Declarations are closed over Extractor.SOURCES, so a
+step that writes Trainers conflicts with one that reads IdentifyTier (built
+from Trainers) or writes TrainerData (wrapped by Trainers). A step that
+declares nothing is a barrier: it runs after everything before it and before
+everything after it, exactly as in the plain list.
+
+run_parallel() runs independent steps in forked worker processes. A worker
+runs its step on the inherited copy of the context, then sends back the new
+shallow state of every object reachable from the step and the extractors it
+writes that changed. The parent applies those states in place on its own
+objects (fork keeps id()s, so objects are matched by id), which keeps every
+cross-extractor reference valid. Objects the step creates are sent by value;
+what they refer to inside the step or its declared extractors is matched back
+to the parent's objects, anything else arrives as a copy. A worker that
+changes an extractor its step declares only in READS stops the run with
+ReadOnlyWriteError, since that change could not be merged (watch_reads();
+run_pipeline's check_access reports the same for steps run in order). Per-path streams (context.rng) a worker
+advanced are copied back too, so decide() and rng() draws match a sequential
+run. Steps still using the global random module get it seeded from the run's
+seed and their position: reproducible, but not what a sequential run draws.
+Journal records a worker's decide() calls made are appended when it finishes.
+"""
+import io
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import random
+import sys
+import time
+import traceback
+from contextlib import nullcontext
+
+from construct import Container
+
+GL_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(GL_DIR)
+
+# Types whose contents are state; everything else non-primitive is matched by id only
+_PRIMITIVES = (int, float, complex, str, bytes, bool, type(None))
+
+
+def _resolve(owner, name):
+    """The class called name, as seen from the module that defines owner.
+
+    Declarations are forward references; names the module doesn't import at
+    top level are looked up in the package's other loaded modules.
+    """
+    cls = getattr(sys.modules[owner.__module__], name, None)
+    if cls is None:
+        for module in list(sys.modules.values()):
+            path = getattr(module, "__file__", None)
+            if path and os.path.dirname(os.path.abspath(path)) == GL_DIR and isinstance(getattr(module, name, None), type):
+                return getattr(module, name)
+    return cls
+
+
+def _closure(owner, names):
+    """The classes named by owner's declaration, plus everything reachable through their SOURCES."""
+    result = set()
+    stack = [(owner, name) for name in names]
+    while stack:
+        cls = _resolve(*stack.pop())
+        if cls is not None and cls not in result:
+            result.add(cls)
+            stack.extend((cls, name) for name in cls.SOURCES)
+    return result
+
+
+class StepGraph:
+    """Dependencies between the steps of one pipeline, plus their measured run times."""
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.declared = [getattr(s, "READS", None) is not None or getattr(s, "WRITES", None) is not None
+                         for s in self.steps]
+        self.reads = [_closure(type(s), getattr(s, "READS", None) or ()) for s in self.steps]
+        self.writes = [_closure(type(s), getattr(s, "WRITES", None) or ()) for s in self.steps]
+        self.durations = [None] * len(self.steps)
+
+        self.dependencies = [set() for _ in self.steps]
+        for j in range(len(self.steps)):
+            for i in range(j):
+                if self._conflicts(i, j):
+                    self.dependencies[j].add(i)
+        self.dependents = [set() for _ in self.steps]
+        for j, deps in enumerate(self.dependencies):
+            for i in deps:
+                self.dependents[i].add(j)
+
+    def _conflicts(self, i, j):
+        if not self.declared[i] or not self.declared[j]:
+            return True
+        return bool(self.writes[i] & (self.reads[j] | self.writes[j]) or self.reads[i] & self.writes[j])
+
+    def name(self, i):
+        return self.steps[i].__class__.__name__
+
+    def accessible(self, i):
+        """Extractor classes step i may get from the context, or None if it declares nothing."""
+        return (self.reads[i] | self.writes[i]) if self.declared[i] else None
+
+    def validate(self):
+        """Return a list of problems with the declarations (empty if none)."""
+        problems = []
+        for i, step in enumerate(self.steps):
+            if not self.declared[i]:
+                problems.append(f"{self.name(i)} declares no READS/WRITES; it runs alone")
+                continue
+            for attr in ("READS", "WRITES"):
+                for name in getattr(step, attr, None) or ():
+                    cls = _resolve(type(step), name)
+                    if not isinstance(cls, type) or not hasattr(cls, "SOURCES"):
+                        problems.append(f"{self.name(i)}.{attr} lists {name!r}, which is not an Extractor class")
+        for cls in set().union(*self.reads, *self.writes):
+            for name in cls.SOURCES:
+                if _resolve(cls, name) is None:
+                    problems.append(f"{cls.__name__}.SOURCES lists unknown {name!r}")
+        return problems
+
+    def critical_path(self):
+        """Return (seconds, [step index, ...]) for the longest chain of dependent steps by run time."""
+        finish = [0.0] * len(self.steps)
+        previous = [None] * len(self.steps)
+        for j in range(len(self.steps)):
+            start = 0.0
+            for i in self.dependencies[j]:
+                if finish[i] > start:
+                    start, previous[j] = finish[i], i
+            finish[j] = start + (self.durations[j] or 0.0)
+        if not finish:
+            return 0.0, []
+        last = max(range(len(finish)), key=finish.__getitem__)
+        path = []
+        while last is not None:
+            path.append(last)
+            last = previous[last]
+        return finish[path[0]], path[::-1]
+
+    def format_critical_path(self):
+        total, path = self.critical_path()
+        lines = [f"Critical path: {total:.3f}s of {sum(d or 0.0 for d in self.durations):.3f}s total step time"]
+        for i in path:
+            lines.append(f"  {self.name(i):40} {self.durations[i] or 0.0:9.3f}")
+        return "\n".join(lines)
+
+
+def _is_repo_type(cls, _cache={}):
+    if cls not in _cache:
+        module = sys.modules.get(cls.__module__)
+        path = getattr(module, "__file__", None)
+        _cache[cls] = path is not None and os.path.dirname(os.path.abspath(path)) == GL_DIR
+    return _cache[cls]
+
+
+class ReadOnlyWriteError(RuntimeError):
+    """A step changed an extractor it declares only in READS."""
+
+
+def _reachable(roots, context, skip_memo=False):
+    """Map id -> object for the non-primitive objects reachable from roots.
+
+    Containers and instances of this package's classes are walked; the
+    context, extractors other than the roots and foreign objects (construct
+    structs, numpy arrays, ...) are recorded but not entered. With skip_memo,
+    attributes a class lists in MEMO_ATTRS (caches reads may fill) are not
+    entered either.
+    """
+    root_ids = {id(r) for r in roots}
+    found = {}
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, _PRIMITIVES) or id(obj) in found:
+            continue
+        found[id(obj)] = obj
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif obj is context or (hasattr(type(obj), "SOURCES") and id(obj) not in root_ids):
+            continue
+        elif _is_repo_type(type(obj)) and hasattr(obj, "__dict__"):
+            memo = getattr(type(obj), "MEMO_ATTRS", ()) if skip_memo else ()
+            stack.extend(value for key, value in obj.__dict__.items() if key not in memo)
+    return found
+
+
+def _flat_items(mapping, skip=None):
+    return [x for k, v in mapping.items() if k != skip for x in (k, v)]
+
+
+def _shallow_state(obj):
+    """Flat copy of obj's own contents (dicts as k0, v0, k1, v1, ...), or None for objects matched by id only."""
+    if isinstance(obj, dict):
+        return _flat_items(obj, "_io" if type(obj) is Container else None)
+    if isinstance(obj, (list, set, bytearray)):
+        return list(obj)
+    if not isinstance(obj, (tuple, frozenset)) and _is_repo_type(type(obj)) and hasattr(obj, "__dict__"):
+        return _flat_items(obj.__dict__)
+    return None
+
+
+def _same_state(a, b):
+    return len(a) == len(b) and all(x is y for x, y in zip(a, b))
+
+
+def _read_state(obj):
+    """_shallow_state(obj) without the attributes its class lists in MEMO_ATTRS."""
+    state = _shallow_state(obj)
+    memo = getattr(type(obj), "MEMO_ATTRS", ())
+    if memo and state is not None and not isinstance(obj, dict):
+        state = [x for key, value in zip(state[::2], state[1::2]) if key not in memo for x in (key, value)]
+    return state
+
+
+def _same_value(a, b):
+    return a is b or (type(a) is type(b) and isinstance(a, _PRIMITIVES) and a == b)
+
+
+def decode_lazy(extractors):
+    """Decode every entry of the lazy NARC data of extractors ([(class, object)])."""
+    for _, obj in extractors:
+        materialize = getattr(getattr(obj, "data", None), "materialize", None)
+        if materialize is not None:
+            materialize()
+
+
+def watch_reads(extractors, context):
+    """Record the contents of extractors ([(class, object)]) for changed_reads().
+
+    Lazy NARC data is decoded first, since decoding on read is not a change.
+    Contents are the objects _reachable() walks; what happens inside foreign
+    objects (numpy arrays, ...) is not seen.
+    """
+    decode_lazy(extractors)
+    watched = []
+    for cls, obj in extractors:
+        objects = _reachable([obj], context, skip_memo=True).values()
+        watched.append((cls, [(o, _read_state(o)) for o in objects]))
+    return watched
+
+
+def changed_reads(watched):
+    """Names of the extractors recorded by watch_reads() whose contents changed since."""
+    changed = []
+    for cls, states in watched:
+        for obj, state in states:
+            if state is None:
+                continue
+            now = _read_state(obj)
+            if len(now) != len(state) or not all(_same_value(a, b) for a, b in zip(now, state)):
+                changed.append(cls.__name__)
+                break
+    return changed
+
+
+def read_only_extractors(context, graph, i):
+    """(class, object) for the loaded extractors step i declares only in READS, by class name."""
+    if not graph.declared[i]:
+        return []
+    classes = sorted(graph.reads[i] - graph.writes[i], key=lambda c: c.__name__)
+    return [(cls, context.get(cls)) for cls in classes if context._has_loaded(cls)]
+
+
+def _apply_state(obj, state):
+    if isinstance(obj, (list, bytearray)):
+        obj[:] = state
+    elif isinstance(obj, set):
+        obj.clear()
+        obj.update(state)
+    else:
+        target = obj if isinstance(obj, dict) else obj.__dict__
+        target.clear()
+        target.update(zip(state[::2], state[1::2]))
+
+
+class _DeltaPickler(pickle.Pickler):
+    """Pickles objects that existed before the step as references to the parent's copy."""
+
+    def __init__(self, f, before):
+        super().__init__(f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.before = before
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, _PRIMITIVES) and self.before.get(id(obj)) is obj:
+            return id(obj)
+        return None
+
+    def reducer_override(self, obj):
+        # construct keeps the source stream in Container._io; never worth sending
+        if type(obj) is Container:
+            return (Container, (), None, None, iter([(k, v) for k, v in obj.items() if k != "_io"]))
+        return NotImplemented
+
+
+class _DeltaUnpickler(pickle.Unpickler):
+    def __init__(self, f, before):
+        super().__init__(f)
+        self.before = before
+
+    def persistent_load(self, pid):
+        return self.before[pid]
+
+
+def _run_in_worker(context, step, seed, roots, reads, before, connection):
+    """Body of a forked worker: run step, send back (id, state) for every changed object, the advanced rng streams, journal and profile records."""
+    try:
+        watched = watch_reads(reads, context)
+        states = {i: _shallow_state(obj) for i, obj in before.items()}
+        streams = getattr(context, "_rng_streams", {})
+        stream_states = {key: stream.getstate() for key, stream in streams.items()}
+        journal = getattr(context, "journal", None)
+        mark = len(journal.records) if journal is not None else 0
+        profiler = getattr(context, "profiler", None)
+        profile_mark = len(profiler.records) if profiler is not None else 0
+        random.seed(seed)
+        with profiler.step(step) if profiler is not None else nullcontext():
+            step.run(context)
+        changed_read_only = changed_reads(watched)
+        if changed_read_only:
+            connection.send_bytes(pickle.dumps(("read-only", changed_read_only)))
+            return
+        changed = []
+        for i, obj in _reachable(roots, context).items():
+            if before.get(i) is not obj:
+                continue  # new object; sent inline through whatever state refers to it
+            if obj is context:
+                continue  # rng streams and journal records come back on their own
+            state = _shallow_state(obj)
+            if state is not None and not _same_state(state, states[i]):
+                changed.append((i, state))
+        buffer = io.BytesIO()
+        advanced = [(key, stream) for key, stream in streams.items() if stream_states.get(key) != stream.getstate()]
+        decisions = journal.records[mark:] if journal is not None else []
+        profiles = profiler.records[profile_mark:] if profiler is not None else []
+        _DeltaPickler(buffer, before).dump(("ok", (changed, advanced, decisions, profiles)))
+        connection.send_bytes(buffer.getvalue())
+    except BaseException:
+        connection.send_bytes(pickle.dumps(("error", traceback.format_exc())))
+    finally:
+        connection.close()
+
+
+def _run_here(context, step, seed):
+    random.seed(seed)
+    with context.profiler.step(step) if context.profiler is not None else nullcontext():
+        step.run(context)
+
+
+def run_parallel(context, graph, workers, log_function=None, progress_callback=None):
+    """Run graph's steps on context, up to workers steps at a time in forked processes."""
+    n = len(graph.steps)
+    seeds = [random.getrandbits(64) for _ in range(n)]
+    random_state = random.getstate()
+    mp = multiprocessing.get_context("fork")
+
+    waiting = {j: set(deps) for j, deps in enumerate(graph.dependencies)}
+    ready = sorted(j for j, deps in waiting.items() if not deps)
+    running = {}  # connection -> (index, process, start time, before)
+    finished = 0
+
+    def complete(j, start):
+        nonlocal finished
+        graph.durations[j] = time.perf_counter() - start
+        finished += 1
+        for k in graph.dependents[j]:
+            waiting[k].discard(j)
+            if not waiting[k]:
+                ready.append(k)
+        ready.sort()
+        if progress_callback:
+            progress_callback(int(finished * 100 / n))
+
+    while finished < n:
+        while ready and (len(running) < workers or not graph.declared[ready[0]]):
+            j = ready[0]
+            if not graph.declared[j]:
+                if running:
+                    break  # barriers run alone, once the workers are done
+                ready.pop(0)
+                if log_function:
+                    log_function(f"Running {graph.name(j)}...")
+                start = time.perf_counter()
+                _run_here(context, graph.steps[j], seeds[j])
+                if context.journal is not None:
+                    context.journal.flush()
+                complete(j, start)
+                continue
+
+            ready.pop(0)
+            step = graph.steps[j]
+            if log_function:
+                log_function(f"Running {graph.name(j)} in a worker...")
+            start = time.perf_counter()
+            # Load what the step touches here, so its results outlive the worker
+            for cls in sorted(graph.accessible(j), key=lambda c: c.__name__):
+                context.get(cls)
+            roots = [step] + [context.get(cls) for cls in sorted(graph.writes[j], key=lambda c: c.__name__)]
+            reads = read_only_extractors(context, graph, j)
+            # Decode lazy READS data here, so workers don't each decode it again
+            decode_lazy(reads)
+            # Objects the step only reads are in before too, so new objects keep referring to them
+            before = _reachable(roots + [obj for _, obj in reads], context)
+            receiver, sender = mp.Pipe(duplex=False)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            process = mp.Process(target=_run_in_worker, args=(context, step, seeds[j], roots, reads, before, sender))
+            process.start()
+            sender.close()
+            running[receiver] = (j, process, start, before)
+
+        if not running:
+            if finished < n and not ready:
+                raise RuntimeError("step graph has unreachable steps")
+            continue
+
+        for receiver in multiprocessing.connection.wait(list(running)):
+            j, process, start, before = running.pop(receiver)
+            try:
+                status, payload = _DeltaUnpickler(io.BytesIO(receiver.recv_bytes()), before).load()
+            except EOFError:
+                status, payload = "error", "worker exited without a result"
+            receiver.close()
+            process.join()
+
+            if status == "read-only":
+                for _, other, _, _ in running.values():
+                    other.terminate()
+                raise ReadOnlyWriteError(f"{graph.name(j)} changed {', '.join(payload)}, which it declares only "
+                                         f"in READS; declare them in WRITES so the change is merged")
+            if status == "ok":
+                changed, advanced, decisions, profiles = payload
+                for i, state in changed:
+                    _apply_state(before[i], state)
+                for key, stream in advanced:
+                    if key in context._rng_streams:
+                        context._rng_streams[key].setstate(stream.getstate())
+                    else:
+                        context._rng_streams[key] = stream
+                if context.journal is not None:
+                    context.journal.records.extend(decisions)
+                if context.profiler is not None:
+                    context.profiler.merge(profiles)
+            else:
+                # Nothing was merged, so the step can simply run again here
+                print(f"{graph.name(j)}: worker failed, running it in the main process\n{payload}", file=sys.stderr)
+                _run_here(context, graph.steps[j], seeds[j])
+            if context.journal is not None:
+                context.journal.flush()
+            complete(j, start)
+
+    random.setstate(random_state)
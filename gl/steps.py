@@ -3,7 +3,9 @@ from enums import *
 from form_mapping import FormMapping, FormCategory
 from extractors import *
 from script_extractor import GiftPokemon, WildBattle, ShinyGyarados, GiftEggs
+from name_resolver import NameResolver
 import random
+import numpy as np
 
 
 class DebugForcePumpkabooLargeStep(Step):
@@ -163,6 +165,9 @@ class DebugHootHootToGrowlitheStep(Step):
 class DebugAlolanMarowakGiftsStep(Step):
     """Temporary debugging step that forces all gift Pokemon to be Alolan Marowak."""
     
+    READS = ('Mons',)
+    WRITES = ('GiftPokemon',)
+    
     def run(self, context):
         gift_pokemon = context.get(GiftPokemon)
         mondata = context.get(Mons)
@@ -194,7 +199,7 @@ class DebugAlolanMarowakGiftsStep(Step):
         if hidden_ability and hidden_ability not in ability_choices:
             ability_choices.append(hidden_ability)
         
-        chosen_ability = random.choice(ability_choices)
+        chosen_ability = context.rng(["debug_marowak_gifts", "ability"]).choice(ability_choices)
         
         print(f"DEBUG: Replacing all gift Pokemon with Alolan Marowak (species={base_species_id}, form={form_number}, ability={chosen_ability})")
         
@@ -320,6 +325,9 @@ class TrainerMult(Step):
                        Mon 3-6 = boss_level - 3
     """
     
+    READS = ('IdentifyBosses', 'IdentifyRivals', 'TrainerToBossMapping')
+    WRITES = ('Trainers',)
+    
     def __init__(self, multiplier=1.0, gauntlet_mode=False):
         self.multiplier = multiplier
         self.gauntlet_mode = gauntlet_mode
@@ -476,7 +484,7 @@ class PokemonListBase(Extractor):
     
     def __init__(self, context):
         super().__init__(context)
-        pokemon_names_step = context.get(LoadPokemonNamesStep)
+        names = context.get(NameResolver)
         tm_hm_names = context.get(TMHM)
         form_mapping = context.get(FormMapping)
         self.by_id = set()
@@ -495,9 +503,9 @@ class PokemonListBase(Extractor):
                 # Handle regular Pokemon names (strings)
                 name = entry
                 try:
-                    self.by_id.add(pokemon_names_step.get_by_name(name))
-                except KeyError:
-                    print(f"Warning: Pokemon '{name}' not found in Pokemon names")
+                    self.by_id.add(names.species_id(name))
+                except KeyError as e:
+                    print(f"Warning: Pokemon {e.args[0]} not found in Pokemon names")
     
     def _find_form_by_names(self, base_name, form_name, form_mapper):
         """Find a form ID by base Pokemon name and form name."""
@@ -859,6 +867,8 @@ class LoadBlacklistStep(PokemonListBase):
 
 
 class RandomizeStartersStep(Step):
+    READS = ('EvolutionData',)
+    WRITES = ('StarterExtractor',)
     
     def __init__(self, filter=NoFilter()):
         self.filter = filter
@@ -902,6 +912,8 @@ class DebugForceGalarianDarumakaStarterStep(Step):
 class LoadEncounterNamesStep(Extractor):
     """Extractor that loads encounter location names from assembly source."""
     
+    INPUT_PATHS = (os.path.join("armips", "data", "encounters.s"),)
+    
     def __init__(self, context):
         super().__init__(context)
         self.location_names = {}
@@ -919,6 +931,11 @@ class LoadEncounterNamesStep(Extractor):
 class Encounters(Writeback,NarcExtractor):
     """Extractor for encounter data from ROM."""
     
+    LAZY_NARC = True
+    FAST_CODEC = True
+    PARSE_CACHE_VERSION = 1
+    PARSE_CACHE_INPUTS = (os.path.join("armips", "data", "encounters.s"),)
+    
     def __init__(self, context):
         location_names_step = context.get(LoadEncounterNamesStep)
         
@@ -956,6 +973,7 @@ class Encounters(Writeback,NarcExtractor):
         )
         
         super().__init__(context)
+        self.encounter_codec = self.compile_codec(self.encounter_struct)
         
         self.data = self.load_narc()
     
@@ -963,16 +981,18 @@ class Encounters(Writeback,NarcExtractor):
         return "a/0/3/7"
     
     def parse_file(self, file_data, index):
-        encounter = self.encounter_struct.parse(file_data, narc_index=index)
+        encounter = self.encounter_codec.parse(file_data, narc_index=index)
         return encounter
     
     def serialize_file(self, data, index):
-        return self.encounter_struct.build(data, narc_index=index)
+        return self.encounter_codec.build(data, narc_index=index)
 
 
 class WildMult(Step):
     """Apply a multiplier to wild Pokémon levels in encounters."""
     
+    WRITES = ('Encounters',)
+    
     def __init__(self, multiplier=1.0):
         self.multiplier = multiplier
     
@@ -1015,6 +1035,8 @@ class WildMult(Step):
 
 
 class RandomizeEncountersStep(Step):
+    READS = ('LoadBlacklistStep', 'Mons')
+    WRITES = ('Encounters',)
     
     def __init__(self, filter, independent_by_area=False):
         self.filter = filter
@@ -1179,6 +1201,9 @@ class RandomizeGiftPokemonStep(Step):
         wild_level_mult: Multiplier to apply to gift Pokemon levels (default 1.0)
     """
     
+    READS = ('Mons',)
+    WRITES = ('GiftPokemon',)
+    
     def __init__(self, filter, wild_level_mult=1.0):
         self.filter = filter
         self.wild_level_mult = wild_level_mult
@@ -1270,7 +1295,7 @@ class RandomizeGiftPokemonStep(Step):
         if hidden_ability and hidden_ability not in ability_choices:
             ability_choices.append(hidden_ability)
         
-        gift.ability = random.choice(ability_choices)
+        gift.ability = self.context.rng(path + ["ability"]).choice(ability_choices)
         
         # Apply wild level multiplier
         if self.wild_level_mult != 1.0:
@@ -1291,6 +1316,9 @@ class RandomizeGiftEggsStep(Step):
         filter: Filter to apply for Pokemon selection (should include InvalidPokemon exclusion)
     """
     
+    READS = ('Mons',)
+    WRITES = ('GiftEggs',)
+    
     def __init__(self, filter):
         self.filter = filter
     
@@ -1368,6 +1396,9 @@ class RandomizeStaticPokemonStep(Step):
         wild_level_mult: Multiplier to apply to static Pokemon levels (default 1.0)
     """
     
+    READS = ('Mons',)
+    WRITES = ('WildBattle',)
+    
     def __init__(self, filter, wild_level_mult=1.0):
         self.filter = filter
         self.wild_level_mult = wild_level_mult
@@ -1449,6 +1480,9 @@ class RandomizeStaticLegendaryStep(Step):
         wild_level_mult: Multiplier to apply to legendary Pokemon levels (default 1.0)
     """
     
+    READS = ('LoadBlacklistStep', 'Mons', 'MythicalPokemon', 'ParadoxPokemon', 'SubLegendaryPokemon', 'UltraBeastPokemon')
+    WRITES = ('WildBattle',)
+    
     # Script file indices containing legendary encounters
     # Will be expanded as more locations are identified
     LEGENDARY_FILE_INDICES = [
@@ -1548,6 +1582,9 @@ class RandomizeRestrictedLegendaryStep(Step):
         wild_level_mult: Multiplier to apply to legendary Pokemon levels (default 1.0)
     """
     
+    READS = ('LoadBlacklistStep', 'Mons', 'RestrictedPokemon')
+    WRITES = ('WildBattle',)
+    
     # Script file indices containing restricted legendary encounters
     # Will be expanded as more locations are identified
     RESTRICTED_FILE_INDICES = [
@@ -1638,6 +1675,9 @@ class RandomizeSuicuneStep(Step):
         wild_level_mult: Multiplier to apply to Pokemon levels (default 1.0)
     """
     
+    READS = ('LoadBlacklistStep', 'Mons', 'SubLegendaryPokemon')
+    WRITES = ('WildBattle',)
+    
     # All script file indices where Suicune appears (WildBattle commands)
     # Will be expanded as more locations are identified
     SUICUNE_FILE_INDICES = [
@@ -1735,6 +1775,8 @@ class StaticCries(Step):
     Must run AFTER RandomizeStaticPokemonStep or DebugAlolanMarowakStaticStep.
     """
     
+    WRITES = ('WildBattle',)
+    
     def run(self, context):
         wild_battles = context.get(WildBattle)
         
@@ -1766,6 +1808,9 @@ class RandomizeGiftItem(Step):
     Uses ItemPool extractor to ensure TMs are only given once.
     """
     
+    READS = ('IdentifyGymTrainers',)
+    WRITES = ('ItemPool', 'NpcGiftItems')
+    
     # Map gym leader names to their gym location names (for IdentifyGymTrainers lookup)
     LEADER_TO_GYM = {
         "Falkner": "Violet City",
@@ -1865,6 +1910,9 @@ class RandomizeShinyStatic(Step):
         wild_level_mult: Multiplier to apply to the encounter level (default 1.0)
     """
     
+    READS = ('Mons',)
+    WRITES = ('ShinyGyarados',)
+    
     def __init__(self, filter, wild_level_mult=1.0):
         self.filter = filter
         self.wild_level_mult = wild_level_mult
@@ -1935,6 +1983,8 @@ class RandomizeShinyStatic(Step):
 
 class IndexTrainers(Extractor):
     "Store mapping of name to trainer_id.  Queryable using `find`, by name or (trainerclass, name)"
+    SOURCES = ('Trainers',)
+    
     def __init__(self, context):
         super().__init__(context)
         self.data = {}
@@ -1967,6 +2017,9 @@ class ExpandTrainerTeamsStep(Step):
     ScalingTrainerTeamSize is the default mode, providing progressive team sizes based on game tiers.
     """
     
+    READS = ('BstIndex', 'IdentifyBosses', 'IdentifyTier', 'Mons')
+    WRITES = ('Trainers',)
+    
     def __init__(self, 
                  # Tier-based team sizing options
                  mode="ScalingTrainerTeamSize",  # "ScalingTrainerTeamSize" or "FixedTrainerTeamSize"
@@ -2102,14 +2155,7 @@ class ExpandTrainerTeamsStep(Step):
         average_bst = total_bst / current_size
         
         # Find a Pokemon with BST closest to the average
-        best_pokemon = None
-        best_bst_diff = float('inf')
-        
-        for species in mondata.data:
-            bst_diff = abs(species.bst - average_bst)
-            if bst_diff < best_bst_diff:
-                best_bst_diff = bst_diff
-                best_pokemon = species
+        best_pokemon = context.get(BstIndex).nearest(average_bst)
         
         if best_pokemon is None:
             # Fallback to duplicating first Pokemon if no suitable match found
@@ -2129,6 +2175,8 @@ class ExpandTrainerTeamsStep(Step):
 class ChangeTrainerDataTypeStep(Step):
     """Step to change trainers' data type to support various TrainerDataType flags."""
     
+    WRITES = ('TrainerData', 'Trainers')
+    
     def __init__(self, target_flags=None, trainer_filter=None):
         """
         Initialize the step with configurable trainer data type flags.
@@ -2298,6 +2346,7 @@ class DebugWeepinbellStep(Step):
 
 
 class NoEnemyBattleItems(Step):
+    WRITES = ('TrainerData',)
     
     def __init__(self, trainer_filter=None):
         self.trainer_filter = trainer_filter
@@ -2336,6 +2385,9 @@ class GeneralEVStep(Step):
     Supports tier-based EV budgets for progressive difficulty scaling.
     """
     
+    READS = ('IdentifyTier', 'LoadPokemonNamesStep', 'Mons', 'TrainerData')
+    WRITES = ('Trainers',)
+    
     def __init__(self, ev_budget=510, tier_budgets=None, trainer_filter=None):
         """Initialize the GeneralEV step.
         
@@ -2435,7 +2487,8 @@ class GeneralEVStep(Step):
                         pokemon_name = pokemon_names.data[species_id] or pokemon_name
                     
                     # Apply GeneralEV allocation with tier-specific budget
-                    ev_allocation = self._allocate_evs(pokemon, species_id, mons, ev_budget)
+                    ev_allocation = self._allocate_evs(pokemon, species_id, mons, ev_budget,
+                                                       rng=context.rng(["evs", f"trainer_{i}", f"mon_{j}"]))
                     
                     self.total_pokemon_allocated += 1
                     
@@ -2468,7 +2521,7 @@ class GeneralEVStep(Step):
         else:
             print(f"  Default EV Budget: {self.default_ev_budget}")
     
-    def _allocate_evs(self, pokemon, pokemon_id, mons, ev_budget=510):
+    def _allocate_evs(self, pokemon, pokemon_id, mons, ev_budget=510, rng=random):
         """Allocate EVs using the GeneralEV algorithm.
         
         Args:
@@ -2476,8 +2529,8 @@ class GeneralEVStep(Step):
             pokemon_id: Pokemon species ID (may be form-encoded as base_species | (form << 11))
             mons: Mons extractor with base stats
             ev_budget: Total EV budget to allocate (default 510)
+            rng: Random stream for tie-breaks (context.rng(path) or the random module)
         """
-        import random
         
         # Get base stats for the Pokemon using mons[] which handles form-encoded species
         try:
@@ -2502,7 +2555,7 @@ class GeneralEVStep(Step):
         
         # Step 1: Allocate 152 EVs to highest base stat
         highest_stats = self._get_highest_stats(stats)
-        chosen_highest = random.choice(highest_stats)
+        chosen_highest = rng.choice(highest_stats)
         
         if remaining_budget >= 152:
             ev_allocation[chosen_highest] = 152
@@ -2515,16 +2568,16 @@ class GeneralEVStep(Step):
         if remaining_budget >= 100:
             remaining_highest = [stat for stat in highest_stats if stat != chosen_highest]
             if remaining_highest:
-                chosen_second = random.choice(remaining_highest)
+                chosen_second = rng.choice(remaining_highest)
             else:
                 # Get next highest tier
                 second_highest_stats = self._get_second_highest_stats(stats, highest_stats)
                 if second_highest_stats:
-                    chosen_second = random.choice(second_highest_stats)
+                    chosen_second = rng.choice(second_highest_stats)
                 else:
                     # Fallback to any remaining stat
                     available_stats = [s for s in stats.keys() if s != chosen_highest]
-                    chosen_second = random.choice(available_stats) if available_stats else chosen_highest
+                    chosen_second = rng.choice(available_stats) if available_stats else chosen_highest
             
             ev_allocation[chosen_second] = 100
             remaining_budget -= 100
@@ -2539,7 +2592,7 @@ class GeneralEVStep(Step):
                              if ev_allocation[stat] + 50 <= 252]
             
             if available_stats:
-                chosen_stat = random.choice(available_stats)
+                chosen_stat = rng.choice(available_stats)
                 ev_allocation[chosen_stat] += 50
                 remaining_budget -= 50
             else:
@@ -2551,7 +2604,7 @@ class GeneralEVStep(Step):
                              if ev_allocation[stat] + 8 <= 252]
             
             if available_stats:
-                chosen_stat = random.choice(available_stats)
+                chosen_stat = rng.choice(available_stats)
                 ev_allocation[chosen_stat] += 8
                 remaining_budget -= 8
         
@@ -2607,6 +2660,9 @@ class GeneralIVStep(Step):
     - MaxIVs: All IVs set to 31
     """
     
+    READS = ('IdentifyTier', 'LoadPokemonNamesStep', 'TrainerData')
+    WRITES = ('Trainers',)
+    
     def __init__(self, mode="ScalingIVs", trainer_filter=None):
         """Initialize the GeneralIV step.
         
@@ -2691,7 +2747,8 @@ class GeneralIVStep(Step):
                     if self.mode == "MaxIVs":
                         iv_allocation = self._allocate_max_ivs(pokemon)
                     else:  # ScalingIVs
-                        iv_allocation = self._allocate_scaling_ivs(pokemon, trainer_tier)
+                        iv_allocation = self._allocate_scaling_ivs(pokemon, trainer_tier,
+                                                                   rng=context.rng(["ivs", f"trainer_{i}", f"mon_{j}"]))
                     
                     self.total_pokemon_allocated += 1
                     
@@ -2722,26 +2779,25 @@ class GeneralIVStep(Step):
         
         return {'hp': 31, 'atk': 31, 'def': 31, 'spatk': 31, 'spdef': 31, 'speed': 31}
     
-    def _allocate_scaling_ivs(self, pokemon, trainer_tier):
+    def _allocate_scaling_ivs(self, pokemon, trainer_tier, rng=random):
         """Allocate IVs based on trainer tier."""
-        import random
         
         tier_num = self._get_tier_number(trainer_tier)
         max_ivs_count = self._get_max_ivs_for_tier(tier_num)
         
         # Start with all IVs in range 16-31
         iv_allocation = {
-            'hp': random.randint(16, 31),
-            'atk': random.randint(16, 31),
-            'def': random.randint(16, 31),
-            'spatk': random.randint(16, 31),
-            'spdef': random.randint(16, 31),
-            'speed': random.randint(16, 31)
+            'hp': rng.randint(16, 31),
+            'atk': rng.randint(16, 31),
+            'def': rng.randint(16, 31),
+            'spatk': rng.randint(16, 31),
+            'spdef': rng.randint(16, 31),
+            'speed': rng.randint(16, 31)
         }
         
         # Randomly select stats to set to 31 based on tier
         if max_ivs_count > 0:
-            stats_to_max = random.sample(list(iv_allocation.keys()), min(max_ivs_count, 6))
+            stats_to_max = rng.sample(list(iv_allocation.keys()), min(max_ivs_count, 6))
             for stat in stats_to_max:
                 iv_allocation[stat] = 31
         
@@ -2782,6 +2838,9 @@ class GeneralIVStep(Step):
 class SetTrainerMovesStep(Step):
     """Step to set each trainer Pokemon's moves to the last four moves learned at their current level."""
     
+    READS = ('FormMapping', 'Levelups', 'LoadPokemonNamesStep', 'Moves')
+    WRITES = ('Trainers',)
+    
     def __init__(self):
         pass
     
@@ -2801,13 +2860,9 @@ class SetTrainerMovesStep(Step):
                 index = form_mapping.resolve_data_index(pokemon.species_id)
                 if index > len(learnsets.data):
                     raise ValueError(f"Pokemon {index} is out of bounds for learnsets data! {len(learnsets.data)}")
-                learnset = learnsets.data[index]
                     
                 # Find all moves this Pokemon can learn up to its current level
-                available_moves = []
-                for learn_entry in learnset:
-                    if learn_entry.level <= pokemon.level:
-                        available_moves.append(learn_entry.move_id)
+                available_moves = learnsets.moves_up_to(index, pokemon.level)
                     
                 # Crash if no moves available
                 if not available_moves:
@@ -2847,6 +2902,8 @@ class SetTrainerMovesStep(Step):
 
 
 class IdentifyGymTrainers(Extractor):
+    SOURCES = ('Trainers', 'IndexTrainers')
+    
     class Gym:
         def __init__(self, name, trainers, gym_type=None):
             self.name = name
@@ -2910,6 +2967,8 @@ class IdentifyGymTrainers(Extractor):
 
 
 class IdentifyBosses(Extractor):
+    SOURCES = ('Trainers', 'IndexTrainers')
+    
     class Boss:
         def __init__(self, name, trainers):
             self.name = name
@@ -2947,6 +3006,8 @@ class IdentifyBosses(Extractor):
 class IdentifyRivals(Extractor):
     """Identifies rival trainers for special handling."""
     
+    SOURCES = ('Trainers',)
+    
     class Rival:
         def __init__(self, name, trainers):
             self.name = name
@@ -3055,6 +3116,8 @@ class TrainerToBossMapping(Extractor):
     3. If multiple matches, use class to disambiguate
     """
     
+    SOURCES = ('Trainers', 'IndexTrainers', 'IdentifyRivals')
+    
     def __init__(self, context):
         super().__init__(context)
         import csv
@@ -3270,6 +3333,8 @@ class IdentifyTier(Extractor):
     - PostGame: Lt. Surge's ace level to Level 100
     """
     
+    SOURCES = ('Trainers', 'IndexTrainers')
+    
     def __init__(self, context):
         super().__init__(context)
         self.data = {}  # trainer_id -> tier_name
@@ -3360,6 +3425,7 @@ class IdentifyTier(Extractor):
 
 
 class RandomizeGymTypesStep(Step):
+    WRITES = ('IdentifyGymTrainers',)
     
     def run(self, context):
         gyms = context.get(IdentifyGymTrainers)
@@ -3414,6 +3480,9 @@ class RandomizeGymTypesStep(Step):
 
 
 class RandomizeGymsStep(Step):
+    READS = ('Mons',)
+    WRITES = ('IdentifyGymTrainers', 'Trainers')
+    
     def __init__(self, filter):
         # Combine the provided filter with form category filter for Discrete and Out-of-Battle forms
         form_filter = FormCategoryFilter([FormCategory.DISCRETE, FormCategory.OUT_OF_BATTLE_CHANGE])
@@ -3464,6 +3533,9 @@ class AddPivotStep(Step):
     Records the replaced slot as trainer._pivot_slot for later steps.
     """
     
+    READS = ('IdentifyGymTrainers', 'LoadAbilityNames', 'Mons')
+    WRITES = ('Trainers',)
+    
     def __init__(self, filter):
         """Initialize with filter for candidate selection.
         
@@ -3584,6 +3656,9 @@ class AddFulcrumStep(Step):
     Records the replaced slot as trainer._fulcrum_slot.
     """
     
+    READS = ('IdentifyGymTrainers', 'Mons')
+    WRITES = ('Trainers',)
+    
     def __init__(self, filter):
         """Initialize with filter for candidate selection.
         
@@ -3664,6 +3739,9 @@ class AddTypeMimicStep(Step):
     Records the replaced slot as trainer._mimic_slot.
     """
     
+    READS = ('FormMapping', 'IdentifyGymTrainers', 'Mons', 'NameResolver')
+    WRITES = ('Trainers',)
+    
     def __init__(self, filter):
         """Initialize with filter for candidate selection.
         
@@ -3677,7 +3755,7 @@ class AddTypeMimicStep(Step):
     def run(self, context):
         gyms = context.get(IdentifyGymTrainers)
         mondata = context.get(Mons)
-        pokemon_names = context.get(LoadPokemonNamesStep)
+        names = context.get(NameResolver)
         form_mapping = context.get(FormMapping)
         self.context = context
         
@@ -3701,7 +3779,7 @@ class AddTypeMimicStep(Step):
                 # Decode species_id in case it contains form encoding (species | (formid<<11))
                 raw_species_id = trainer.team[slot].species_id & 0x7FF
                 original_pokemon = mondata.data[raw_species_id]
-                candidate = self._pick_mimic_candidate(mondata, pokemon_names, form_mapping, gym.type, original_pokemon)
+                candidate = self._pick_mimic_candidate(mondata, names, form_mapping, gym.type, original_pokemon)
                 if candidate is None:
                     continue
                 final_species = select_cosmetic_variant(
@@ -3711,14 +3789,14 @@ class AddTypeMimicStep(Step):
                 trainer.team[slot].species_id = encode_species_for_encounter(final_species)
                 trainer._mimic_slot = slot
 
-    def _pick_mimic_candidate(self, mondata, pokemon_names, form_mapping, gym_type, original_pokemon):
+    def _pick_mimic_candidate(self, mondata, names, form_mapping, gym_type, original_pokemon):
         from type_mimics import type_mimics_data
-        names = type_mimics_data.get(gym_type, [])
-        if not names:
+        mimic_names = type_mimics_data.get(gym_type, [])
+        if not mimic_names:
             return None
         # Resolve names (string or (base, form)) to species IDs
         ids = []
-        for entry in names:
+        for entry in mimic_names:
             if isinstance(entry, tuple) and len(entry) == 2:
                 # form tuple
                 form_id = self._find_form_by_names(entry[0], entry[1], form_mapping)
@@ -3726,7 +3804,7 @@ class AddTypeMimicStep(Step):
                     ids.append(form_id)
             else:
                 try:
-                    ids.append(pokemon_names.get_by_name(entry))
+                    ids.append(names.species_id(entry))
                 except KeyError:
                     pass
         if not ids:
@@ -3752,6 +3830,7 @@ class AddTypeMimicStep(Step):
 
 class FormCategoryFilter(SimpleFilter):
     """Filter that only allows forms from specified categories."""
+    PURE = True
     
     def __init__(self, allowed_categories: List):
         """
@@ -3769,6 +3848,11 @@ class FormCategoryFilter(SimpleFilter):
         # For forms, check if their category is allowed
         return candidate.form_category in self.allowed_categories
 
+    def mask(self, context, original, view):
+        columns = view.columns
+        codes = [columns.category_code(c) for c in self.allowed_categories]
+        return ~view.column("is_form") | np.isin(view.column("form_category"), codes)
+
 
 
 
@@ -3776,6 +3860,9 @@ class FormCategoryFilter(SimpleFilter):
 class RandomizeOrdinaryTrainersStep(Step):
     """Randomize all ordinary trainers (no gym leaders, rivals, E4, possibly Rocket Leaders if I ever get around to it)."""
     
+    READS = ('EvioliteUser', 'IdentifyGymTrainers', 'Mons')
+    WRITES = ('Trainers',)
+    
     def __init__(self, filter):
         # Combine the provided filter with form category filter for Discrete and Out-of-Battle forms
         form_filter = FormCategoryFilter([FormCategory.DISCRETE, FormCategory.OUT_OF_BATTLE_CHANGE])
@@ -3845,6 +3932,9 @@ class RandomizeOrdinaryTrainersStep(Step):
 class ConsistentRivalStarter(Step):
     """Updates rival teams to use starters consistent with the player's randomized choice."""
     
+    READS = ('EvolutionData', 'IdentifyRivals', 'Mons', 'StarterExtractor')
+    WRITES = ('Trainers',)
+    
     # ... (rest of the code remains the same)
     def run(self, context):
         starters = context.get(StarterExtractor)
@@ -3925,54 +4015,7 @@ class ConsistentRivalStarter(Step):
     
     def _get_evolved_form(self, base_starter, level, evolution_data):
         """Get the appropriate evolved form based on level and evolution data."""
-        
-        current_species = base_starter
-        evolution_path = evolution_data.get_evolution_paths(base_starter.pokemon_id)
-        
-        if not evolution_path or len(evolution_path[0]) == 1:
-            # No evolution path, return the base starter
-            return current_species
-        
-        full_path = evolution_path[0]  # Get the first (main) evolution path
-        
-        # Check each evolution in the path
-        for i in range(len(full_path) - 1):
-            current_pokemon_id = full_path[i].pokemon_id
-            next_pokemon = full_path[i + 1]
-            
-            # Get evolution data for current Pokemon
-            current_evo_data = evolution_data.data[current_pokemon_id]
-            
-            # Find the evolution that leads to the next Pokemon in the path
-            evolution_to_next = None
-            for evo in current_evo_data.valid_evolutions:
-                if evo.target and evo.target.pokemon_id == next_pokemon.pokemon_id:
-                    evolution_to_next = evo
-                    break
-            
-            if not evolution_to_next:
-                break
-            
-            # Check if we should evolve based on method and level
-            should_evolve = False
-            
-            if EvolutionMethod(evolution_to_next.method).param_type == EvoParam.LEVEL:
-                # Level-based evolution: evolve if level >= parameter
-                if level >= evolution_to_next.parameter:
-                    should_evolve = True
-            else:
-                # Non-level evolution: use fallback level ranges
-                if i == 0:  # First evolution (base -> stage 1)
-                    should_evolve = level >= 22
-                elif i == 1:  # Second evolution (stage 1 -> stage 2)
-                    should_evolve = level >= 36
-            
-            if should_evolve:
-                current_species = next_pokemon
-            else:
-                break
-        
-        return current_species
+        return evolution_data.evolved_form_at(base_starter, level)
 
 class RandomizeWildItemsStep(Step):
     """
@@ -3985,6 +4028,9 @@ class RandomizeWildItemsStep(Step):
     2. If Pokemon doesn't evolve with items, assigns random items from allowed categories:
        HELD, MED, EVO, OBO, VAL, BALL, BER, TM, GEM
     """
+    
+    READS = ('EvolutionData',)
+    WRITES = ('Mons',)
         
     def run(self, context):
         """Execute the wild item randomization."""
@@ -4262,46 +4308,17 @@ class ForceEvolvedTrainerPokemon(Step):
     
     def _get_evolved_form(self, base_species, level, evolution_data, trainer_tier=None):
         """Get the appropriate evolved form based on level and evolution thresholds."""
-        current_species = base_species
-        evolution_path = evolution_data.get_evolution_paths(base_species.pokemon_id)
-        
-        if not evolution_path or len(evolution_path[0]) == 1:
-            # No evolution path, return the base species
-            return current_species
-        
-        full_path = evolution_path[0]  # Get the first (main) evolution path
-        
         # For tier-based mode, use simplified evolution logic
         if self.evolution_mode == "tier_based" and trainer_tier is not None:
+            full_path = evolution_data.main_path(base_species.pokemon_id)
+            if len(full_path) == 1:
+                # No evolution path, return the base species
+                return base_species
             return self._get_tier_based_evolution(full_path, trainer_tier)
         
-        # For level-based mode, check each evolution in the path
-        for i in range(len(full_path) - 1):
-            current_pokemon_id = full_path[i].pokemon_id
-            next_pokemon = full_path[i + 1]
-            
-            # Get evolution data for current Pokemon
-            current_evo_data = evolution_data.data[current_pokemon_id]
-            
-            # Find the evolution that leads to the next Pokemon in the path
-            evolution_to_next = None
-            for evo in current_evo_data.valid_evolutions:
-                if evo.target and evo.target.pokemon_id == next_pokemon.pokemon_id:
-                    evolution_to_next = evo
-                    break
-            
-            if not evolution_to_next:
-                break
-            
-            # Check if we should evolve based on method and level
-            should_evolve = self._should_evolve(evolution_to_next, level, i, trainer_tier)
-            
-            if should_evolve:
-                current_species = next_pokemon
-            else:
-                break
-        
-        return current_species
+        # Level-based evolutions at their level, others at the configured stage levels
+        return evolution_data.evolved_form_at(base_species, level,
+                                              (self.stage1_evolution_level, self.stage2_evolution_level))
     
     def _get_tier_based_evolution(self, full_path, trainer_tier):
         """Get evolved form based on simplified tier-based logic.
@@ -4332,20 +4349,6 @@ class ForceEvolvedTrainerPokemon(Step):
             # Fallback: no evolution
             return full_path[0]
     
-    def _should_evolve(self, evolution, level, evolution_stage, trainer_tier=None):
-        """Determine if Pokemon should evolve based on evolution method and thresholds."""
-        if EvolutionMethod(evolution.method).param_type == EvoParam.LEVEL:
-            # Level-based evolution: evolve if level >= parameter
-            return level >= evolution.parameter
-        else:
-            # Non-level evolution: use configured thresholds (level-based mode only)
-            if evolution_stage == 0:  # First evolution (base -> stage 1)
-                return level >= self.stage1_evolution_level
-            elif evolution_stage == 1:  # Second evolution (stage 1 -> stage 2)
-                return level >= self.stage2_evolution_level
-        
-        return False
-    
     def get_evolution_summary(self):
         """Get a summary of all evolutions performed.
         
@@ -4451,6 +4454,9 @@ class RandomizeTrainerAbilities(Step):
     - randomability_with_hidden: 45% slot 0, 45% slot 1, 10% slot 3 (with fallbacks)
     """
     
+    READS = ('HiddenAbilityTable', 'Mons')
+    WRITES = ('Trainers',)
+    
     def __init__(self, mode="randomability", trainer_filter=None):
         """Initialize the RandomizeAbilities step.
         
@@ -4488,7 +4494,8 @@ class RandomizeTrainerAbilities(Step):
                 pokemon_data = mons[pokemon.species_id]
                 
                 # Determine new ability slot based on mode
-                new_slot = self._determine_ability_slot(context, pokemon_data, hidden_abilities)
+                new_slot = self._determine_ability_slot(context, pokemon_data, hidden_abilities,
+                                                        context.rng(["trainer_abilities", f"trainer_{trainer_id}", f"mon_{pokemon_index}"]))
                 
                 # Track hidden ability assignments
                 if new_slot == 3:
@@ -4511,7 +4518,7 @@ class RandomizeTrainerAbilities(Step):
         
         self._print_summary()
     
-    def _determine_ability_slot(self, context, pokemon_data, hidden_abilities):
+    def _determine_ability_slot(self, context, pokemon_data, hidden_abilities, rng=random):
         """Determine which ability slot to use based on the mode and Pokemon's available abilities."""
         
         # Check which abilities are available (non-zero ability IDs)
@@ -4523,7 +4530,7 @@ class RandomizeTrainerAbilities(Step):
         if self.mode == "randomability":
             # 50/50 between slots 0 and 1, fallback to slot 0 if no ability2
             if has_ability2:
-                return random.randint(0, 1)  # 50/50 choice
+                return rng.randint(0, 1)  # 50/50 choice
             else:
                 return 0  # Only ability1 available
         
@@ -4531,7 +4538,7 @@ class RandomizeTrainerAbilities(Step):
             # 45% slot 0, 45% slot 1, 10% slot 3 with fallbacks
             if has_ability2 and has_hidden:
                 # All three slots available: 45/45/10 distribution
-                rand_val = random.random()
+                rand_val = rng.random()
                 if rand_val < 0.45:
                     return 0
                 elif rand_val < 0.90:
@@ -4540,10 +4547,10 @@ class RandomizeTrainerAbilities(Step):
                     return 3
             elif has_ability2:
                 # No hidden ability: 50/50 between slots 0 and 1
-                return random.randint(0, 1)
+                return rng.randint(0, 1)
             elif has_hidden:
                 # No ability2: 90% slot 0, 10% slot 3
-                rand_val = random.random()
+                rand_val = rng.random()
                 return 0 if rand_val < 0.90 else 3
             else:
                 # Only ability1 available
@@ -4629,6 +4636,9 @@ class SetAbilityStep(Step):
 class RandomizeChampion(Step):
     """Randomize the Champion (trainer ID 244) with special BST rules and update trainer ID 675 with ChampAce."""
     
+    READS = ('BstIndex', 'EvioliteUser', 'Mons')
+    WRITES = ('Trainers',)
+    
     def __init__(self, filter):
         # Combine the provided filter with form category filter for Discrete and Out-of-Battle forms
         form_filter = FormCategoryFilter([FormCategory.DISCRETE, FormCategory.OUT_OF_BATTLE_CHANGE])
@@ -4734,20 +4744,29 @@ class RandomizeChampion(Step):
 
 class BstRange515to601(SimpleFilter):
     """Filter Pokemon that have BST between 515 and 601 (inclusive)."""
+    PURE = True
     
     def check(self, context, original, candidate) -> bool:
         return 515 <= candidate.bst <= 601
     
+    def mask(self, context, original, view):
+        bst = view.column("bst")
+        return (bst >= 515) & (bst <= 601)
+    
     def __repr__(self):
         return "BstRange515to601()"
 
 
 class BstExact600(SimpleFilter):
     """Filter Pokemon that have BST exactly 600."""
+    PURE = True
     
     def check(self, context, original, candidate) -> bool:
         return candidate.bst == 600
     
+    def mask(self, context, original, view):
+        return view.column("bst") == 600
+    
     def __repr__(self):
         return "BstExact600()"
 
@@ -4765,6 +4784,9 @@ class UpdateStaticOverworldSprites(Step):
     Must run AFTER RandomizeStaticPokemonStep and RandomizeShinyStatic.
     """
     
+    READS = ('Mons', 'OverworldTags', 'ShinyGyarados', 'WildBattle')
+    WRITES = ('EventFiles',)
+    
     def run(self, context):
         import json
         
@@ -4863,6 +4885,9 @@ class BillGiftMegaStep(Step):
     Bill's gift item is in script file 9.
     """
     
+    READS = ('LoadPokemonNamesStep', 'Mons')
+    WRITES = ('GiftPokemon', 'ScriptNarc')
+    
     # Bill's gift locations
     BILL_POKEMON_FILE = 892
     BILL_ITEM_FILE = 9
@@ -4974,7 +4999,7 @@ class BillGiftMegaStep(Step):
         if hidden_ability and hidden_ability not in ability_choices:
             ability_choices.append(hidden_ability)
         
-        bill_gift.ability = random.choice(ability_choices)
+        bill_gift.ability = context.rng(["bill_gift", "ability"]).choice(ability_choices)
         
         print(f"BillGiftMegaStep: Set Bill's Pokemon to {first_pokemon_name} (ID {first_pokemon_id}, ability {bill_gift.ability})")
         
@@ -5088,6 +5113,9 @@ class RandomizeKantoBossesStep(Step):
     mega, plus an always-present signature species. The mega placement follows
     one of three scenarios chosen 40%/40%/20%.
     """
+    
+    READS = ('BstIndex', 'IdentifyGymTrainers', 'IdentifyRivals', 'IndexTrainers', 'LoadPokemonNamesStep', 'Mons', 'MythicalPokemon', 'ParadoxPokemon', 'RestrictedPokemon', 'SubLegendaryPokemon', 'UltraBeastPokemon')
+    WRITES = ('Trainers',)
     # group -> list of (leader trainer name, gym name in IdentifyGymTrainers)
     GROUP_LEADERS = {
         1: [("Lt. Surge", "Vermilion City"), ("Sabrina", "Saffron City")],
@@ -5404,13 +5432,14 @@ class RandomizeKantoBossesStep(Step):
     def _champion_randomize(self, trainer):
         """Randomize every slot using Champion BST rules, excluding legendaries."""
         tname = trainer.info.name
-        no_legendaries = NotInSet(self.legendary_ids)
-        candidates = list(self.mondata.data)
+        bst_index = self.context.get(BstIndex)
         for i, pokemon in enumerate(trainer.team):
-            bst = BstExact600() if i >= 5 else BstRange515to601()
-            bst_filter = AllFilters([self.filter, no_legendaries, bst])
+            if i >= 5:
+                candidates = bst_index.window(600, 600, exclude=self.legendary_ids)
+            else:
+                candidates = bst_index.window(515, 601, exclude=self.legendary_ids)
             original = self.mondata[pokemon.species_id]
-            filtered = bst_filter.filter_all(self.context, original, candidates)
+            filtered = self.filter.filter_all(self.context, original, candidates)
             if not filtered:
                 continue
             new_species = self.context.decide(path=["kanto", "gauntlet", tname, "champ", i],
@@ -5423,6 +5452,8 @@ class ApplyBossMegaStonesStep(Step):
     Must run AFTER TrainerHeldItem (which clears and reassigns every held item),
     so the mega stones survive into the final ROM.
     """
+    
+    WRITES = ('Trainers',)
     def run(self, context):
         trainers = context.get(Trainers)
         stamped = 0
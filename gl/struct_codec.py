@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Precompiled codecs for fixed-layout construct Structs.
+
+construct walks its object tree for every record it parses, which is slow
+when an extractor decodes thousands of them. compile_struct() flattens a
+fixed-size construct definition into a single struct.Struct format and a
+small tree of decode/encode nodes, so each record is unpacked in one call.
+
+The compiled codec exposes the same parse()/build() API as the construct
+object it was made from and produces the same Containers (Enum/FlagsEnum
+values, ListContainers, Computed fields), so extractors can switch between
+the two freely. Builds are byte-identical with construct.
+"""
+import struct
+
+from construct import (
+    Adapter,
+    Array,
+    Computed,
+    Container,
+    Flag,
+    FormatField,
+    GreedyRange,
+    ListContainer,
+    Padded,
+    Pass,
+    Renamed,
+    Struct,
+    Transformed,
+)
+from construct.core import bytes2bits, swapbitsinbytes
+
+
+class UnsupportedConstruct(Exception):
+    """Raised when a construct cannot be compiled into a fixed layout."""
+
+
+class _FieldNode:
+    """A single FormatField (Int8ul, Int16ul, ...)."""
+
+    def __init__(self, fmt):
+        self.fmt = fmt
+
+    def decode(self, vals, i, ctx):
+        return vals[i], i + 1
+
+    def encode(self, obj, ctx, out):
+        out.append(obj)
+
+
+class _AdapterNode:
+    """Enum / FlagsEnum (or any Adapter) over a compiled subcon."""
+
+    def __init__(self, adapter, inner):
+        self.adapter = adapter
+        self.inner = inner
+        self.fmt = inner.fmt
+
+    def decode(self, vals, i, ctx):
+        value, i = self.inner.decode(vals, i, ctx)
+        return self.adapter._decode(value, ctx, "(compiled)"), i
+
+    def encode(self, obj, ctx, out):
+        self.inner.encode(self.adapter._encode(obj, ctx, "(compiled)"), ctx, out)
+
+
+class _PaddingNode:
+    """Padding(n): zero bytes on build, skipped on parse."""
+
+    def __init__(self, length):
+        self.fmt = f"{length}x"
+
+    def decode(self, vals, i, ctx):
+        return None, i
+
+    def encode(self, obj, ctx, out):
+        pass
+
+
+class _FlagBitsNode:
+    """BitsSwapped(Bitwise(Array(n, Flag))): n flags, least significant bit first."""
+
+    def __init__(self, count):
+        if count % 8:
+            raise UnsupportedConstruct(f"flag array of {count} bits is not byte aligned")
+        self.count = count
+        self.fmt = f"{count // 8}s"
+
+    def decode(self, vals, i, ctx):
+        raw = vals[i]
+        return ListContainer([bool((raw[b >> 3] >> (b & 7)) & 1) for b in range(self.count)]), i + 1
+
+    def encode(self, obj, ctx, out):
+        if len(obj) != self.count:
+            raise ValueError(f"expected {self.count} flags, got {len(obj)}")
+        raw = bytearray(self.count // 8)
+        for b, flag in enumerate(obj):
+            if flag:
+                raw[b >> 3] |= 1 << (b & 7)
+        out.append(bytes(raw))
+
+
+class _ArrayNode:
+    """Array(count, subcon) with a constant count."""
+
+    def __init__(self, count, elem):
+        self.count = count
+        self.elem = elem
+        # Arrays of plain fields unpack as one slice of the value tuple
+        self.flat = isinstance(elem, _FieldNode)
+        self.fmt = f"{count}{elem.fmt}" if self.flat else elem.fmt * count
+
+    def decode(self, vals, i, ctx):
+        if self.flat:
+            return ListContainer(vals[i:i + self.count]), i + self.count
+        items = ListContainer()
+        for _ in range(self.count):
+            item, i = self.elem.decode(vals, i, ctx)
+            items.append(item)
+        return items, i
+
+    def encode(self, obj, ctx, out):
+        if len(obj) != self.count:
+            raise ValueError(f"expected {self.count} elements, got {len(obj)}")
+        if self.flat:
+            out.extend(obj)
+        else:
+            for item in obj:
+                self.elem.encode(item, ctx, out)
+
+
+class _StructNode:
+    """Struct(...) with named fields, padding and Computed values."""
+
+    def __init__(self, members):
+        # members: list of (name, node) for data fields, (name, Computed) for computed ones
+        self.members = members
+        self.fmt = "".join(node.fmt for _, node in members if not isinstance(node, Computed))
+
+    def decode(self, vals, i, ctx):
+        obj = Container()
+        context = Container(_=ctx)
+        for name, node in self.members:
+            if isinstance(node, Computed):
+                value = node.func(context) if callable(node.func) else node.func
+            else:
+                value, i = node.decode(vals, i, context)
+            if name:
+                obj[name] = value
+                context[name] = value
+        return obj, i
+
+    def encode(self, obj, ctx, out):
+        context = Container(_=ctx)
+        for name, node in self.members:
+            if isinstance(node, Computed):
+                continue
+            value = obj[name] if name else None
+            if name:
+                context[name] = value
+            node.encode(value, context, out)
+
+
+def _compile(obj):
+    if isinstance(obj, Renamed):
+        return _compile(obj.subcon)
+    if isinstance(obj, FormatField):
+        if obj.fmtstr[0] not in "<=":
+            raise UnsupportedConstruct(f"non little-endian field {obj.fmtstr!r}")
+        return _FieldNode(obj.fmtstr[1:])
+    if isinstance(obj, Padded) and obj.subcon is Pass and isinstance(obj.length, int):
+        return _PaddingNode(obj.length)
+    if isinstance(obj, Transformed) and obj.decodefunc is swapbitsinbytes:
+        inner = obj.subcon
+        if (isinstance(inner, Transformed) and inner.decodefunc is bytes2bits
+                and isinstance(inner.subcon, Array) and isinstance(inner.subcon.count, int)
+                and inner.subcon.subcon is Flag):
+            return _FlagBitsNode(inner.subcon.count)
+        raise UnsupportedConstruct("only BitsSwapped(Bitwise(Array(n, Flag))) is supported")
+    if isinstance(obj, Adapter):
+        return _AdapterNode(obj, _compile(obj.subcon))
+    if isinstance(obj, Array):
+        if not isinstance(obj.count, int):
+            raise UnsupportedConstruct("Array count must be a constant")
+        return _ArrayNode(obj.count, _compile(obj.subcon))
+    if isinstance(obj, Struct):
+        members = []
+        for sc in obj.subcons:
+            inner = sc.subcon if isinstance(sc, Renamed) else sc
+            if isinstance(inner, Computed):
+                members.append((sc.name, inner))
+            else:
+                members.append((sc.name, _compile(sc)))
+        return _StructNode(members)
+    raise UnsupportedConstruct(f"cannot compile {obj!r}")
+
+
+class CompiledStruct:
+    """Drop-in replacement for a fixed-size construct object (optionally wrapped in GreedyRange)."""
+
+    def __init__(self, construct_obj):
+        self.source = construct_obj
+        self.greedy = isinstance(construct_obj, GreedyRange)
+        self.node = _compile(construct_obj.subcon if self.greedy else construct_obj)
+        self.packer = struct.Struct("<" + self.node.fmt)
+
+    def sizeof(self, **contextkw):
+        return self.packer.size
+
+    def parse(self, data, **contextkw):
+        ctx = Container(**contextkw)
+        if self.greedy:
+            items = ListContainer()
+            # Like GreedyRange, a trailing partial record is ignored
+            for vals in self.packer.iter_unpack(data[:len(data) - len(data) % self.packer.size]):
+                items.append(self.node.decode(vals, 0, ctx)[0])
+            return items
+        return self.node.decode(self.packer.unpack_from(data), 0, ctx)[0]
+
+    def build(self, obj, **contextkw):
+        ctx = Container(**contextkw)
+        if self.greedy:
+            return b"".join(self._build_one(item, ctx) for item in obj)
+        return self._build_one(obj, ctx)
+
+    def _build_one(self, obj, ctx):
+        out = []
+        self.node.encode(obj, ctx, out)
+        return self.packer.pack(*out)
+
+
+def compile_struct(construct_obj):
+    """Compile a fixed-layout construct definition into a CompiledStruct."""
+    return CompiledStruct(construct_obj)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Compare construct and precompiled struct_codec parsing on a real ROM.
+  python gl/tests/benchmark_codecs.py <rom_name> [ExtractorClass ...]
+
+For each extractor, builds it once with FAST_CODEC off and once with it on,
+times the full decode, and checks that both paths produce equal data and that
+every entry re-serializes to its original bytes.
+"""
+import os
+import sys
+import time
+
+GL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(GL_DIR)
+
+sys.path.insert(0, GL_DIR)
+os.chdir(REPO_ROOT)
+
+import ndspy.rom
+
+from framework import RandomizationContext, NarcExtractor
+import steps
+import extractors
+
+DEFAULT_EXTRACTORS = ["Mons", "Moves", "Encounters", "TrainerTeam", "Levelups"]
+
+
+def strip_private(obj):
+    """Drop construct's private keys (_io, ...) so containers compare by value."""
+    if hasattr(obj, 'items'):
+        return {k: strip_private(v) for k, v in obj.items() if not k.startswith('_')}
+    if isinstance(obj, list):
+        return [strip_private(item) for item in obj]
+    return obj
+
+
+def build_with_codec(rom, extractor_class, fast):
+    """Construct extractor_class in a fresh context with FAST_CODEC forced, returning (extractor, seconds)."""
+    variant = type(extractor_class.__name__, (extractor_class,), {"FAST_CODEC": fast})
+    ctx = RandomizationContext(rom)
+    # Resolve dependencies first so only this extractor's own decode is timed
+    base = extractor_class(ctx)
+    ctx._objects[extractor_class] = base
+
+    start = time.perf_counter()
+    extractor = variant(ctx)
+    data = list(extractor.data)  # force lazy NARCs to decode every entry
+    elapsed = time.perf_counter() - start
+    return extractor, data, elapsed
+
+
+def check_round_trip(extractor, data):
+    """Return the number of entries that do not re-serialize to their original bytes."""
+    if isinstance(extractor, extractors.Levelups):
+        original = extractor._original_narc.files[0]
+        return int(extractor.codec.build(extractor.codec.parse(original)) != original)
+    mismatches = 0
+    for i, entry in enumerate(data):
+        if extractor.serialize_file(entry, i) != extractor._original_narc.files[i]:
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 1:
+        print(f"Usage: python {sys.argv[0]} <rom_name> [ExtractorClass ...]")
+        return 1
+
+    rom_name = args[0]
+    names = args[1:] or DEFAULT_EXTRACTORS
+
+    with open(rom_name, "rb") as f:
+        rom = ndspy.rom.NintendoDSRom(f.read())
+
+    failed = False
+    print(f"{'Extractor':15} {'construct':>10} {'compiled':>10} {'speedup':>8}  round-trip")
+    for name in names:
+        extractor_class = getattr(steps, name, None) or getattr(extractors, name, None)
+        if extractor_class is None or not issubclass(extractor_class, NarcExtractor):
+            print(f"Error: no NARC extractor named {name!r}")
+            return 1
+
+        slow, slow_data, slow_time = build_with_codec(rom, extractor_class, fast=False)
+        fast, fast_data, fast_time = build_with_codec(rom, extractor_class, fast=True)
+
+        same = strip_private(slow_data) == strip_private(fast_data)
+        mismatches = check_round_trip(slow, slow_data) + check_round_trip(fast, fast_data)
+        ok = same and mismatches == 0
+        failed |= not ok
+
+        status = "OK" if ok else f"FAIL (equal={same}, mismatches={mismatches})"
+        speedup = slow_time / fast_time if fast_time else float('inf')
+        print(f"{name:15} {slow_time:9.3f}s {fast_time:9.3f}s {speedup:7.1f}x  {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Check for AddTypeMimicStep._pick_mimic_candidate name resolution.
+  python gl/tests/check_mimic_candidate.py
+
+Calls the method with stand-in extractors and a mimic list holding a plain
+species name, a (base, form) tuple and an unknown name, and checks that the
+first two reach decide() as candidates and the unknown one is skipped.
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+GL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, GL_DIR)
+
+import type_mimics
+from steps import AddTypeMimicStep
+
+GYM_TYPE = "CHECK"
+
+
+class StubNames:
+    """The part of NameResolver the step uses."""
+
+    ids = {"Snorlax": 143}
+
+    def species_id(self, name):
+        if name not in self.ids:
+            raise KeyError(repr(name))
+        return self.ids[name]
+
+
+class StubContext:
+    def __init__(self):
+        self.calls = []
+
+    def decide(self, path, original, candidates, filter):
+        self.calls.append((path, original, candidates))
+        return candidates[0]
+
+
+def main():
+    mons = [SimpleNamespace(name=name, pokemon_id=pokemon_id)
+            for pokemon_id, name in ((1, "Bulbasaur"), (143, "Snorlax"), (1100, "Lycanroc-Midnight"))]
+    form_mapping = SimpleNamespace(ALL_FORMS={1100: ("Lycanroc", "MIDNIGHT", None)})
+
+    step = AddTypeMimicStep.__new__(AddTypeMimicStep)
+    step.filter = None
+    step.context = StubContext()
+
+    type_mimics.type_mimics_data[GYM_TYPE] = ["Snorlax", ("Lycanroc", "MIDNIGHT"), "Missingno"]
+    try:
+        selected = step._pick_mimic_candidate(SimpleNamespace(data=mons), StubNames(), form_mapping,
+                                              GYM_TYPE, mons[0])
+    finally:
+        del type_mimics.type_mimics_data[GYM_TYPE]
+
+    (path, original, candidates), = step.context.calls
+    ok = [m.pokemon_id for m in candidates] == [143, 1100] and original is mons[0] and selected is mons[1]
+    print(f"candidates {[m.name for m in candidates]}: {'OK' if ok else 'FAIL'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Round-trip check for gl/bps.py.
+  python gl/tests/check_patch_roundtrip.py [<base_rom> [<randomized_rom>]]
+
+With two ROMs, patches base -> randomized and checks that applying the patch
+reproduces the randomized ROM exactly. With only a base ROM, makes a few
+randomized-style edits itself (resized, rewritten and untouched files, an
+ARM9 edit) and checks those. Also checks that a patch refuses the wrong base.
+Without arguments, builds a small ROM with ndspy and checks edits to it,
+including files growing past the end of the base image. Edited ROMs are
+also patched with create_edit_patch from rom_writer.plan_rom's edits, and
+applying that patch must give the ROM write_rom writes.
+"""
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+GL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, GL_DIR)
+
+import ndspy.fnt
+import ndspy.rom
+
+from bps import PatchError, apply_patch, create_edit_patch, create_rom_patch
+from rom_writer import plan_rom, write_rom
+
+
+def edited_copy(base):
+    """Re-save base through ndspy with some files and ARM9 changed."""
+    return edited_rom(base).save()
+
+
+def edited_rom(base):
+    """base loaded with ndspy, with some files and ARM9 changed."""
+    rom = ndspy.rom.NintendoDSRom(base)
+    rng = random.Random(0)
+    ids = rng.sample(range(len(rom.files)), min(8, len(rom.files)))
+    for n, file_id in enumerate(ids):
+        data = bytearray(rom.files[file_id])
+        if n % 3 == 0:
+            data += b"\x5A" * 100  # grows, so later files move
+        elif n % 3 == 1:
+            del data[len(data) // 2:]
+        for i in range(0, len(data), 97):
+            data[i] ^= 0xFF
+        rom.files[file_id] = bytes(data)
+    arm9 = bytearray(rom.arm9)
+    arm9[0x100:0x10C] = bytes(range(12))
+    rom.arm9 = bytes(arm9)
+    return rom
+
+
+def synthetic_rom():
+    """A small NDS image built from scratch, for checks that need no real ROM."""
+    rom = ndspy.rom.NintendoDSRom()
+    rom.arm9 = bytes(range(256)) * 16
+    rom.arm7 = bytes(1024)
+    rom.filenames = ndspy.fnt.Folder(files=[f"f{i}.bin" for i in range(6)])
+    rom.files = [bytes([i]) * 3000 + bytes(range(256)) for i in range(6)]
+    return rom.save()
+
+
+def grown_copy(base):
+    """base with two files grown by 6000 bytes, so the target is longer than the source."""
+    return grown_rom(base).save()
+
+
+def grown_rom(base):
+    rom = ndspy.rom.NintendoDSRom(base)
+    for file_id in (1, len(rom.files) - 1):
+        rom.files[file_id] = rom.files[file_id] + bytes(range(200)) * 30
+    return rom
+
+
+def check(base, target):
+    start = time.perf_counter()
+    patch = create_rom_patch(base, target)
+    created = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = apply_patch(base, patch)
+    applied = time.perf_counter() - start
+
+    ok = result == target
+    print(f"target {len(target)} bytes, patch {len(patch)} bytes "
+          f"(create {created:.2f}s, apply {applied:.2f}s): {'OK' if ok else 'FAIL'}")
+    return ok, patch
+
+
+def check_edits(base, rom):
+    """Patch base -> rom from plan_rom's edits and compare with what write_rom writes."""
+    with tempfile.TemporaryDirectory() as tmp:
+        base_path = os.path.join(tmp, "base.nds")
+        out_path = os.path.join(tmp, "out.nds")
+        with open(base_path, "wb") as f:
+            f.write(base)
+        write_rom(rom, base_path, out_path)
+        with open(out_path, "rb") as f:
+            target = f.read()
+
+    start = time.perf_counter()
+    edits, stats = plan_rom(rom, io.BytesIO(base))
+    patch = create_edit_patch(base, edits)
+    created = time.perf_counter() - start
+
+    ok = apply_patch(base, patch) == target and ndspy.rom.NintendoDSRom(target).files == rom.files
+    print(f"edits: {stats['in_place']} in place, {stats['relocated']} relocated, patch {len(patch)} bytes "
+          f"(create {created:.2f}s): {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) > 2:
+        print(f"Usage: python {sys.argv[0]} [<base_rom> [<randomized_rom>]]")
+        return 1
+
+    if not args:
+        base = synthetic_rom()
+        ok = True
+        for target in (edited_copy(base), grown_copy(base)):
+            assert len(target) != len(base)
+            ok &= check(base, target)[0]
+        ok &= check(base, base)[0]
+        for rom in (edited_rom(base), grown_rom(base), ndspy.rom.NintendoDSRom(base)):
+            ok &= check_edits(base, rom)
+        return 0 if ok else 1
+
+    with open(args[0], "rb") as f:
+        base = f.read()
+    if len(args) == 2:
+        with open(args[1], "rb") as f:
+            target = f.read()
+    else:
+        target = edited_copy(base)
+
+    ok, patch = check(base, target)
+    ok &= check(base, base)[0]
+    ok &= check_edits(base, edited_rom(base))
+
+    wrong_base = bytearray(base)
+    wrong_base[0x200] ^= 0xFF
+    try:
+        apply_patch(bytes(wrong_base), patch)
+        print("wrong base accepted: FAIL")
+        ok = False
+    except PatchError:
+        print("wrong base rejected: OK")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
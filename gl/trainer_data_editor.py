@@ -8,12 +8,18 @@ for trainer Pokemon based on various criteria like attacker type, level, etc.
 from framework import Extractor, Step
 from steps import Mons, Moves, EggMoves, Levelups, TMHM, TrainerData, IdentifyTier, LoadPokemonNamesStep, LoadAbilityNames, LoadMoveNamesStep, Trainers, IdentifyBosses
 from extractors import MachineLearnsets
+from name_resolver import NameResolver
 from enums import Split, Tier, MoveFlags
+import fnmatch
+import hashlib
 import json
 import os
-import glob
+import pickle
 import random
+import sys
 import itertools
+import bisect
+from typing import NamedTuple
 
 
 #############
@@ -156,9 +162,23 @@ class MoveWhitelist(MoveList):
         return self.contains(move_id)
 
 
+class StabSources(NamedTuple):
+    """Good moves of one type a base species can learn, per source."""
+    levels: list  # level of each levelup move, ascending
+    levelup: list
+    egg: list
+    tm: list
+    hm: list
+
+
+_NO_STAB_SOURCES = StabSources([], [], [], [], [])
+
+
 class FindStabMoves(Extractor):
     """Extractor that finds STAB moves for Pokemon using a tiered priority system."""
     
+    SOURCES = ('Mons', 'Moves', 'Levelups')
+    
     def __init__(self, context):
         super().__init__(context)
         self.moves = context.get(Moves)
@@ -172,9 +192,57 @@ class FindStabMoves(Extractor):
         
         # Initialize good moves set
         self.good_moves = set()
+        self.good_moves_by_type = {}
         for move in self.moves.data:
             if move.move_id and move.name and self._is_good_move(move):
                 self.good_moves.add(move.move_id)
+                self.good_moves_by_type.setdefault(move.type, set()).add(move.move_id)
+        
+        self._build_stab_index()
+    
+    def _build_stab_index(self):
+        """Index good moves as stab_index[(base species, type)] -> StabSources and good_levelups[base species].
+        
+        Learnsets, egg moves and machine compatibility are fixed for the run,
+        so get_stab_moves only has to cut level-up lists at a level.
+        """
+        machine_moves = self.tmhm.machine_move_table(self.moves)
+        species_count = min(0x800, max(len(self.levelups.data), len(self.machine_learnsets.data),
+                                       max(self.egg_moves.data, default=-1) + 1))
+        self.stab_index = {}
+        self.good_levelups = []  # (levels, move ids) of good level-up moves of any type
+        
+        for species_id in range(species_count):
+            def sources(move_type):
+                key = (species_id, move_type)
+                if key not in self.stab_index:
+                    self.stab_index[key] = StabSources([], [], [], [], [])
+                return self.stab_index[key]
+            
+            good_levels, good_ids = [], []
+            if species_id < len(self.levelups.data):
+                for level, move_id in zip(self.levelups.sorted_levels[species_id], self.levelups.sorted_moves[species_id]):
+                    if not self.is_good_move(move_id):
+                        continue
+                    good_levels.append(level)
+                    good_ids.append(move_id)
+                    if move_id < len(self.moves.data):
+                        stab = sources(self.moves.data[move_id].type)
+                        stab.levels.append(level)
+                        stab.levelup.append(move_id)
+            self.good_levelups.append((good_levels, good_ids))
+            
+            for egg_move_entry in self.egg_moves.data.get(species_id, ()):
+                move = egg_move_entry['move']
+                if move and self.is_good_move(egg_move_entry['move_id']):
+                    sources(move.type).egg.append(egg_move_entry['move_id'])
+            
+            for kind, numbers, attr in (("TM", self.machine_learnsets.get_learnable_tms(species_id), "tm"),
+                                        ("HM", self.machine_learnsets.get_learnable_hms(species_id), "hm")):
+                for number in numbers:
+                    move = machine_moves.get((kind, number))
+                    if move and self.is_good_move(move.move_id):
+                        getattr(sources(move.type), attr).append(move.move_id)
     
     def _is_good_move(self, move):
         if self.whitelist.is_whitelisted(move.move_id):
@@ -204,92 +272,200 @@ class FindStabMoves(Extractor):
         move_powers.sort(key=lambda x: x[1], reverse=True)
         return [move_id for move_id, power in move_powers[:count]]
     
-    def _shuffle_generator(self, gen):
+    def _shuffle_generator(self, gen, rng=random):
         moves = list(gen)
-        random.shuffle(moves)
+        rng.shuffle(moves)
         yield from moves
     
-    def get_stab_moves(self, species_id, level, move_type):
+    def get_stab_moves(self, species_id, level, move_type, rng=random):
         # Decode form-encoded species ID (base_species | (form << 11))
         # Learnset data is indexed by base species, not form-encoded ID
         base_species_id = species_id & 0x7FF
-        
-        def levelup_stab():
-            if base_species_id < len(self.levelups.data):
-                pokemon_learnset = self.levelups.data[base_species_id]
-                for entry in pokemon_learnset:
-                    if (entry.level <= level and entry.move and 
-                        entry.move.type == move_type and 
-                        self.is_good_move(entry.move_id)):
-                        yield entry.move_id
-        
-        def egg_stab():
-            if base_species_id in self.egg_moves.data:
-                for egg_move_entry in self.egg_moves.data[base_species_id]:
-                    move = egg_move_entry['move']
-                    if (move and move.type == move_type and 
-                        self.is_good_move(egg_move_entry['move_id'])):
-                        yield egg_move_entry['move_id']
-        
-        def tm_stab():
-            learnable_tms = self.machine_learnsets.get_learnable_tms(base_species_id)
-            for tm_num in learnable_tms:
-                tm_move = self.tmhm.get_move_for_tm(tm_num, self.moves)
-                if (tm_move and tm_move.type == move_type and 
-                    self.is_good_move(tm_move.move_id)):
-                    yield tm_move.move_id
-        
-        def hm_stab():
-            learnable_hms = self.machine_learnsets.get_learnable_hms(base_species_id)
-            for hm_num in learnable_hms:
-                hm_move = self.tmhm.get_move_for_hm(hm_num, self.moves)
-                if (hm_move and hm_move.type == move_type and 
-                    self.is_good_move(hm_move.move_id)):
-                    yield hm_move.move_id
+        stab = self.stab_index.get((base_species_id, move_type), _NO_STAB_SOURCES)
         
         def best_levelup():
-            if base_species_id < len(self.levelups.data):
-                pokemon_learnset = self.levelups.data[base_species_id]
-                available_moves = []
-                for entry in pokemon_learnset:
-                    if (entry.level <= level and entry.move and 
-                        self.is_good_move(entry.move_id)):
-                        available_moves.append(entry.move_id)
-                
+            if base_species_id < len(self.good_levelups):
+                levels, move_ids = self.good_levelups[base_species_id]
+                available_moves = move_ids[:bisect.bisect_right(levels, level)]
                 if available_moves:
-                    best_moves = self.get_best_moves_for_pokemon(species_id, available_moves, len(available_moves))
-                    yield from best_moves
+                    yield from self.get_best_moves_for_pokemon(species_id, available_moves, len(available_moves))
         
         return itertools.chain(
-            self._shuffle_generator(levelup_stab()),
-            self._shuffle_generator(egg_stab()),
-            self._shuffle_generator(tm_stab()),
-            self._shuffle_generator(hm_stab()),
-            self._shuffle_generator(best_levelup())
+            self._shuffle_generator(stab.levelup[:bisect.bisect_right(stab.levels, level)], rng),
+            self._shuffle_generator(stab.egg, rng),
+            self._shuffle_generator(stab.tm, rng),
+            self._shuffle_generator(stab.hm, rng),
+            self._shuffle_generator(best_levelup(), rng)
         )
 
 
 
+class CustomSetBundle:
+    """Compiled index of the pokemon_sets/*.json files, stored as one pickle.
+    
+    Holds the parsed JSON of every set file with the mtime it was read at,
+    and per species ID the file CustomSetReader uses for it with move and
+    ability names already resolved to IDs. compile() re-reads only files whose
+    mtime changed and re-resolves only species whose file changed; all species
+    are re-resolved when the move or ability name tables differ from the ones
+    the bundle was compiled against.
+    """
+    
+    VERSION = 2
+    DEFAULT_PATH = os.path.join("build", "gl_custom_sets.pickle")
+    
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.files = {}  # filename -> (mtime_ns, parsed JSON or None if unreadable, read error or None)
+        self.names_key = None
+        self.sets = {}  # species ID -> (filename, mtime_ns, resolved set or None, warnings)
+        self.changed = False
+        self._load()
+    
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                version, files, names_key, sets = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"CustomSetBundle: ignoring unreadable bundle {self.path}: {e}", file=sys.stderr)
+            return
+        if version == self.VERSION:
+            self.files, self.names_key, self.sets = files, names_key, sets
+    
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+    
+    def save(self):
+        """Write the bundle if compile() changed anything."""
+        if not self.changed:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((self.VERSION, self.files, self.names_key, self.sets), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        self.changed = False
+    
+    def compile(self, sets_dir, species_names, resolve, names_key):
+        """Bring the bundle up to date with sets_dir.
+        
+        Args:
+            sets_dir (str): Directory holding the set JSON files
+            species_names (dict): Species ID -> name, in Mons order
+            resolve (callable): resolve(species_id, data, filename) -> (resolved set or None, warnings)
+            names_key (str): Digest of the name tables resolve() depends on
+        """
+        self._scan(sets_dir)
+        if names_key != self.names_key:
+            self.names_key = names_key
+            self.sets = {}
+            self.changed = True
+        
+        index = self._prefix_index()
+        for species_id, name in species_names.items():
+            filename = self._find_file(name, index) if name else None
+            if filename is None:
+                if species_id in self.sets:
+                    del self.sets[species_id]
+                    self.changed = True
+                continue
+            mtime, data, error = self.files[filename]
+            entry = self.sets.get(species_id)
+            if entry is not None and entry[:2] == (filename, mtime):
+                continue
+            if data is None:
+                resolved, warnings = None, (f"Error reading {filename}: {error}",)
+            else:
+                resolved, warnings = resolve(species_id, data, filename)
+            self.sets[species_id] = (filename, mtime, resolved, tuple(warnings))
+            self.changed = True
+        for species_id in set(self.sets) - set(species_names):
+            del self.sets[species_id]
+            self.changed = True
+    
+    def _scan(self, sets_dir):
+        """Re-read set files that are new or whose mtime changed; forget removed ones."""
+        current = {}
+        if os.path.isdir(sets_dir):
+            for entry in os.scandir(sets_dir):
+                # glob skips hidden files
+                if not entry.name.startswith(".") and os.path.normcase(entry.name).endswith(".json"):
+                    current[entry.name] = entry.stat().st_mtime_ns
+        
+        for filename in set(self.files) - set(current):
+            del self.files[filename]
+            self.changed = True
+        for filename, mtime in current.items():
+            if filename in self.files and self.files[filename][0] == mtime:
+                continue
+            try:
+                with open(os.path.join(sets_dir, filename), 'r', encoding='utf-8') as f:
+                    self.files[filename] = (mtime, json.load(f), None)
+            except (json.JSONDecodeError, IOError) as e:
+                self.files[filename] = (mtime, None, str(e))
+            self.changed = True
+    
+    def _prefix_index(self):
+        """normcase'd prefix -> filenames matching the glob pattern '<prefix>_*.json'."""
+        index = {}
+        for filename in self.files:
+            folded = os.path.normcase(filename)
+            for i, c in enumerate(folded[:-len("_.json") + 1]):
+                if c == "_":
+                    index.setdefault(folded[:i], []).append(filename)
+        return index
+    
+    def _find_file(self, pokemon_name, index):
+        """Newest file glob would find for pokemon_name, trying the same patterns in the same order."""
+        for name in (pokemon_name, pokemon_name.replace(' ', '_'), pokemon_name.replace('-', '_'), pokemon_name.replace(' ', '')):
+            if any(c in name for c in "*?["):
+                matching_files = fnmatch.filter(self.files, f"{name}_*.json")
+            else:
+                matching_files = index.get(os.path.normcase(name))
+            if matching_files:
+                # If multiple files found, use the newest one (by filename timestamp)
+                return max(matching_files)
+        return None
+
+
 class CustomSetReader(Extractor):
     """Reads competitive Pokemon sets from individual JSON files.
     
     This class can locate and read a Pokemon's custom competitive set
     from the pokemon_sets directory, converting move names to internal IDs.
+    The sets are compiled into a CustomSetBundle when the reader is created,
+    so lookups are dict reads.
     """
     
+    SOURCES = ('Mons', 'Moves', 'NameResolver')
+    
+    INPUT_PATHS = ('pokemon_sets',)
+    
     def __init__(self, context):
         super().__init__(context)
         self.moves = context.get(Moves)
         self.mons = context.get(Mons)
-        self.ability_names = context.get(LoadAbilityNames)
+        self.names = context.get(NameResolver)
         
-        # Build lookup tables for efficient conversion
-        self.move_name_to_id = {move.name: move.move_id for move in self.moves.data if move.name}
-        self.ability_name_to_id = {name: ability_id for ability_id, name in self.ability_names.id_to_name.items()}
+        # Lookup tables for conversion, shared with other name lookups through NameResolver
+        self.move_name_to_id = self.names.moves.ids
+        self.ability_name_to_id = self.names.abilities.ids
         # Note: Pokemon data structure uses 'name' field, not 'species_name'
         
         # Set the base directory for Pokemon sets
-        self.pokemon_sets_dir = 'pokemon_sets'
+        self.pokemon_sets_dir = self.INPUT_PATHS[0]
+        
+        names_key = hashlib.sha256(repr((sorted(self.move_name_to_id.items()),
+                                         sorted(self.ability_name_to_id.items()))).encode()).hexdigest()
+        species_names = {}
+        for mon in self.mons.data:
+            species_names.setdefault(mon.pokemon_id, mon.name)
+        self.bundle = CustomSetBundle()
+        self.bundle.compile(self.pokemon_sets_dir, species_names, self._resolve_set, names_key)
+        self.bundle.save()
         
         print(f"CustomSetReader initialized with {len(self.move_name_to_id)} moves and {len(self.ability_name_to_id)} abilities")
     
@@ -302,37 +478,8 @@ class CustomSetReader(Extractor):
         Returns:
             str: Path to JSON file, or None if not found
         """
-        # Get the Pokemon's species name
-        pokemon = next((mon for mon in self.mons.data if mon.pokemon_id == pokemon_id), None)
-        if not pokemon or not pokemon.name:
-            return None
-        
-        pokemon_name = pokemon.name
-        
-        # Search for JSON files matching this Pokemon
-        # Pattern: PokemonName_timestamp.json
-        pattern = os.path.join(self.pokemon_sets_dir, f"{pokemon_name}_*.json")
-        matching_files = glob.glob(pattern)
-        
-        if not matching_files:
-            # Try alternative patterns (spaces, hyphens, etc.)
-            alt_patterns = [
-                f"{pokemon_name.replace(' ', '_')}_*.json",
-                f"{pokemon_name.replace('-', '_')}_*.json",
-                f"{pokemon_name.replace(' ', '')}_*.json"
-            ]
-            
-            for alt_pattern in alt_patterns:
-                alt_path = os.path.join(self.pokemon_sets_dir, alt_pattern)
-                matching_files = glob.glob(alt_path)
-                if matching_files:
-                    break
-        
-        if not matching_files:
-            return None
-        
-        # If multiple files found, use the newest one (by filename timestamp)
-        return max(matching_files)
+        entry = self.bundle.sets.get(pokemon_id)
+        return os.path.join(self.pokemon_sets_dir, entry[0]) if entry else None
     
     def read_custom_set(self, pokemon_id):
         """Read a Pokemon's custom competitive set from JSON.
@@ -350,49 +497,55 @@ class CustomSetReader(Extractor):
                 'filename': str
             }
         """
-        json_file = self.find_pokemon_json_file(pokemon_id)
-        if not json_file:
+        entry = self.bundle.sets.get(pokemon_id)
+        if not entry:
+            return None
+        _, _, resolved, warnings = entry
+        for warning in warnings:
+            print(warning)
+        if resolved is None:
             return None
+        return dict(resolved, moves=[dict(move) for move in resolved['moves']])
+    
+    def _resolve_set(self, pokemon_id, data, filename):
+        """Convert a parsed set file to the read_custom_set() format.
         
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Validate required fields
-            if not all(field in data for field in ['species', 'name', 'moves', 'ability']):
-                print(f"Warning: Invalid JSON structure in {os.path.basename(json_file)}")
-                return None
-            
-            # Convert moves from display names to IDs
-            converted_moves = []
-            for move_data in data['moves']:
-                display_name = move_data.get('display_name', '')
-                move_id = self._find_move_by_display_name(display_name, os.path.basename(json_file))
-                
-                if move_id is not None:
-                    converted_moves.append({
-                        'move_id': move_id,
-                        'slot': move_data.get('slot', len(converted_moves) + 1),
-                        'source': move_data.get('source', 'unknown'),
-                        'display_name': display_name
-                    })
-            
-            # Convert ability from name to ID
-            ability_name = data['ability'].get('name', '')
-            ability_id = self._find_ability_by_name(ability_name, os.path.basename(json_file))
+        Returns:
+            tuple: (custom set dict or None if the file is invalid, warnings printed while converting)
+        """
+        warnings = []
+        
+        # Validate required fields
+        if not all(field in data for field in ['species', 'name', 'moves', 'ability']):
+            warnings.append(f"Warning: Invalid JSON structure in {filename}")
+            return None, warnings
+        
+        # Convert moves from display names to IDs
+        converted_moves = []
+        for move_data in data['moves']:
+            display_name = move_data.get('display_name', '')
+            move_id = self._find_move_by_display_name(display_name, filename, warnings)
             
-            return {
-                'species_id': pokemon_id,
-                'name': data['name'],
-                'moves': converted_moves,
-                'ability_name': ability_name,
-                'ability_id': ability_id,
-                'filename': os.path.basename(json_file)
-            }
+            if move_id is not None:
+                converted_moves.append({
+                    'move_id': move_id,
+                    'slot': move_data.get('slot', len(converted_moves) + 1),
+                    'source': move_data.get('source', 'unknown'),
+                    'display_name': display_name
+                })
+        
+        # Convert ability from name to ID
+        ability_name = data['ability'].get('name', '')
+        ability_id = self._find_ability_by_name(ability_name, filename, warnings)
         
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Error reading {os.path.basename(json_file)}: {e}")
-            return None
+        return {
+            'species_id': pokemon_id,
+            'name': data['name'],
+            'moves': converted_moves,
+            'ability_name': ability_name,
+            'ability_id': ability_id,
+            'filename': filename
+        }, warnings
     
     def has_custom_set(self, pokemon_id):
         """Check if a Pokemon has a custom set available.
@@ -405,12 +558,13 @@ class CustomSetReader(Extractor):
         """
         return self.find_pokemon_json_file(pokemon_id) is not None
     
-    def _find_move_by_display_name(self, display_name, filename):
+    def _find_move_by_display_name(self, display_name, filename, warnings):
         """Find a move by its display name, with edit distance fallback.
         
         Args:
             display_name (str): Display name from JSON (e.g., 'Leech Seed')
             filename (str): JSON filename for error reporting
+            warnings (list): Warning lines are appended here
             
         Returns:
             int: Move ID, or None if not found
@@ -418,83 +572,26 @@ class CustomSetReader(Extractor):
         if not display_name:
             return None
         
-        # Try exact match first (case-sensitive)
-        if display_name in self.move_name_to_id:
-            return self.move_name_to_id[display_name]
-        
-        # Try case-insensitive match
-        display_name_lower = display_name.lower()
-        for rom_name, move_id in self.move_name_to_id.items():
-            if rom_name and rom_name.lower() == display_name_lower:
-                return move_id
+        # Exact match first, then case-insensitive
+        move_id = self.names.moves.get(display_name)
+        if move_id is not None:
+            return move_id
         
         # Move not found - find closest match by edit distance
-        closest_match = self._find_closest_move_name(display_name)
-        print(f"Warning: Unknown move '{display_name}' in {filename}")
+        closest_match = self.names.moves.closest(display_name)
+        warnings.append(f"Warning: Unknown move '{display_name}' in {filename}")
         if closest_match:
-            print(f"  Closest match: '{closest_match[0]}' (edit distance: {closest_match[1]})")
+            warnings.append(f"  Closest match: '{closest_match[0]}' (edit distance: {closest_match[1]})")
         
         return None
     
-    def _find_closest_move_name(self, target_name):
-        """Find the closest move name by edit distance.
-        
-        Args:
-            target_name (str): Target move name to find closest match for
-            
-        Returns:
-            tuple: (closest_name, edit_distance) or None if no moves available
-        """
-        if not target_name:
-            return None
-        
-        min_distance = float('inf')
-        closest_name = None
-        
-        # Check all known move names
-        for rom_name in self.move_name_to_id.keys():
-            if rom_name and rom_name != '-':  # Skip empty/invalid names
-                distance = self._edit_distance(target_name.lower(), rom_name.lower())
-                if distance < min_distance:
-                    min_distance = distance
-                    closest_name = rom_name
-        
-        return (closest_name, min_distance) if closest_name else None
-    
-    def _edit_distance(self, s1, s2):
-        """Calculate Levenshtein edit distance between two strings.
-        
-        Args:
-            s1 (str): First string
-            s2 (str): Second string
-            
-        Returns:
-            int: Edit distance
-        """
-        if len(s1) < len(s2):
-            return self._edit_distance(s2, s1)
-        
-        if len(s2) == 0:
-            return len(s1)
-        
-        previous_row = list(range(len(s2) + 1))
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-        
-        return previous_row[-1]
-    
-    def _find_ability_by_name(self, ability_name, filename):
+    def _find_ability_by_name(self, ability_name, filename, warnings):
         """Find an ability by its name.
         
         Args:
             ability_name (str): Ability name from JSON (e.g., 'ABILITY_HYDRATION')
             filename (str): JSON filename for error reporting
+            warnings (list): Warning lines are appended here
             
         Returns:
             int: Ability ID, or None if not found
@@ -502,29 +599,25 @@ class CustomSetReader(Extractor):
         if not ability_name:
             return None
         
-        # Try exact match first
-        if ability_name in self.ability_name_to_id:
-            return self.ability_name_to_id[ability_name]
+        # Exact (or case-insensitive) match first
+        candidates = [ability_name]
         
-        # Try without ABILITY_ prefix if present
+        # Then without the ABILITY_ prefix: as is, with underscores as spaces,
+        # and with underscores dropped (CompoundEyes style)
         if ability_name.startswith('ABILITY_'):
-            clean_name = ability_name[8:]  # Remove 'ABILITY_' prefix
-            
-            # Try direct match with clean name
-            if clean_name in self.ability_name_to_id:
-                return self.ability_name_to_id[clean_name]
-            
-            # Try converting underscores to spaces and proper case
-            formatted_name = clean_name.replace('_', ' ').title()
-            if formatted_name in self.ability_name_to_id:
-                return self.ability_name_to_id[formatted_name]
-            
-            # Try converting underscores to nothing (CompoundEyes style)
-            no_underscore_name = clean_name.replace('_', '').title()
-            if no_underscore_name in self.ability_name_to_id:
-                return self.ability_name_to_id[no_underscore_name]
+            clean_name = ability_name[8:]
+            candidates += [clean_name, clean_name.replace('_', ' ').title(), clean_name.replace('_', '').title()]
+        
+        for candidate in candidates:
+            ability_id = self.names.abilities.get(candidate)
+            if ability_id is not None:
+                return ability_id
         
-        print(f"Warning: Ability '{ability_name}' not found in {filename}")
+        warnings.append(f"Warning: Ability '{ability_name}' not found in {filename}")
+        # The spaced form reads like the names in the table
+        closest_match = self.names.abilities.closest(candidates[2] if len(candidates) > 1 else ability_name)
+        if closest_match:
+            warnings.append(f"  Closest match: '{closest_match[0]}' (edit distance: {closest_match[1]})")
         return None
 
 
@@ -536,6 +629,9 @@ class AssignCustomSetsStep(Step):
     and provides complete competitive movesets.
     """
     
+    READS = ('CustomSetReader', 'IdentifyBosses', 'IdentifyTier', 'Mons', 'Moves')
+    WRITES = ('Trainers',)
+    
     def __init__(self, mode="all"):
         """Initialize the AssignCustomSets step.
         
@@ -694,6 +790,9 @@ class AddStabMovesStep(Step):
     EARLY_GAME trainers are skipped.
     """
     
+    READS = ('FindStabMoves', 'IdentifyTier', 'Mons')
+    WRITES = ('Trainers',)
+    
     def __init__(self):
         super().__init__()
         self.processed_trainers = 0
@@ -718,7 +817,8 @@ class AddStabMovesStep(Step):
             print(f"Processing trainer: {trainer.info.name} (Tier: {trainer_tier.name})")
             self.processed_trainers += 1
             
-            for entry in trainer.team:
+            for slot, entry in enumerate(trainer.team):
+                rng = context.rng(["stab_moves", f"trainer_{trainer_id}", f"mon_{slot}"])
                 # Skip entries without custom moves
                 if not hasattr(entry, 'moves'):
                     continue
@@ -726,18 +826,18 @@ class AddStabMovesStep(Step):
                 pokemon = mons[entry.species_id]
                 new_moves = []
                 for t in set([pokemon.type1, pokemon.type2]):
-                    has_good_stab = any(move and stab_finder.moves.data[move].type == t and 
-                                      stab_finder.is_good_move(move) for move in entry.moves if move)
+                    good_of_type = stab_finder.good_moves_by_type.get(t, ())
+                    has_good_stab = any(move in good_of_type for move in entry.moves if move)
                     if not has_good_stab:
                         try:
-                            new_moves.append(next(stab_finder.get_stab_moves(entry.species_id, entry.level, t)))
+                            new_moves.append(next(stab_finder.get_stab_moves(entry.species_id, entry.level, t, rng)))
                         except StopIteration:
                             pass
                 
 
                 if new_moves:
                     old_move_ids = [move for move in entry.moves if move]
-                    random.shuffle(old_move_ids)
+                    rng.shuffle(old_move_ids)
                     final_move_ids = (new_moves + old_move_ids)[:4]
                     entry.moves[:] = (final_move_ids + [0] * 4)[:4]
                     
@@ -8,9 +8,9 @@ to trainer Pokemon based on tier-scaled probabilities and Pokemon characteristic
 
 from framework import Step
 from steps import Mons, Moves, Trainers, IdentifyTier, LoadPokemonNamesStep, LoadAbilityNames, LoadMoveNamesStep, IdentifyBosses
-from extractors import EvioliteUser
+from extractors import EvioliteUser, EvolutionData
 from enums import Split, Item, Type, Tier, MonClass, NatureData, Nature
-from TypeEffectiveness import sup_eff, get_4x_weaknesses
+from TypeEffectiveness import get_type_effectiveness, get_4x_weaknesses
 from Trainer_mon_Classifier import TrainerMonClassifier
 import random
 
@@ -34,6 +34,9 @@ class TrainerHeldItem(Step):
     - Good Items: All trainers get items from B+C
     """
     
+    READS = ('EvioliteUser', 'EvolutionData', 'IdentifyBosses', 'IdentifyTier', 'LoadAbilityNames', 'LoadMoveNamesStep', 'LoadPokemonNamesStep', 'Mons', 'Moves')
+    WRITES = ('Trainers',)
+    
     def __init__(self, mode="default"):
         """Initialize the TrainerHeldItem step.
         
@@ -169,7 +172,7 @@ class TrainerHeldItem(Step):
         # Check if both types are weak to Ground
         ground_weak_count = 0
         for ptype in types:
-            if (Type.GROUND, ptype) in sup_eff:
+            if get_type_effectiveness(Type.GROUND, ptype) > 1.0:
                 ground_weak_count += 1
         
         return ground_weak_count >= 2
@@ -693,7 +696,7 @@ class TrainerHeldItem(Step):
                 continue
             
             # Process each Pokémon in the trainer's team
-            for pokemon in trainer.team:
+            for slot, pokemon in enumerate(trainer.team):
                 self.pokemon_processed += 1
                 
                 # Clear existing held item so it can be reassigned
@@ -708,7 +711,7 @@ class TrainerHeldItem(Step):
                 prob_no_item, prob_set_a, prob_set_b = self.tier_probabilities[tier_num]
                 
                 # Roll for item assignment
-                roll = random.random()
+                roll = context.rng(["trainer_items", "roll", f"trainer_{trainer.info.trainer_id}", f"mon_{slot}"]).random()
                 
                 if roll < prob_no_item:
                     # No item assigned
@@ -786,7 +789,7 @@ class TrainerHeldItem(Step):
             # Check favored items - 50% chance if they qualify
             favored_items = self.get_favored_items_for_pokemon(pokemon, classifications)
             if favored_items:
-                if random.random() < 0.5:
+                if self.context.rng(["trainer_items", "favored_roll", trainer.info.name, species.name]).random() < 0.5:
                     chosen_item = self.context.decide(
                         path=["trainer_items", "favored", trainer.info.name, species.name],
                         original=None,
@@ -896,30 +899,11 @@ class TrainerHeldItem(Step):
         Returns:
             bool: True if the Pokémon can evolve, False otherwise
         """
-        # Try to get evolution data from context
-        try:
-            from gl.framework import EvolutionData
-            evo_data = self.context.get(EvolutionData)
-            
-            # Decode form-encoded species ID (base_species | (form << 11))
-            base_species_id = species_id & 0x7FF
-            
-            # Check if this species has any evolution entries
-            if base_species_id < len(evo_data.data) and evo_data.data[base_species_id]:
-                # Filter out empty evolution entries
-                valid_evos = [evo for evo in evo_data.data[base_species_id] if evo.method != 0]
-                return len(valid_evos) > 0
-        except:
-            # If evolution data is not available, use a simpler approach with common unevolved Pokémon
-            # These are some common unevolved Pokémon for demonstration
-            unevolved_pokemon = [
-                1, 4, 7, 10, 13, 16, 19, 21, 23, 25, 27, 29, 32, 35, 37, 39, 41, 
-                43, 46, 48, 50, 52, 54, 56, 58, 60, 63, 66, 69, 72, 74, 77, 79, 
-                81, 83, 84, 86, 88, 90, 92, 95, 96, 98, 100, 102, 104, 108, 109, 
-                111, 114, 116, 118, 120, 122, 123, 124, 125, 126, 127, 128, 129, 
-                131, 133, 138, 140, 142, 147
-            ]
-            return species_id in unevolved_pokemon
+        evo_data = self.context.get(EvolutionData)
+        
+        # Decode form-encoded species ID (base_species | (form << 11))
+        base_species_id = species_id & 0x7FF
+        return base_species_id < len(evo_data.data) and evo_data.can_evolve(base_species_id)
             
     def _has_status_move(self, pokemon):
         """Check if a Pokémon has status moves.
@@ -1089,6 +1073,9 @@ class AssignNatureStep(Step):
     - BALANCED: Balanced approach based on attacker type
     """
     
+    READS = ('IdentifyTier', 'Mons')
+    WRITES = ('Trainers',)
+    
     def __init__(self):
         pass
     
@@ -1128,6 +1115,9 @@ class AssignNatureStep(Step):
                     total_assignments += 1
         
         print(f"Assigned natures to {total_assignments} trainer Pokémon")
+        stats = classifier.cache_stats()
+        print(f"Classifier cache: {stats['species_hits']} species hits / {stats['species_misses']} misses, "
+              f"{stats['set_hits']} set hits / {stats['set_misses']} misses")
     
     def _get_nature_candidates(self, classifications, tier):
         """Get appropriate nature candidates based on classifications and tier.
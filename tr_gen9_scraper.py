@@ -15,8 +15,13 @@ import os
 import re
 import requests
 from bs4 import BeautifulSoup
+import sys
 import time
 
+# Names are resolved against the move and species constants through gl/name_resolver
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "gl"))
+from name_resolver import header_names
+
 def format_move_name(move_name):
     """
     Format a move name from the website format to the game format 
@@ -85,8 +90,9 @@ def format_move_name(move_name):
     formatted_name = re.sub(r'[^\w\s]', '', move_name)
     # Replace spaces with underscores and convert to uppercase
     formatted_name = formatted_name.replace(' ', '_').upper()
-    # Add MOVE_ prefix
-    return f"MOVE_{formatted_name}"
+    # Add MOVE_ prefix, then take the move constant it names (U_TURN for "U-turn")
+    formatted_name = f"MOVE_{formatted_name}"
+    return header_names().moves.name(formatted_name) or formatted_name
 
 def has_gen9_moves(pokemon_name):
     """
@@ -288,6 +294,7 @@ def main():
             # Convert regular name to SPECIES_NAME for the JSON file
             pokemon_name = pokemon.lower()
             species_name = f"SPECIES_{pokemon.upper()}"
+            species_name = header_names().pokemon.name(species_name) or species_name
         
         # Check if the Pokémon has Gen 9 moves - 
         # ONLY process if it DOES have Gen 9 moves (opposite of original scraper)